@@ -1,388 +1,1441 @@
-create table users (
-    id serial primary key,
-    username varchar(50) unique not null,
-    password varchar(255) not null,
-    role varchar(20) not null,
-    created_at timestamp default current_timestamp
-);
-
-create table games (
-    id serial primary key,
-    name varchar(50) unique not null
-);
-
-create table player_games (
-    player_id integer references users(id),
-    game_id integer references games(id),
-    primary key (player_id, game_id)
-);
-
-create table teams (
-    id serial primary key,
-    name varchar(100) unique not null,
-    created_at timestamp default current_timestamp
-);
-
-create table team_members (
-    team_id integer references teams(id),
-    player_id integer references users(id),
-    joined_at timestamp default current_timestamp,
-    primary key (team_id, player_id)
-);
-
-create table tournaments (
-    id serial primary key,
-    name varchar(100) not null,
-    game_id integer references games(id),
-    created_by integer references users(id),
-    created_at timestamp default current_timestamp,
-    winner_id integer references users(id)
-);
-
-create table tournament_participants (
-    tournament_id integer references tournaments(id),
-    player_id integer references users(id),
-    registered_at timestamp default current_timestamp,
-    primary key (tournament_id, player_id)
-);
-
-create table matches (
-    id serial primary key,
-    game_id integer references games(id),
-    player1_id integer references users(id),
-    player2_id integer references users(id),
-    winner_id integer references users(id),
-    match_type varchar(20) not null,
-    created_at timestamp default current_timestamp
-);
-
-create table player_stats (
-    player_id integer references users(id),
-    tournaments_won integer default 0,
-    matches_won integer default 0,
-    total_matches integer default 0,
-    primary key (player_id)
-);
-
-insert into games (name) values 
-    ('dota2'),
-    ('fortnite'),
-    ('valorant'),
-    ('fifa'),
-    ('cod'),
-    ('tekken'),
-    ('league of legends')
-on conflict (name) do nothing;
-
-insert into users (username, password, role)
-values ('admin', 'admin', 'admin')
-on conflict (username) do nothing;
-
-create index idx_users_username on users(username);
-create index idx_teams_name on teams(name);
-create index idx_tournaments_name on tournaments(name);
-create index idx_matches_players on matches(player1_id, player2_id);
-create index idx_player_games_player on player_games(player_id);
-create index idx_team_members_player on team_members(player_id);
-create index idx_tournament_participants_player on tournament_participants(player_id);
-
-
-select * from tournaments
-
--- backup tables 
-
-
-create table users_backup (
-    id serial primary key,
-    username varchar(50) unique not null,
-    password varchar(255) not null,
-    role varchar(20) not null,
-    created_at timestamp default current_timestamp
-);
-
-create table games_backup (
-    id serial primary key,
-    name varchar(50) unique not null
-);
-
-create table player_games_backup (
-    player_id integer references users(id),
-    game_id integer references games(id),
-    primary key (player_id, game_id)
-);
-
-create table teams_backup (
-    id serial primary key,
-    name varchar(100) unique not null,
-    created_at timestamp default current_timestamp
-);
-
-create table team_members_backup (
-    team_id integer references teams(id),
-    player_id integer references users(id),
-    joined_at timestamp default current_timestamp,
-    primary key (team_id, player_id)
-);
-
-create table tournaments_backup (
-    id serial primary key,
-    name varchar(100) not null,
-    game_id integer references games(id),
-    created_by integer references users(id),
-    created_at timestamp default current_timestamp,
-    winner_id integer references users(id)
-);
-
-create table tournament_participants_backup (
-    tournament_id integer references tournaments(id),
-    player_id integer references users(id),
-    registered_at timestamp default current_timestamp,
-    primary key (tournament_id, player_id)
-);
-
-create table matches_backup (
-    id serial primary key,
-    game_id integer references games(id),
-    player1_id integer references users(id),
-    player2_id integer references users(id),
-    winner_id integer references users(id),
-    match_type varchar(20) not null,
-    created_at timestamp default current_timestamp
-);
-
-create table player_stats_backup (
-    player_id integer references users(id),
-    tournaments_won integer default 0,
-    matches_won integer default 0,
-    total_matches integer default 0,
-    primary key (player_id)
-);
-
---triggers and functions, the insert the deleted value into the backup table from the main table
-
-
--- users
-create or replace function backup_users() returns trigger as $$
-begin
-    insert into users_backup (id, username, password, role, created_at)
-    values (old.id, old.username, old.password, old.role, old.created_at);
-    return old;
-end;
-$$ language plpgsql;
-
-create trigger trg_backup_users
-before delete on users
-for each row execute function backup_users();
-
--- games
-create or replace function backup_games() returns trigger as $$
-begin
-    insert into games_backup (id, name)
-    values (old.id, old.name);
-    return old;
-end;
-$$ language plpgsql;
-
-create trigger trg_backup_games
-before delete on games
-for each row execute function backup_games();
-
--- player_games
-create or replace function backup_player_games() returns trigger as $$
-begin
-    insert into player_games_backup (player_id, game_id)
-    values (old.player_id, old.game_id);
-    return old;
-end;
-$$ language plpgsql;
-
-create trigger trg_backup_player_games
-before delete on player_games
-for each row execute function backup_player_games();
-
--- teams
-create or replace function backup_teams() returns trigger as $$
-begin
-    insert into teams_backup (id, name, created_at)
-    values (old.id, old.name, old.created_at);
-    return old;
-end;
-$$ language plpgsql;
-
-create trigger trg_backup_teams
-before delete on teams
-for each row execute function backup_teams();
-
--- team_members
-create or replace function backup_team_members() returns trigger as $$
-begin
-    insert into team_members_backup (team_id, player_id, joined_at)
-    values (old.team_id, old.player_id, old.joined_at);
-    return old;
-end;
-$$ language plpgsql;
-
-create trigger trg_backup_team_members
-before delete on team_members
-for each row execute function backup_team_members();
-
--- tournaments
-create or replace function backup_tournaments() returns trigger as $$
-begin
-    insert into tournaments_backup (id, name, game_id, created_by, created_at, winner_id)
-    values (old.id, old.name, old.game_id, old.created_by, old.created_at, old.winner_id);
-    return old;
-end;
-$$ language plpgsql;
-
-create trigger trg_backup_tournaments
-before delete on tournaments
-for each row execute function backup_tournaments();
-
--- tournament_participants
-create or replace function backup_tournament_participants() returns trigger as $$
-begin
-    insert into tournament_participants_backup (tournament_id, player_id, registered_at)
-    values (old.tournament_id, old.player_id, old.registered_at);
-    return old;
-end;
-$$ language plpgsql;
-
-create trigger trg_backup_tournament_participants
-before delete on tournament_participants
-for each row execute function backup_tournament_participants();
-
--- matches
-create or replace function backup_matches() returns trigger as $$
-begin
-    insert into matches_backup (id, game_id, player1_id, player2_id, winner_id, match_type, created_at)
-    values (old.id, old.game_id, old.player1_id, old.player2_id, old.winner_id, old.match_type, old.created_at);
-    return old;
-end;
-$$ language plpgsql;
-
-create trigger trg_backup_matches
-before delete on matches
-for each row execute function backup_matches();
-
--- player_stats
-create or replace function backup_player_stats() returns trigger as $$
-begin
-    insert into player_stats_backup (player_id, tournaments_won, matches_won, total_matches)
-    values (old.player_id, old.tournaments_won, old.matches_won, old.total_matches);
-    return old;
-end;
-$$ language plpgsql;
-
-create trigger trg_backup_player_stats
-before delete on player_stats
-for each row execute function backup_player_stats();
-
-insert into users (username, password, role)
-values ('player', 'gaming', 'player')
-on conflict (username) do nothing;         
-
-insert into player_stats(player_id,tournaments_won,matches_won,total_matches)
-values(2,0,0,0);
-
-
-select* from users
-
-select* from player_stats
-
--- Insert players (users)
-INSERT INTO users (username, password, role) VALUES
-('Arsalan Ash', '129', 'player'),
-('TFue', 'pass123', 'player'),
-('Ninja Tyler', 'password', 'player'),
-('W2S', 'powder', 'player'),
-('Tobi Brown', 'ggmu', 'player'),
-('Josh Zerka', 'old', 'player'),
-('Simon Minter', 'mm7', 'player'),
-('Vikkstar123', 'india', 'player'),
-('Shroud', 'pubg', 'player'),
-('Dr Lupo', 'chugjug', 'player');
-
--- Insert teams
-INSERT INTO teams (name) VALUES
-('Sidemen'),
-('Beta Squad'),
-('Faze Clan'),
-('Dude Perfect'),
-('Biased Beasts');
-
--- Insert team members 
-INSERT INTO team_members (team_id, player_id) VALUES
-(1, 2),  
-(1, 3), 
-(2, 4),  
-(2, 5),  
-(3, 6),  
-(3, 7),  
-(4, 8), 
-(4, 9),  
-(5, 10), 
-(5, 11); 
-
-
--- Insert player games (players and their chosen games)
-INSERT INTO player_games (player_id, game_id) VALUES
-(4, 1),  
-(4, 3),  
-(5, 2), 
-(5, 4),  
-(6, 1),  
-(7, 3),  
-(8, 5),  
-(9, 6),  
-(10, 7),  
-(11, 1),  
-(12, 2), 
-(13, 3); 
-
--- Insert tournaments
-INSERT INTO tournaments (name, game_id, created_by) VALUES
-('Summer Dota Championship', 1, 1),
-('Fortnite Masters', 2, 1),
-('Valorant Pro League', 3, 1),
-('FIFA World Cup', 4, 1),
-('COD Tournament', 5, 1);
-
--- Insert tournament participants
-INSERT INTO tournament_participants (tournament_id, player_id) VALUES
-(1, 4),  
-(1, 6),  
-(1, 11),  
-(2, 5),  
-(2, 12), 
-(3, 4),  
-(3, 7),  
-(3, 13), 
-(4, 5),  
-(5, 8);  
-
--- Insert matches
-INSERT INTO matches (game_id, player1_id, player2_id, winner_id, match_type) VALUES
-(1, 4, 6, 4, 'tournament'),    
-(1, 11, 4, 4, 'tournament'),   
-(2, 5, 12, 5, 'tournament'),   
-(3, 4, 7, 7, 'tournament'),    
-(3, 7, 13, 13, 'tournament'),  
-(4, 5, 7, 5, 'friendly'),      
-(5, 8, 9, 8, 'friendly'),      
-(6, 9, 10, 9, 'friendly'),      
-(7, 10, 11, 10, 'friendly'),      
-(1, 4, 11 , 11, 'friendly');      
-
-
-INSERT INTO player_stats (player_id, tournaments_won, matches_won, total_matches) VALUES
-(4, 1, 2, 4),
-(5, 1, 2, 2),
-(6, 0, 0, 1),
-(7, 0, 1, 2),
-(8, 0, 1, 1),
-(9, 0, 1, 2),
-(10, 0, 1, 2), 
-(11, 0, 1, 2),  
-(12, 0, 0, 1),  
-(13, 0, 1, 1);   
\ No newline at end of file
+create table users (
+    id serial primary key,
+    username varchar(50) unique not null,
+    password varchar(255) not null,
+    role varchar(20) not null,
+    created_at timestamp default current_timestamp
+);
+
+create table games (
+    id serial primary key,
+    name varchar(50) unique not null
+);
+
+create table player_games (
+    player_id integer references users(id),
+    game_id integer references games(id),
+    primary key (player_id, game_id)
+);
+
+create table teams (
+    id serial primary key,
+    name varchar(100) unique not null,
+    created_at timestamp default current_timestamp
+);
+
+create table team_members (
+    team_id integer references teams(id),
+    player_id integer references users(id),
+    joined_at timestamp default current_timestamp,
+    primary key (team_id, player_id)
+);
+
+create table tournaments (
+    id serial primary key,
+    name varchar(100) not null,
+    game_id integer references games(id),
+    created_by integer references users(id),
+    created_at timestamp default current_timestamp,
+    winner_id integer references users(id)
+);
+
+create table tournament_participants (
+    tournament_id integer references tournaments(id),
+    player_id integer references users(id),
+    registered_at timestamp default current_timestamp,
+    primary key (tournament_id, player_id)
+);
+
+create table matches (
+    id serial primary key,
+    game_id integer references games(id),
+    player1_id integer references users(id),
+    player2_id integer references users(id),
+    winner_id integer references users(id),
+    match_type varchar(20) not null,
+    created_at timestamp default current_timestamp
+);
+
+create table player_stats (
+    player_id integer references users(id),
+    tournaments_won integer default 0,
+    matches_won integer default 0,
+    total_matches integer default 0,
+    primary key (player_id)
+);
+
+insert into games (name) values 
+    ('dota2'),
+    ('fortnite'),
+    ('valorant'),
+    ('fifa'),
+    ('cod'),
+    ('tekken'),
+    ('league of legends')
+on conflict (name) do nothing;
+
+insert into users (username, password, role)
+values ('admin', 'admin', 'admin')
+on conflict (username) do nothing;
+
+create index idx_users_username on users(username);
+create index idx_teams_name on teams(name);
+create index idx_tournaments_name on tournaments(name);
+create index idx_matches_players on matches(player1_id, player2_id);
+create index idx_player_games_player on player_games(player_id);
+create index idx_team_members_player on team_members(player_id);
+create index idx_tournament_participants_player on tournament_participants(player_id);
+
+
+select * from tournaments
+
+-- backup tables 
+
+
+create table users_backup (
+    id serial primary key,
+    username varchar(50) unique not null,
+    password varchar(255) not null,
+    role varchar(20) not null,
+    created_at timestamp default current_timestamp
+);
+
+create table games_backup (
+    id serial primary key,
+    name varchar(50) unique not null
+);
+
+create table player_games_backup (
+    player_id integer references users(id),
+    game_id integer references games(id),
+    primary key (player_id, game_id)
+);
+
+create table teams_backup (
+    id serial primary key,
+    name varchar(100) unique not null,
+    created_at timestamp default current_timestamp
+);
+
+create table team_members_backup (
+    team_id integer references teams(id),
+    player_id integer references users(id),
+    joined_at timestamp default current_timestamp,
+    primary key (team_id, player_id)
+);
+
+create table tournaments_backup (
+    id serial primary key,
+    name varchar(100) not null,
+    game_id integer references games(id),
+    created_by integer references users(id),
+    created_at timestamp default current_timestamp,
+    winner_id integer references users(id)
+);
+
+create table tournament_participants_backup (
+    tournament_id integer references tournaments(id),
+    player_id integer references users(id),
+    registered_at timestamp default current_timestamp,
+    primary key (tournament_id, player_id)
+);
+
+create table matches_backup (
+    id serial primary key,
+    game_id integer references games(id),
+    player1_id integer references users(id),
+    player2_id integer references users(id),
+    winner_id integer references users(id),
+    match_type varchar(20) not null,
+    created_at timestamp default current_timestamp
+);
+
+create table player_stats_backup (
+    player_id integer references users(id),
+    tournaments_won integer default 0,
+    matches_won integer default 0,
+    total_matches integer default 0,
+    primary key (player_id)
+);
+
+--triggers and functions, the insert the deleted value into the backup table from the main table
+
+
+-- users
+create or replace function backup_users() returns trigger as $$
+begin
+    insert into users_backup (id, username, password, role, created_at)
+    values (old.id, old.username, old.password, old.role, old.created_at);
+    return old;
+end;
+$$ language plpgsql;
+
+create trigger trg_backup_users
+before delete on users
+for each row execute function backup_users();
+
+-- games
+create or replace function backup_games() returns trigger as $$
+begin
+    insert into games_backup (id, name)
+    values (old.id, old.name);
+    return old;
+end;
+$$ language plpgsql;
+
+create trigger trg_backup_games
+before delete on games
+for each row execute function backup_games();
+
+-- player_games
+create or replace function backup_player_games() returns trigger as $$
+begin
+    insert into player_games_backup (player_id, game_id)
+    values (old.player_id, old.game_id);
+    return old;
+end;
+$$ language plpgsql;
+
+create trigger trg_backup_player_games
+before delete on player_games
+for each row execute function backup_player_games();
+
+-- teams
+create or replace function backup_teams() returns trigger as $$
+begin
+    insert into teams_backup (id, name, created_at)
+    values (old.id, old.name, old.created_at);
+    return old;
+end;
+$$ language plpgsql;
+
+create trigger trg_backup_teams
+before delete on teams
+for each row execute function backup_teams();
+
+-- team_members
+create or replace function backup_team_members() returns trigger as $$
+begin
+    insert into team_members_backup (team_id, player_id, joined_at)
+    values (old.team_id, old.player_id, old.joined_at);
+    return old;
+end;
+$$ language plpgsql;
+
+create trigger trg_backup_team_members
+before delete on team_members
+for each row execute function backup_team_members();
+
+-- tournaments
+create or replace function backup_tournaments() returns trigger as $$
+begin
+    insert into tournaments_backup (id, name, game_id, created_by, created_at, winner_id)
+    values (old.id, old.name, old.game_id, old.created_by, old.created_at, old.winner_id);
+    return old;
+end;
+$$ language plpgsql;
+
+create trigger trg_backup_tournaments
+before delete on tournaments
+for each row execute function backup_tournaments();
+
+-- tournament_participants
+create or replace function backup_tournament_participants() returns trigger as $$
+begin
+    insert into tournament_participants_backup (tournament_id, player_id, registered_at)
+    values (old.tournament_id, old.player_id, old.registered_at);
+    return old;
+end;
+$$ language plpgsql;
+
+create trigger trg_backup_tournament_participants
+before delete on tournament_participants
+for each row execute function backup_tournament_participants();
+
+-- matches
+create or replace function backup_matches() returns trigger as $$
+begin
+    insert into matches_backup (id, game_id, player1_id, player2_id, winner_id, match_type, created_at)
+    values (old.id, old.game_id, old.player1_id, old.player2_id, old.winner_id, old.match_type, old.created_at);
+    return old;
+end;
+$$ language plpgsql;
+
+create trigger trg_backup_matches
+before delete on matches
+for each row execute function backup_matches();
+
+-- player_stats
+create or replace function backup_player_stats() returns trigger as $$
+begin
+    insert into player_stats_backup (player_id, tournaments_won, matches_won, total_matches)
+    values (old.player_id, old.tournaments_won, old.matches_won, old.total_matches);
+    return old;
+end;
+$$ language plpgsql;
+
+create trigger trg_backup_player_stats
+before delete on player_stats
+for each row execute function backup_player_stats();
+
+insert into users (username, password, role)
+values ('player', 'gaming', 'player')
+on conflict (username) do nothing;         
+
+insert into player_stats(player_id,tournaments_won,matches_won,total_matches)
+values(2,0,0,0);
+
+
+select* from users
+
+select* from player_stats
+
+-- Insert players (users)
+INSERT INTO users (username, password, role) VALUES
+('Arsalan Ash', '129', 'player'),
+('TFue', 'pass123', 'player'),
+('Ninja Tyler', 'password', 'player'),
+('W2S', 'powder', 'player'),
+('Tobi Brown', 'ggmu', 'player'),
+('Josh Zerka', 'old', 'player'),
+('Simon Minter', 'mm7', 'player'),
+('Vikkstar123', 'india', 'player'),
+('Shroud', 'pubg', 'player'),
+('Dr Lupo', 'chugjug', 'player');
+
+-- Insert teams
+INSERT INTO teams (name) VALUES
+('Sidemen'),
+('Beta Squad'),
+('Faze Clan'),
+('Dude Perfect'),
+('Biased Beasts');
+
+-- Insert team members 
+INSERT INTO team_members (team_id, player_id) VALUES
+(1, 2),  
+(1, 3), 
+(2, 4),  
+(2, 5),  
+(3, 6),  
+(3, 7),  
+(4, 8), 
+(4, 9),  
+(5, 10), 
+(5, 11); 
+
+
+-- Insert player games (players and their chosen games)
+INSERT INTO player_games (player_id, game_id) VALUES
+(4, 1),  
+(4, 3),  
+(5, 2), 
+(5, 4),  
+(6, 1),  
+(7, 3),  
+(8, 5),  
+(9, 6),  
+(10, 7),  
+(11, 1),  
+(12, 2), 
+(13, 3); 
+
+-- Insert tournaments
+INSERT INTO tournaments (name, game_id, created_by) VALUES
+('Summer Dota Championship', 1, 1),
+('Fortnite Masters', 2, 1),
+('Valorant Pro League', 3, 1),
+('FIFA World Cup', 4, 1),
+('COD Tournament', 5, 1);
+
+-- Insert tournament participants
+INSERT INTO tournament_participants (tournament_id, player_id) VALUES
+(1, 4),  
+(1, 6),  
+(1, 11),  
+(2, 5),  
+(2, 12), 
+(3, 4),  
+(3, 7),  
+(3, 13), 
+(4, 5),  
+(5, 8);  
+
+-- Insert matches
+INSERT INTO matches (game_id, player1_id, player2_id, winner_id, match_type) VALUES
+(1, 4, 6, 4, 'tournament'),    
+(1, 11, 4, 4, 'tournament'),   
+(2, 5, 12, 5, 'tournament'),   
+(3, 4, 7, 7, 'tournament'),    
+(3, 7, 13, 13, 'tournament'),  
+(4, 5, 7, 5, 'friendly'),      
+(5, 8, 9, 8, 'friendly'),      
+(6, 9, 10, 9, 'friendly'),      
+(7, 10, 11, 10, 'friendly'),      
+(1, 4, 11 , 11, 'friendly');      
+
+
+INSERT INTO player_stats (player_id, tournaments_won, matches_won, total_matches) VALUES
+(4, 1, 2, 4),
+(5, 1, 2, 2),
+(6, 0, 0, 1),
+(7, 0, 1, 2),
+(8, 0, 1, 1),
+(9, 0, 1, 2),
+(10, 0, 1, 2), 
+(11, 0, 1, 2),  
+(12, 0, 0, 1),  
+(13, 0, 1, 1);   
+
+
+-- change tracking for incremental firestore backups: writer xid per row, delete log, watermarks
+
+alter table users add column if not exists change_xid bigint;
+alter table games add column if not exists change_xid bigint;
+alter table player_games add column if not exists change_xid bigint;
+alter table teams add column if not exists change_xid bigint;
+alter table team_members add column if not exists change_xid bigint;
+alter table tournaments add column if not exists change_xid bigint;
+alter table tournament_participants add column if not exists change_xid bigint;
+alter table matches add column if not exists change_xid bigint;
+alter table player_stats add column if not exists change_xid bigint;
+
+create or replace function set_change_xid() returns trigger as $$
+begin
+    new.change_xid := pg_current_xact_id()::text::bigint;
+    return new;
+end;
+$$ language plpgsql;
+
+create trigger trg_change_xid_users
+before insert or update on users
+for each row execute function set_change_xid();
+
+create trigger trg_change_xid_games
+before insert or update on games
+for each row execute function set_change_xid();
+
+create trigger trg_change_xid_player_games
+before insert or update on player_games
+for each row execute function set_change_xid();
+
+create trigger trg_change_xid_teams
+before insert or update on teams
+for each row execute function set_change_xid();
+
+create trigger trg_change_xid_team_members
+before insert or update on team_members
+for each row execute function set_change_xid();
+
+create trigger trg_change_xid_tournaments
+before insert or update on tournaments
+for each row execute function set_change_xid();
+
+create trigger trg_change_xid_tournament_participants
+before insert or update on tournament_participants
+for each row execute function set_change_xid();
+
+create trigger trg_change_xid_matches
+before insert or update on matches
+for each row execute function set_change_xid();
+
+create trigger trg_change_xid_player_stats
+before insert or update on player_stats
+for each row execute function set_change_xid();
+
+update users set change_xid = 0 where change_xid is null;
+update games set change_xid = 0 where change_xid is null;
+update player_games set change_xid = 0 where change_xid is null;
+update teams set change_xid = 0 where change_xid is null;
+update team_members set change_xid = 0 where change_xid is null;
+update tournaments set change_xid = 0 where change_xid is null;
+update tournament_participants set change_xid = 0 where change_xid is null;
+update matches set change_xid = 0 where change_xid is null;
+update player_stats set change_xid = 0 where change_xid is null;
+
+create index idx_users_change_xid on users(change_xid);
+create index idx_games_change_xid on games(change_xid);
+create index idx_player_games_change_xid on player_games(change_xid);
+create index idx_teams_change_xid on teams(change_xid);
+create index idx_team_members_change_xid on team_members(change_xid);
+create index idx_tournaments_change_xid on tournaments(change_xid);
+create index idx_tournament_participants_change_xid on tournament_participants(change_xid);
+create index idx_matches_change_xid on matches(change_xid);
+create index idx_player_stats_change_xid on player_stats(change_xid);
+
+create table deleted_rows (
+    id bigserial primary key,
+    table_name varchar(50) not null,
+    doc_id varchar(200) not null,
+    change_xid bigint not null default pg_current_xact_id()::text::bigint,
+    deleted_at timestamp default current_timestamp
+);
+
+create index idx_deleted_rows_table_xid on deleted_rows(table_name, change_xid);
+
+-- trigger arguments are the primary key columns, joined like the firestore document ids
+create or replace function log_deleted_row() returns trigger as $$
+declare
+    key_values text[] := '{}';
+    col text;
+begin
+    foreach col in array tg_argv loop
+        key_values := key_values || (to_jsonb(old) ->> col);
+    end loop;
+    insert into deleted_rows (table_name, doc_id)
+    values (tg_table_name, array_to_string(key_values, '_'));
+    return old;
+end;
+$$ language plpgsql;
+
+create trigger trg_log_deleted_users
+after delete on users
+for each row execute function log_deleted_row('id');
+
+create trigger trg_log_deleted_games
+after delete on games
+for each row execute function log_deleted_row('id');
+
+create trigger trg_log_deleted_player_games
+after delete on player_games
+for each row execute function log_deleted_row('player_id', 'game_id');
+
+create trigger trg_log_deleted_teams
+after delete on teams
+for each row execute function log_deleted_row('id');
+
+create trigger trg_log_deleted_team_members
+after delete on team_members
+for each row execute function log_deleted_row('team_id', 'player_id');
+
+create trigger trg_log_deleted_tournaments
+after delete on tournaments
+for each row execute function log_deleted_row('id');
+
+create trigger trg_log_deleted_tournament_participants
+after delete on tournament_participants
+for each row execute function log_deleted_row('tournament_id', 'player_id');
+
+create trigger trg_log_deleted_matches
+after delete on matches
+for each row execute function log_deleted_row('id');
+
+create trigger trg_log_deleted_player_stats
+after delete on player_stats
+for each row execute function log_deleted_row('player_id');
+
+create table backup_watermarks (
+    table_name varchar(50) primary key,
+    change_xid bigint not null default 0,
+    updated_at timestamp default current_timestamp
+);
+
+create table backup_row_hashes (
+    table_name varchar(50),
+    doc_id varchar(200),
+    row_hash varchar(32) not null,
+    primary key (table_name, doc_id)
+);
+
+
+-- deferrable foreign keys let a bulk restore load tables in any order
+
+alter table player_games alter constraint player_games_player_id_fkey deferrable initially immediate;
+alter table player_games alter constraint player_games_game_id_fkey deferrable initially immediate;
+alter table team_members alter constraint team_members_team_id_fkey deferrable initially immediate;
+alter table team_members alter constraint team_members_player_id_fkey deferrable initially immediate;
+alter table tournaments alter constraint tournaments_game_id_fkey deferrable initially immediate;
+alter table tournaments alter constraint tournaments_created_by_fkey deferrable initially immediate;
+alter table tournaments alter constraint tournaments_winner_id_fkey deferrable initially immediate;
+alter table tournament_participants alter constraint tournament_participants_tournament_id_fkey deferrable initially immediate;
+alter table tournament_participants alter constraint tournament_participants_player_id_fkey deferrable initially immediate;
+alter table matches alter constraint matches_game_id_fkey deferrable initially immediate;
+alter table matches alter constraint matches_player1_id_fkey deferrable initially immediate;
+alter table matches alter constraint matches_player2_id_fkey deferrable initially immediate;
+alter table matches alter constraint matches_winner_id_fkey deferrable initially immediate;
+alter table player_stats alter constraint player_stats_player_id_fkey deferrable initially immediate;
+
+
+-- keyset pagination: match history and roster pages are index range scans on (filter, id)
+
+create index idx_matches_game_id on matches(game_id, id);
+create index idx_matches_player1_id on matches(player1_id, id);
+create index idx_matches_player2_id on matches(player2_id, id);
+create index idx_users_role_id on users(role, id);
+create index idx_users_role_username on users(role, username);
+
+
+-- the game server's match id; the unique constraint makes re-sending a feed harmless
+
+alter table matches add column external_id varchar(100) unique;
+
+
+-- leaderboard: per-board scores and per-wins buckets kept current by triggers (game_id 0 is overall)
+
+create table leaderboard_scores (
+    game_id integer not null,
+    player_id integer not null,
+    wins integer not null default 0,
+    played integer not null default 0,
+    primary key (game_id, player_id)
+);
+
+create index idx_leaderboard_order on leaderboard_scores(game_id, wins desc, player_id);
+
+create table leaderboard_buckets (
+    game_id integer not null,
+    wins integer not null,
+    players integer not null,
+    primary key (game_id, wins)
+);
+
+-- add (game, player, wins, played) deltas; per-game rows go away at zero played
+create or replace function leaderboard_apply(g integer[], p integer[], dw integer[], dp integer[])
+returns void as $$
+begin
+    with delta as (
+        select game_id, player_id, sum(wins)::int as wins, sum(played)::int as played
+        from unnest(g, p, dw, dp) as d(game_id, player_id, wins, played)
+        where game_id is not null and player_id is not null
+        group by game_id, player_id
+    ), changed as (
+        insert into leaderboard_scores (game_id, player_id, wins, played)
+        select game_id, player_id, wins, played from delta
+        order by game_id, player_id
+        on conflict (game_id, player_id) do update
+        set wins = leaderboard_scores.wins + excluded.wins,
+            played = leaderboard_scores.played + excluded.played
+        returning game_id, player_id, wins, played, xmax = 0 as created
+    ), moves as (
+        select c.game_id, c.wins - d.wins as wins, -1 as players
+        from changed c join delta d using (game_id, player_id)
+        where not c.created
+        union all
+        select game_id, wins, 1 from changed where played > 0 or game_id = 0
+    )
+    insert into leaderboard_buckets (game_id, wins, players)
+    select game_id, wins, sum(players) from moves
+    group by game_id, wins
+    having sum(players) <> 0
+    order by game_id, wins
+    on conflict (game_id, wins) do update
+    set players = leaderboard_buckets.players + excluded.players;
+
+    delete from leaderboard_scores s
+    using unnest(g, p) as d(game_id, player_id)
+    where s.game_id = d.game_id and s.player_id = d.player_id
+      and s.game_id <> 0 and s.played <= 0;
+    delete from leaderboard_buckets where game_id = any(g) and players = 0;
+end;
+$$ language plpgsql;
+
+-- everyone in a match played it once and the winner won it; s is +1 or -1
+create or replace function leaderboard_apply_matches(g integer[], p1 integer[], p2 integer[], w integer[], s integer[])
+returns void as $$
+    select leaderboard_apply(array_agg(game_id), array_agg(player_id), array_agg(won), array_agg(played))
+    from (
+        select m.game_id, x.player_id, sum(m.s * (x.player_id = m.w)::int)::int as won, sum(m.s)::int as played
+        from unnest(g, p1, p2, w, s) as m(game_id, p1, p2, w, s)
+        cross join lateral (select distinct unnest(array[m.p1, m.p2, m.w]) as player_id) x
+        group by m.game_id, x.player_id
+    ) d;
+$$ language sql;
+
+create or replace function leaderboard_matches_changed() returns trigger as $$
+declare
+    g integer[] := '{}';
+    p1 integer[] := '{}';
+    p2 integer[] := '{}';
+    w integer[] := '{}';
+    s integer[] := '{}';
+begin
+    if current_setting('gaming_portal.skip_leaderboard', true) = 'on' then
+        return null;
+    end if;
+    if tg_op in ('UPDATE', 'DELETE') then
+        select coalesce(array_agg(game_id), '{}'), coalesce(array_agg(player1_id), '{}'),
+               coalesce(array_agg(player2_id), '{}'), coalesce(array_agg(winner_id), '{}'),
+               coalesce(array_agg(-1), '{}')
+        into g, p1, p2, w, s
+        from old_rows;
+    end if;
+    if tg_op in ('UPDATE', 'INSERT') then
+        select g || coalesce(array_agg(game_id), '{}'), p1 || coalesce(array_agg(player1_id), '{}'),
+               p2 || coalesce(array_agg(player2_id), '{}'), w || coalesce(array_agg(winner_id), '{}'),
+               s || coalesce(array_agg(1), '{}')
+        into g, p1, p2, w, s
+        from new_rows;
+    end if;
+    if cardinality(g) > 0 then
+        perform leaderboard_apply_matches(g, p1, p2, w, s);
+    end if;
+    return null;
+end;
+$$ language plpgsql;
+
+create or replace function leaderboard_stats_changed() returns trigger as $$
+begin
+    if current_setting('gaming_portal.skip_leaderboard', true) = 'on' then
+        return null;
+    end if;
+    if tg_op = 'DELETE' then
+        with removed as (
+            delete from leaderboard_scores s
+            using old_rows o
+            where s.game_id = 0 and s.player_id = o.player_id
+            returning s.wins
+        )
+        update leaderboard_buckets b
+        set players = b.players - r.players
+        from (select wins, count(*)::int as players from removed group by wins) r
+        where b.game_id = 0 and b.wins = r.wins;
+        delete from leaderboard_buckets where game_id = 0 and players = 0;
+    elsif tg_op = 'INSERT' then
+        perform leaderboard_apply(array_agg(0), array_agg(player_id),
+                                  array_agg(coalesce(matches_won, 0)), array_agg(coalesce(total_matches, 0)))
+        from new_rows
+        having count(*) > 0;
+    else
+        perform leaderboard_apply(array_agg(0), array_agg(n.player_id),
+                                  array_agg(coalesce(n.matches_won, 0) - coalesce(o.matches_won, 0)),
+                                  array_agg(coalesce(n.total_matches, 0) - coalesce(o.total_matches, 0)))
+        from new_rows n join old_rows o using (player_id)
+        where n.matches_won is distinct from o.matches_won
+           or n.total_matches is distinct from o.total_matches
+        having count(*) > 0;
+    end if;
+    return null;
+end;
+$$ language plpgsql;
+
+create trigger trg_leaderboard_matches_insert
+after insert on matches referencing new table as new_rows
+for each statement execute function leaderboard_matches_changed();
+
+create trigger trg_leaderboard_matches_update
+after update on matches referencing old table as old_rows new table as new_rows
+for each statement execute function leaderboard_matches_changed();
+
+create trigger trg_leaderboard_matches_delete
+after delete on matches referencing old table as old_rows
+for each statement execute function leaderboard_matches_changed();
+
+create trigger trg_leaderboard_stats_insert
+after insert on player_stats referencing new table as new_rows
+for each statement execute function leaderboard_stats_changed();
+
+create trigger trg_leaderboard_stats_update
+after update on player_stats referencing old table as old_rows new table as new_rows
+for each statement execute function leaderboard_stats_changed();
+
+create trigger trg_leaderboard_stats_delete
+after delete on player_stats referencing old table as old_rows
+for each statement execute function leaderboard_stats_changed();
+
+-- keep the leaderboard current even under session_replication_role = replica
+alter table matches enable always trigger trg_leaderboard_matches_insert;
+alter table matches enable always trigger trg_leaderboard_matches_update;
+alter table matches enable always trigger trg_leaderboard_matches_delete;
+alter table player_stats enable always trigger trg_leaderboard_stats_insert;
+alter table player_stats enable always trigger trg_leaderboard_stats_update;
+alter table player_stats enable always trigger trg_leaderboard_stats_delete;
+
+-- recompute both tables from scratch after a restore
+create or replace function rebuild_leaderboard() returns void as $$
+begin
+    lock table leaderboard_scores, leaderboard_buckets in exclusive mode;
+    delete from leaderboard_scores;
+    delete from leaderboard_buckets;
+
+    insert into leaderboard_scores (game_id, player_id, wins, played)
+    select 0, player_id, coalesce(matches_won, 0), coalesce(total_matches, 0)
+    from player_stats;
+
+    insert into leaderboard_scores (game_id, player_id, wins, played)
+    select m.game_id, x.player_id, sum((x.player_id = m.winner_id)::int), count(*)
+    from matches m
+    cross join lateral (select distinct unnest(array[m.player1_id, m.player2_id, m.winner_id]) as player_id) x
+    where m.game_id is not null and x.player_id is not null
+    group by m.game_id, x.player_id;
+
+    insert into leaderboard_buckets (game_id, wins, players)
+    select game_id, wins, count(*) from leaderboard_scores group by game_id, wins;
+end;
+$$ language plpgsql;
+
+select rebuild_leaderboard();
+
+
+-- Elo ratings per player per game; match_ratings keeps each match's change for undo
+
+create table player_ratings (
+    game_id integer references games(id) on delete cascade,
+    player_id integer references users(id) on delete cascade,
+    rating double precision not null default 1500,
+    matches integer not null default 0,
+    primary key (game_id, player_id)
+);
+
+create table match_ratings (
+    match_id integer primary key references matches(id) on delete cascade,
+    player1_delta double precision not null,
+    player2_delta double precision not null
+);
+
+
+-- a winner who is neither player, for reconcile_player_stats(); empty in normal use
+create index idx_matches_outside_winner on matches(winner_id)
+where winner_id is distinct from player1_id and winner_id is distinct from player2_id;
+
+
+-- backup tables outlive the rows they point at, so no foreign keys into the live tables
+alter table player_games_backup drop constraint if exists player_games_backup_player_id_fkey;
+alter table player_games_backup drop constraint if exists player_games_backup_game_id_fkey;
+alter table team_members_backup drop constraint if exists team_members_backup_team_id_fkey;
+alter table team_members_backup drop constraint if exists team_members_backup_player_id_fkey;
+alter table tournaments_backup drop constraint if exists tournaments_backup_game_id_fkey;
+alter table tournaments_backup drop constraint if exists tournaments_backup_created_by_fkey;
+alter table tournaments_backup drop constraint if exists tournaments_backup_winner_id_fkey;
+alter table tournament_participants_backup drop constraint if exists tournament_participants_backup_tournament_id_fkey;
+alter table tournament_participants_backup drop constraint if exists tournament_participants_backup_player_id_fkey;
+alter table matches_backup drop constraint if exists matches_backup_game_id_fkey;
+alter table matches_backup drop constraint if exists matches_backup_player1_id_fkey;
+alter table matches_backup drop constraint if exists matches_backup_player2_id_fkey;
+alter table matches_backup drop constraint if exists matches_backup_winner_id_fkey;
+alter table player_stats_backup drop constraint if exists player_stats_backup_player_id_fkey;
+
+-- indexes for the foreign key checks when users are deleted
+drop index if exists idx_matches_outside_winner;
+create index idx_matches_winner_id on matches(winner_id);
+create index idx_player_ratings_player on player_ratings(player_id);
+
+
+-- game list edits set gaming_portal.skip_backup rather than disabling the trigger
+create or replace function backup_player_games() returns trigger as $$
+begin
+    if current_setting('gaming_portal.skip_backup', true) = 'on' then
+        return old;
+    end if;
+    insert into player_games_backup (player_id, game_id)
+    values (old.player_id, old.game_id);
+    return old;
+end;
+$$ language plpgsql;
+
+
+-- statement-level backup and deletion-log triggers over the transition table
+
+drop trigger if exists trg_backup_users on users;
+drop trigger if exists trg_log_deleted_users on users;
+drop trigger if exists trg_backup_games on games;
+drop trigger if exists trg_log_deleted_games on games;
+drop trigger if exists trg_backup_player_games on player_games;
+drop trigger if exists trg_log_deleted_player_games on player_games;
+drop trigger if exists trg_backup_teams on teams;
+drop trigger if exists trg_log_deleted_teams on teams;
+drop trigger if exists trg_backup_team_members on team_members;
+drop trigger if exists trg_log_deleted_team_members on team_members;
+drop trigger if exists trg_backup_tournaments on tournaments;
+drop trigger if exists trg_log_deleted_tournaments on tournaments;
+drop trigger if exists trg_backup_tournament_participants on tournament_participants;
+drop trigger if exists trg_log_deleted_tournament_participants on tournament_participants;
+drop trigger if exists trg_backup_matches on matches;
+drop trigger if exists trg_log_deleted_matches on matches;
+drop trigger if exists trg_backup_player_stats on player_stats;
+drop trigger if exists trg_log_deleted_player_stats on player_stats;
+drop function if exists log_deleted_row();
+
+create or replace function backup_users() returns trigger as $$
+begin
+    if current_setting('gaming_portal.skip_backup', true) = 'on' then
+        return null;
+    end if;
+    insert into users_backup (id, username, password, role, created_at)
+    select id, username, password, role, created_at from old_rows;
+    return null;
+end;
+$$ language plpgsql;
+
+create trigger trg_backup_users
+after delete on users referencing old table as old_rows
+for each statement execute function backup_users();
+
+create or replace function backup_games() returns trigger as $$
+begin
+    if current_setting('gaming_portal.skip_backup', true) = 'on' then
+        return null;
+    end if;
+    insert into games_backup (id, name)
+    select id, name from old_rows;
+    return null;
+end;
+$$ language plpgsql;
+
+create trigger trg_backup_games
+after delete on games referencing old table as old_rows
+for each statement execute function backup_games();
+
+create or replace function backup_player_games() returns trigger as $$
+begin
+    if current_setting('gaming_portal.skip_backup', true) = 'on' then
+        return null;
+    end if;
+    insert into player_games_backup (player_id, game_id)
+    select player_id, game_id from old_rows;
+    return null;
+end;
+$$ language plpgsql;
+
+create trigger trg_backup_player_games
+after delete on player_games referencing old table as old_rows
+for each statement execute function backup_player_games();
+
+create or replace function backup_teams() returns trigger as $$
+begin
+    if current_setting('gaming_portal.skip_backup', true) = 'on' then
+        return null;
+    end if;
+    insert into teams_backup (id, name, created_at)
+    select id, name, created_at from old_rows;
+    return null;
+end;
+$$ language plpgsql;
+
+create trigger trg_backup_teams
+after delete on teams referencing old table as old_rows
+for each statement execute function backup_teams();
+
+create or replace function backup_team_members() returns trigger as $$
+begin
+    if current_setting('gaming_portal.skip_backup', true) = 'on' then
+        return null;
+    end if;
+    insert into team_members_backup (team_id, player_id, joined_at)
+    select team_id, player_id, joined_at from old_rows;
+    return null;
+end;
+$$ language plpgsql;
+
+create trigger trg_backup_team_members
+after delete on team_members referencing old table as old_rows
+for each statement execute function backup_team_members();
+
+create or replace function backup_tournaments() returns trigger as $$
+begin
+    if current_setting('gaming_portal.skip_backup', true) = 'on' then
+        return null;
+    end if;
+    insert into tournaments_backup (id, name, game_id, created_by, created_at, winner_id)
+    select id, name, game_id, created_by, created_at, winner_id from old_rows;
+    return null;
+end;
+$$ language plpgsql;
+
+create trigger trg_backup_tournaments
+after delete on tournaments referencing old table as old_rows
+for each statement execute function backup_tournaments();
+
+create or replace function backup_tournament_participants() returns trigger as $$
+begin
+    if current_setting('gaming_portal.skip_backup', true) = 'on' then
+        return null;
+    end if;
+    insert into tournament_participants_backup (tournament_id, player_id, registered_at)
+    select tournament_id, player_id, registered_at from old_rows;
+    return null;
+end;
+$$ language plpgsql;
+
+create trigger trg_backup_tournament_participants
+after delete on tournament_participants referencing old table as old_rows
+for each statement execute function backup_tournament_participants();
+
+create or replace function backup_matches() returns trigger as $$
+begin
+    if current_setting('gaming_portal.skip_backup', true) = 'on' then
+        return null;
+    end if;
+    insert into matches_backup (id, game_id, player1_id, player2_id, winner_id, match_type, created_at)
+    select id, game_id, player1_id, player2_id, winner_id, match_type, created_at from old_rows;
+    return null;
+end;
+$$ language plpgsql;
+
+create trigger trg_backup_matches
+after delete on matches referencing old table as old_rows
+for each statement execute function backup_matches();
+
+create or replace function backup_player_stats() returns trigger as $$
+begin
+    if current_setting('gaming_portal.skip_backup', true) = 'on' then
+        return null;
+    end if;
+    insert into player_stats_backup (player_id, tournaments_won, matches_won, total_matches)
+    select player_id, tournaments_won, matches_won, total_matches from old_rows;
+    return null;
+end;
+$$ language plpgsql;
+
+create trigger trg_backup_player_stats
+after delete on player_stats referencing old table as old_rows
+for each statement execute function backup_player_stats();
+
+create or replace function log_deleted_rows() returns trigger as $$
+begin
+    insert into deleted_rows (table_name, doc_id)
+    select tg_table_name,
+           array_to_string(array(select r ->> col from unnest(tg_argv) with ordinality as key(col, n) order by n), '_')
+    from (select to_jsonb(o) as r from old_rows o) deleted;
+    return null;
+end;
+$$ language plpgsql;
+
+create trigger trg_log_deleted_users
+after delete on users referencing old table as old_rows
+for each statement execute function log_deleted_rows('id');
+
+create trigger trg_log_deleted_games
+after delete on games referencing old table as old_rows
+for each statement execute function log_deleted_rows('id');
+
+create trigger trg_log_deleted_player_games
+after delete on player_games referencing old table as old_rows
+for each statement execute function log_deleted_rows('player_id', 'game_id');
+
+create trigger trg_log_deleted_teams
+after delete on teams referencing old table as old_rows
+for each statement execute function log_deleted_rows('id');
+
+create trigger trg_log_deleted_team_members
+after delete on team_members referencing old table as old_rows
+for each statement execute function log_deleted_rows('team_id', 'player_id');
+
+create trigger trg_log_deleted_tournaments
+after delete on tournaments referencing old table as old_rows
+for each statement execute function log_deleted_rows('id');
+
+create trigger trg_log_deleted_tournament_participants
+after delete on tournament_participants referencing old table as old_rows
+for each statement execute function log_deleted_rows('tournament_id', 'player_id');
+
+create trigger trg_log_deleted_matches
+after delete on matches referencing old table as old_rows
+for each statement execute function log_deleted_rows('id');
+
+create trigger trg_log_deleted_player_stats
+after delete on player_stats referencing old table as old_rows
+for each statement execute function log_deleted_rows('player_id');
+
+
+-- tombstones: *_backup tables partitioned by month of deletion, deletion_batch = deleting transaction
+
+create sequence tombstone_ids;
+
+create temp table users_backup_rows as select id, username, password, role, created_at from users_backup;
+drop table users_backup;
+
+create table users_backup (
+    id integer,
+    username varchar(50),
+    password varchar(255),
+    role varchar(20),
+    created_at timestamp,
+    tombstone_id bigint not null default nextval('tombstone_ids'),
+    deletion_batch bigint not null default pg_current_xact_id()::text::bigint,
+    deleted_at timestamp not null default current_timestamp,
+    primary key (tombstone_id, deleted_at)
+) partition by range (deleted_at);
+
+create table users_backup_default partition of users_backup default;
+create index idx_users_backup_deleted on users_backup(deleted_at, tombstone_id);
+create index idx_users_backup_batch on users_backup(deletion_batch);
+create index idx_users_backup_id on users_backup(id);
+
+create temp table games_backup_rows as select id, name from games_backup;
+drop table games_backup;
+
+create table games_backup (
+    id integer,
+    name varchar(50),
+    tombstone_id bigint not null default nextval('tombstone_ids'),
+    deletion_batch bigint not null default pg_current_xact_id()::text::bigint,
+    deleted_at timestamp not null default current_timestamp,
+    primary key (tombstone_id, deleted_at)
+) partition by range (deleted_at);
+
+create table games_backup_default partition of games_backup default;
+create index idx_games_backup_deleted on games_backup(deleted_at, tombstone_id);
+create index idx_games_backup_batch on games_backup(deletion_batch);
+create index idx_games_backup_id on games_backup(id);
+
+create temp table player_games_backup_rows as select player_id, game_id from player_games_backup;
+drop table player_games_backup;
+
+create table player_games_backup (
+    player_id integer,
+    game_id integer,
+    tombstone_id bigint not null default nextval('tombstone_ids'),
+    deletion_batch bigint not null default pg_current_xact_id()::text::bigint,
+    deleted_at timestamp not null default current_timestamp,
+    primary key (tombstone_id, deleted_at)
+) partition by range (deleted_at);
+
+create table player_games_backup_default partition of player_games_backup default;
+create index idx_player_games_backup_deleted on player_games_backup(deleted_at, tombstone_id);
+create index idx_player_games_backup_batch on player_games_backup(deletion_batch);
+create index idx_player_games_backup_player_id on player_games_backup(player_id);
+
+create temp table teams_backup_rows as select id, name, created_at from teams_backup;
+drop table teams_backup;
+
+create table teams_backup (
+    id integer,
+    name varchar(100),
+    created_at timestamp,
+    tombstone_id bigint not null default nextval('tombstone_ids'),
+    deletion_batch bigint not null default pg_current_xact_id()::text::bigint,
+    deleted_at timestamp not null default current_timestamp,
+    primary key (tombstone_id, deleted_at)
+) partition by range (deleted_at);
+
+create table teams_backup_default partition of teams_backup default;
+create index idx_teams_backup_deleted on teams_backup(deleted_at, tombstone_id);
+create index idx_teams_backup_batch on teams_backup(deletion_batch);
+create index idx_teams_backup_id on teams_backup(id);
+
+create temp table team_members_backup_rows as select team_id, player_id, joined_at from team_members_backup;
+drop table team_members_backup;
+
+create table team_members_backup (
+    team_id integer,
+    player_id integer,
+    joined_at timestamp,
+    tombstone_id bigint not null default nextval('tombstone_ids'),
+    deletion_batch bigint not null default pg_current_xact_id()::text::bigint,
+    deleted_at timestamp not null default current_timestamp,
+    primary key (tombstone_id, deleted_at)
+) partition by range (deleted_at);
+
+create table team_members_backup_default partition of team_members_backup default;
+create index idx_team_members_backup_deleted on team_members_backup(deleted_at, tombstone_id);
+create index idx_team_members_backup_batch on team_members_backup(deletion_batch);
+create index idx_team_members_backup_player_id on team_members_backup(player_id);
+
+create temp table tournaments_backup_rows as select id, name, game_id, created_by, created_at, winner_id from tournaments_backup;
+drop table tournaments_backup;
+
+create table tournaments_backup (
+    id integer,
+    name varchar(100),
+    game_id integer,
+    created_by integer,
+    created_at timestamp,
+    winner_id integer,
+    tombstone_id bigint not null default nextval('tombstone_ids'),
+    deletion_batch bigint not null default pg_current_xact_id()::text::bigint,
+    deleted_at timestamp not null default current_timestamp,
+    primary key (tombstone_id, deleted_at)
+) partition by range (deleted_at);
+
+create table tournaments_backup_default partition of tournaments_backup default;
+create index idx_tournaments_backup_deleted on tournaments_backup(deleted_at, tombstone_id);
+create index idx_tournaments_backup_batch on tournaments_backup(deletion_batch);
+create index idx_tournaments_backup_id on tournaments_backup(id);
+
+create temp table tournament_participants_backup_rows as select tournament_id, player_id, registered_at from tournament_participants_backup;
+drop table tournament_participants_backup;
+
+create table tournament_participants_backup (
+    tournament_id integer,
+    player_id integer,
+    registered_at timestamp,
+    tombstone_id bigint not null default nextval('tombstone_ids'),
+    deletion_batch bigint not null default pg_current_xact_id()::text::bigint,
+    deleted_at timestamp not null default current_timestamp,
+    primary key (tombstone_id, deleted_at)
+) partition by range (deleted_at);
+
+create table tournament_participants_backup_default partition of tournament_participants_backup default;
+create index idx_tournament_participants_backup_deleted on tournament_participants_backup(deleted_at, tombstone_id);
+create index idx_tournament_participants_backup_batch on tournament_participants_backup(deletion_batch);
+create index idx_tournament_participants_backup_tournament_id on tournament_participants_backup(tournament_id);
+
+create temp table matches_backup_rows as select id, game_id, player1_id, player2_id, winner_id, match_type, created_at from matches_backup;
+drop table matches_backup;
+
+create table matches_backup (
+    id integer,
+    game_id integer,
+    player1_id integer,
+    player2_id integer,
+    winner_id integer,
+    match_type varchar(20),
+    created_at timestamp,
+    external_id varchar(100),
+    tombstone_id bigint not null default nextval('tombstone_ids'),
+    deletion_batch bigint not null default pg_current_xact_id()::text::bigint,
+    deleted_at timestamp not null default current_timestamp,
+    primary key (tombstone_id, deleted_at)
+) partition by range (deleted_at);
+
+create table matches_backup_default partition of matches_backup default;
+create index idx_matches_backup_deleted on matches_backup(deleted_at, tombstone_id);
+create index idx_matches_backup_batch on matches_backup(deletion_batch);
+create index idx_matches_backup_id on matches_backup(id);
+
+create temp table player_stats_backup_rows as select player_id, tournaments_won, matches_won, total_matches from player_stats_backup;
+drop table player_stats_backup;
+
+create table player_stats_backup (
+    player_id integer,
+    tournaments_won integer,
+    matches_won integer,
+    total_matches integer,
+    tombstone_id bigint not null default nextval('tombstone_ids'),
+    deletion_batch bigint not null default pg_current_xact_id()::text::bigint,
+    deleted_at timestamp not null default current_timestamp,
+    primary key (tombstone_id, deleted_at)
+) partition by range (deleted_at);
+
+create table player_stats_backup_default partition of player_stats_backup default;
+create index idx_player_stats_backup_deleted on player_stats_backup(deleted_at, tombstone_id);
+create index idx_player_stats_backup_batch on player_stats_backup(deletion_batch);
+create index idx_player_stats_backup_player_id on player_stats_backup(player_id);
+
+create or replace function tombstone_tables() returns text[] as $$
+    select array['users_backup', 'games_backup', 'player_games_backup', 'teams_backup', 'team_members_backup',
+                 'tournaments_backup', 'tournament_participants_backup', 'matches_backup', 'player_stats_backup'];
+$$ language sql immutable;
+
+-- create this month's partition and the next months_ahead ones
+create or replace function ensure_tombstone_partitions(months_ahead integer default 2) returns integer as $$
+declare
+    parent text;
+    first_day date;
+    next_day date;
+    overlap boolean;
+    created integer := 0;
+begin
+    foreach parent in array tombstone_tables() loop
+        for i in 0..months_ahead loop
+            first_day := (date_trunc('month', current_date) + make_interval(months => i))::date;
+            next_day := (first_day + interval '1 month')::date;
+            continue when to_regclass(parent || '_' || to_char(first_day, 'YYYY_MM')) is not null;
+            execute format('select exists (select 1 from %I where deleted_at >= %L and deleted_at < %L)',
+                           parent || '_default', first_day, next_day) into overlap;
+            continue when overlap;
+            execute format('create table %I partition of %I for values from (%L) to (%L)',
+                           parent || '_' || to_char(first_day, 'YYYY_MM'), parent, first_day, next_day);
+            created := created + 1;
+        end loop;
+    end loop;
+    return created;
+end;
+$$ language plpgsql;
+
+-- drop the monthly partitions that ended before now() - keep, and expired default-partition rows
+create or replace function purge_tombstones(keep interval)
+returns table (partition_name text, tombstones bigint) as $$
+declare
+    parent text;
+    child text;
+    cutoff timestamp := current_timestamp - keep;
+begin
+    foreach parent in array tombstone_tables() loop
+        for child in
+            select c.relname from pg_inherits i join pg_class c on c.oid = i.inhrelid
+            where i.inhparent = parent::regclass and c.relname <> parent || '_default'
+              and to_date(right(c.relname, 7), 'YYYY_MM') + interval '1 month' <= cutoff
+            order by c.relname
+        loop
+            partition_name := child;
+            execute format('select count(*) from %I', child) into tombstones;
+            execute format('drop table %I', child);
+            return next;
+        end loop;
+
+        partition_name := parent || '_default';
+        execute format('with purged as (delete from %I where deleted_at < %L returning 1) select count(*) from purged',
+                       partition_name, cutoff) into tombstones;
+        if tombstones > 0 then
+            return next;
+        end if;
+    end loop;
+end;
+$$ language plpgsql;
+
+select ensure_tombstone_partitions();
+
+insert into users_backup (id, username, password, role, created_at) select id, username, password, role, created_at from users_backup_rows;
+insert into games_backup (id, name) select id, name from games_backup_rows;
+insert into player_games_backup (player_id, game_id) select player_id, game_id from player_games_backup_rows;
+insert into teams_backup (id, name, created_at) select id, name, created_at from teams_backup_rows;
+insert into team_members_backup (team_id, player_id, joined_at) select team_id, player_id, joined_at from team_members_backup_rows;
+insert into tournaments_backup (id, name, game_id, created_by, created_at, winner_id) select id, name, game_id, created_by, created_at, winner_id from tournaments_backup_rows;
+insert into tournament_participants_backup (tournament_id, player_id, registered_at) select tournament_id, player_id, registered_at from tournament_participants_backup_rows;
+insert into matches_backup (id, game_id, player1_id, player2_id, winner_id, match_type, created_at) select id, game_id, player1_id, player2_id, winner_id, match_type, created_at from matches_backup_rows;
+insert into player_stats_backup (player_id, tournaments_won, matches_won, total_matches) select player_id, tournaments_won, matches_won, total_matches from player_stats_backup_rows;
+
+drop table users_backup_rows;
+drop table games_backup_rows;
+drop table player_games_backup_rows;
+drop table teams_backup_rows;
+drop table team_members_backup_rows;
+drop table tournaments_backup_rows;
+drop table tournament_participants_backup_rows;
+drop table matches_backup_rows;
+drop table player_stats_backup_rows;
+
+-- a restored match keeps its feed id, so sending the feed again still skips it
+create or replace function backup_matches() returns trigger as $$
+begin
+    if current_setting('gaming_portal.skip_backup', true) = 'on' then
+        return null;
+    end if;
+    insert into matches_backup (id, game_id, player1_id, player2_id, winner_id, match_type, created_at, external_id)
+    select id, game_id, player1_id, player2_id, winner_id, match_type, created_at, external_id from old_rows;
+    return null;
+end;
+$$ language plpgsql;
+
+-- a deleted player's tournament wins, put back when the player is restored
+create table tournament_winners_backup (
+    tournament_id integer,
+    winner_id integer,
+    tombstone_id bigint not null default nextval('tombstone_ids'),
+    deletion_batch bigint not null default pg_current_xact_id()::text::bigint,
+    deleted_at timestamp not null default current_timestamp,
+    primary key (tombstone_id, deleted_at)
+) partition by range (deleted_at);
+
+create table tournament_winners_backup_default partition of tournament_winners_backup default;
+create index idx_tournament_winners_backup_deleted on tournament_winners_backup(deleted_at, tombstone_id);
+create index idx_tournament_winners_backup_batch on tournament_winners_backup(deletion_batch);
+
+create or replace function tombstone_tables() returns text[] as $$
+    select array['users_backup', 'games_backup', 'player_games_backup', 'teams_backup', 'team_members_backup',
+                 'tournaments_backup', 'tournament_participants_backup', 'matches_backup', 'player_stats_backup',
+                 'tournament_winners_backup'];
+$$ language sql immutable;
+
+select ensure_tombstone_partitions();
+
+
+-- rows per block of 1024 ids (ID_BLOCK in the app), so a jump to any position of a list is a seek
+create table id_blocks (
+    listing text not null,
+    block bigint not null,
+    entries integer not null,
+    primary key (listing, block)
+);
+
+-- trigger arguments: the listing, its id column and an optional row filter
+create or replace function count_id_blocks() returns trigger as $$
+declare
+    upsert text := 'insert into id_blocks (listing, block, entries)
+                    select %L, %I / 1024, %s * count(*) from %I where %s group by 2
+                    on conflict (listing, block) do update set entries = id_blocks.entries + excluded.entries';
+begin
+    if current_setting('gaming_portal.skip_id_blocks', true) = 'on' then
+        return null;
+    end if;
+    if tg_op in ('UPDATE', 'DELETE') then
+        execute format(upsert, tg_argv[0], tg_argv[1], -1, 'old_rows', coalesce(tg_argv[2], 'true'));
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        execute format(upsert, tg_argv[0], tg_argv[1], 1, 'new_rows', coalesce(tg_argv[2], 'true'));
+    end if;
+    return null;
+end;
+$$ language plpgsql;
+
+create trigger trg_id_blocks_users_insert
+after insert on users referencing new table as new_rows
+for each statement execute function count_id_blocks('users', 'id', 'role = ''player''');
+
+create trigger trg_id_blocks_users_update
+after update on users referencing old table as old_rows new table as new_rows
+for each statement execute function count_id_blocks('users', 'id', 'role = ''player''');
+
+create trigger trg_id_blocks_users_delete
+after delete on users referencing old table as old_rows
+for each statement execute function count_id_blocks('users', 'id', 'role = ''player''');
+
+create trigger trg_id_blocks_matches_insert
+after insert on matches referencing new table as new_rows
+for each statement execute function count_id_blocks('matches', 'id');
+
+create trigger trg_id_blocks_matches_delete
+after delete on matches referencing old table as old_rows
+for each statement execute function count_id_blocks('matches', 'id');
+
+do $$
+declare
+    parent text;
+begin
+    foreach parent in array tombstone_tables() loop
+        execute format('create trigger %I after insert on %I referencing new table as new_rows
+                        for each statement execute function count_id_blocks(%L, %L)',
+                       'trg_id_blocks_' || parent || '_insert', parent, parent, 'tombstone_id');
+        execute format('create trigger %I after delete on %I referencing old table as old_rows
+                        for each statement execute function count_id_blocks(%L, %L)',
+                       'trg_id_blocks_' || parent || '_delete', parent, parent, 'tombstone_id');
+    end loop;
+end;
+$$;
+
+-- recompute every listing from scratch after a restore
+create or replace function rebuild_id_blocks() returns void as $$
+declare
+    parent text;
+begin
+    lock table id_blocks in exclusive mode;
+    delete from id_blocks;
+    insert into id_blocks (listing, block, entries)
+    select 'users', id / 1024, count(*) from users where role = 'player' group by 2;
+    insert into id_blocks (listing, block, entries)
+    select 'matches', id / 1024, count(*) from matches group by 2;
+    foreach parent in array tombstone_tables() loop
+        execute format('insert into id_blocks (listing, block, entries)
+                        select %L, tombstone_id / 1024, count(*) from %I group by 2', parent, parent);
+    end loop;
+end;
+$$ language plpgsql;
+
+select rebuild_id_blocks();
+
+-- an expired month leaves the block counts with its partition
+create or replace function purge_tombstones(keep interval)
+returns table (partition_name text, tombstones bigint) as $$
+declare
+    parent text;
+    child text;
+    cutoff timestamp := current_timestamp - keep;
+    uncount text := 'insert into id_blocks (listing, block, entries)
+                     select %L, tombstone_id / 1024, -count(*) from %I where deleted_at < %L group by 2
+                     on conflict (listing, block) do update set entries = id_blocks.entries + excluded.entries';
+begin
+    foreach parent in array tombstone_tables() loop
+        for child in
+            select c.relname from pg_inherits i join pg_class c on c.oid = i.inhrelid
+            where i.inhparent = parent::regclass and c.relname <> parent || '_default'
+              and to_date(right(c.relname, 7), 'YYYY_MM') + interval '1 month' <= cutoff
+            order by c.relname
+        loop
+            partition_name := child;
+            execute format('select count(*) from %I', child) into tombstones;
+            execute format(uncount, parent, child, cutoff);
+            execute format('drop table %I', child);
+            return next;
+        end loop;
+
+        partition_name := parent || '_default';
+        execute format(uncount, parent, partition_name, cutoff);
+        execute format('with purged as (delete from %I where deleted_at < %L returning 1) select count(*) from purged',
+                       partition_name, cutoff) into tombstones;
+        if tombstones > 0 then
+            return next;
+        end if;
+    end loop;
+end;
+$$ language plpgsql;
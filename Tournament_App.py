@@ -1,1477 +1,5236 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
-import psycopg2
-from configparser import ConfigParser
-from firebase_admin import credentials, firestore
-import firebase_admin
-
-
-def config(filename='database.ini', section='postgresql'):
-    parser = ConfigParser()
-    parser.read(filename)
-    db = {}
-    if parser.has_section(section):
-        params = parser.items(section)
-        for param in params:
-            db[param[0]] = param[1]
-    else:
-        raise Exception(f'Section {section} not found in {filename}')
-    return db
-
-
-def get_db_connection():
-    try:
-        params = config()
-        connection = psycopg2.connect(**params)
-        return connection
-    except Exception as e:
-        print(f"Error connecting to PostgreSQL: {e}")
-        return None
-
-
-def backup_database():
-    
-    try:
-        if not firebase_admin._apps:
-            cred = credentials.Certificate("C:/Users/idekb/OneDrive/Desktop/Project/player-portal-backup-firebase-adminsdk-fbsvc-ff02727fc1.json")
-            firebase_admin.initialize_app(cred)
-        db = firestore.client()
-    except Exception as e:
-        messagebox.showerror("Firebase Error", f"Error initializing Firebase:\n{e}")
-        return
-
-   
-    conn = get_db_connection()
-    if conn is None:
-        messagebox.showerror("Database Error", "Could not connect to PostgreSQL database.")
-        return
-
-    cursor = conn.cursor()
-
-
-    tables = {
-        "users": "users",
-        "games": "games",
-        "player_games": "player_games",
-        "teams": "teams",
-        "team_members": "team_members",
-        "tournaments": "tournaments",
-        "tournament_participants": "tournament_participants",
-        "matches": "matches",
-        "player_stats": "player_stats"
-    }
-
-
-    try:
-        for table, collection in tables.items():
-
-            cursor.execute(f"SELECT * FROM {table}")
-            rows = cursor.fetchall()
-
-            columns = [desc[0] for desc in cursor.description]
-            for row in rows:
-                data = dict(zip(columns, row))
-                db.collection(collection).add(data)
-        messagebox.showinfo("Success", "Database backed up to Firebase successfully.")
-
-    except Exception as e:
-        messagebox.showerror("Backup Error", f"Error during backup:\n{e}")
-    finally:
-        cursor.close()
-        conn.close()
-
-
-
-def setup_styles():
-    style = ttk.Style()
-    style.configure('TFrame', background='#f0f0f0')
-    style.configure('TLabel', background='#f0f0f0', font=('Arial', 10))
-    style.configure('TButton', font=('Arial', 10))
-    style.configure('Header.TLabel', font=('Arial', 16, 'bold'))
-    style.configure('TEntry', font=('Arial', 10))
-
-def clear_window(root):
-    for widget in root.winfo_children():
-        widget.destroy()
-
-def get_games():
-    conn = get_db_connection()
-    if conn is None:
-        return []
-    
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM games")
-    games = [row[0] for row in cursor.fetchall()]
-    
-    cursor.close()
-    conn.close()
-    return games
-
-def get_players():
-    conn = get_db_connection()
-    if conn is None:
-        return []
-    
-    cursor = conn.cursor()
-    cursor.execute("SELECT username FROM users WHERE role = 'player'")
-    players = [row[0] for row in cursor.fetchall()]
-    
-    cursor.close()
-    conn.close()
-    return players
-
-def get_teams():
-    conn = get_db_connection()
-    if conn is None:
-        return []
-    
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM teams")
-    teams = [row[0] for row in cursor.fetchall()]
-    
-    cursor.close()
-    conn.close()
-    return teams
-
-def login(root, username_var, password_var):
-    username = username_var.get()
-    password = password_var.get()
-    
-    if not username or not password:
-        messagebox.showerror("Error", "Please fill in all fields")
-        return
-    
-    conn = get_db_connection()
-    if conn is None:
-        return
-    
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, role FROM users WHERE username = %s AND password = %s",
-                  (username, password))
-    user = cursor.fetchone()
-    
-    cursor.close()
-    conn.close()
-    
-    if user:
-        current_user = {'id': user[0], 'username': username, 'role': user[1]}
-        if user[1] == 'admin':
-            show_admin_dashboard(root, current_user)
-        else:
-            show_player_dashboard(root, current_user)
-    else:
-        messagebox.showerror("Error", "Invalid username or password")
-
-def register_user(root, username_var, password_var):
-    username = username_var.get()
-    password = password_var.get()
-    
-    if not username or not password:
-        messagebox.showerror("Error", "Please fill in all fields")
-        return
-    
-    conn = get_db_connection()
-    if conn is None:
-        return
-    
-    cursor = conn.cursor()
-    
-   
-    cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
-    if cursor.fetchone():
-        messagebox.showerror("Error", "Username already exists")
-        cursor.close()
-        conn.close()
-        return
-    
-    
-    cursor.execute("""
-        INSERT INTO users (username, password, role)
-        VALUES (%s, %s, 'player')
-        RETURNING id
-    """, (username, password))
-    
-    user_id = cursor.fetchone()[0]
-    
-    
-    cursor.execute("""
-        INSERT INTO player_stats (player_id)
-        VALUES (%s)
-    """, (user_id,))
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
-    
-    messagebox.showinfo("Success", "Registration successful! Please login.")
-    show_login_window(root)
-
-def show_register_window(root):
-    clear_window(root)
-    
-    main_frame = ttk.Frame(root, padding="20")
-    main_frame.pack(expand=True, fill='both')
-    
-    ttk.Label(main_frame, text="Register New Player", style='Header.TLabel').pack(pady=20)
-    
-    register_frame = ttk.Frame(main_frame)
-    register_frame.pack(pady=10)
-    
-    ttk.Label(register_frame, text="Username:").grid(row=0, column=0, pady=5, padx=5)
-    username_var = tk.StringVar()
-    ttk.Entry(register_frame, textvariable=username_var, width=30).grid(row=0, column=1, pady=5)
-    
-    ttk.Label(register_frame, text="Password:").grid(row=1, column=0, pady=5, padx=5)
-    password_var = tk.StringVar()
-    ttk.Entry(register_frame, textvariable=password_var, width=30, show="*").grid(row=1, column=1, pady=5)
-    
-    ttk.Button(register_frame, text="Register", 
-               command=lambda: register_user(root, username_var, password_var), 
-               width=20).grid(row=2, column=0, columnspan=2, pady=10)
-    
-    ttk.Button(register_frame, text="Back to Login", 
-               command=lambda: show_login_window(root), 
-               width=20).grid(row=3, column=0, columnspan=2, pady=5)
-
-def show_login_window(root):
-    clear_window(root)
-    setup_styles()
-    
-    main_frame = ttk.Frame(root, padding="20")
-    main_frame.pack(expand=True, fill='both')
-    
-    ttk.Label(main_frame, text="Gaming Portal Project", style='Header.TLabel').pack(pady=20)
-    
-    login_frame = ttk.Frame(main_frame)
-    login_frame.pack(pady=10)
-    
-    ttk.Label(login_frame, text="Username:").grid(row=0, column=0, pady=5, padx=5)
-    username_var = tk.StringVar()
-    ttk.Entry(login_frame, textvariable=username_var, width=30).grid(row=0, column=1, pady=5)
-    
-    ttk.Label(login_frame, text="Password:").grid(row=1, column=0, pady=5, padx=5)
-    password_var = tk.StringVar()
-    ttk.Entry(login_frame, textvariable=password_var, width=30, show="*").grid(row=1, column=1, pady=5)
-    
-    ttk.Button(login_frame, text="Login", 
-               command=lambda: login(root, username_var, password_var), 
-               width=20).grid(row=2, column=0, columnspan=2, pady=10)
-    
-    ttk.Button(login_frame, text="Register as Player", 
-               command=lambda: show_register_window(root), 
-               width=20).grid(row=3, column=0, columnspan=2, pady=5)
-    
-    ttk.Button(login_frame, text="View as Spectator", 
-               command=lambda: show_spectator_view(root), 
-               width=20).grid(row=4, column=0, columnspan=2, pady=5)
-
-def show_spectator_view(root):
-    clear_window(root)
-    
-    main_frame = ttk.Frame(root, padding="20")
-    main_frame.pack(expand=True, fill='both')
-    
-    ttk.Label(main_frame, text="Player Statistics", style='Header.TLabel').pack(pady=10)
-    
-    columns = ('Username', 'Tournaments Won', 'Matches Won', 'Total Matches')
-    tree = ttk.Treeview(main_frame, columns=columns, show='headings', height=10)
-    
-    for col in columns:
-        tree.heading(col, text=col)
-        tree.column(col, width=120)
-    
-    tree.pack(pady=10, padx=10, fill='both', expand=True)
-    
-    scrollbar = ttk.Scrollbar(main_frame, orient=tk.VERTICAL, command=tree.yview)
-    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-    tree.configure(yscrollcommand=scrollbar.set)
-    
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT u.username, ps.tournaments_won, ps.matches_won, ps.total_matches
-            FROM users u
-            JOIN player_stats ps ON u.id = ps.player_id
-            WHERE u.role = 'player'
-        """)
-        
-        for row in cursor.fetchall():
-            tree.insert('', tk.END, values=row)
-        
-        cursor.close()
-        conn.close()
-    
-    ttk.Button(main_frame, text="Back to Login", 
-               command=lambda: show_login_window(root)).pack(pady=10)
-
-def fetch_data():
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT u.id, u.username, 
-                   STRING_AGG(g.name, ', ') as games,
-                   t.name as team,
-                   ps.tournaments_won,
-                   ps.matches_won
-            FROM users u
-            LEFT JOIN player_games pg ON u.id = pg.player_id
-            LEFT JOIN games g ON pg.game_id = g.id
-            LEFT JOIN team_members tm ON u.id = tm.player_id
-            LEFT JOIN teams t ON tm.team_id = t.id
-            LEFT JOIN player_stats ps ON u.id = ps.player_id
-            WHERE u.role = 'player'
-            GROUP BY u.id, u.username, t.name, ps.tournaments_won, ps.matches_won
-        """)
-        rows = cur.fetchall()
-        columns = [desc[0] for desc in cur.description]
-        cur.close()
-        conn.close()
-        return columns, rows
-    except Exception as e:
-        print("Database error:", e)
-        return [], []
-
-def refresh_tree(tree):
-    try:
-        for item in tree.get_children():
-            tree.delete(item)
-        
-        conn = get_db_connection()
-        if conn is None:
-            return
-        
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT u.id, u.username, 
-                   STRING_AGG(g.name, ', ') as games,
-                   t.name as team,
-                   ps.tournaments_won,
-                   ps.matches_won
-            FROM users u
-            LEFT JOIN player_games pg ON u.id = pg.player_id
-            LEFT JOIN games g ON pg.game_id = g.id
-            LEFT JOIN team_members tm ON u.id = tm.player_id
-            LEFT JOIN teams t ON tm.team_id = t.id
-            LEFT JOIN player_stats ps ON u.id = ps.player_id
-            WHERE u.role = 'player'
-            GROUP BY u.id, u.username, t.name, ps.tournaments_won, ps.matches_won
-        """)
-        
-        for row in cursor.fetchall():
-            tree.insert('', tk.END, values=row)
-        
-        cursor.close()
-        conn.close()
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to refresh data: {str(e)}")
-
-def delete_player(tree):
-    selected_items = tree.selection()
-    if not selected_items:
-        messagebox.showwarning("Warning", "No player selected for deletion.")
-        return
-
-    confirm = messagebox.askyesno("Confirm Delete", f"Delete {len(selected_items)} player(s)?")
-    if not confirm:
-        return
-
-    try:
-        conn = get_db_connection()
-        if conn is None:
-            return
-        
-        cursor = conn.cursor()
-        
-        for item in selected_items:
-            player_id = tree.item(item)['values'][0]
-            
-
-            cursor.execute("DELETE FROM player_stats WHERE player_id = %s", (player_id,))
-            cursor.execute("DELETE FROM player_games WHERE player_id = %s", (player_id,))
-            cursor.execute("DELETE FROM team_members WHERE player_id = %s", (player_id,))
-            cursor.execute("DELETE FROM tournament_participants WHERE player_id = %s", (player_id,))
-           
-            cursor.execute("DELETE FROM users WHERE id = %s", (player_id,))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        messagebox.showinfo("Success", "Player(s) deleted successfully!")
-        refresh_tree(tree)
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to delete player(s): {str(e)}")
-
-def create_tournament(name_var, game_var, tree, admin_id, tournament_tree):
-    name = name_var.get()
-    game = game_var.get()
-    
-    if not name or not game:
-        messagebox.showerror("Error", "Please fill in all fields")
-        return
-    
-    try:
-        conn = get_db_connection()
-        if conn is None:
-            return
-        
-        cursor = conn.cursor()
-        
-        
-        cursor.execute("SELECT id FROM games WHERE name = %s", (game,))
-        game_result = cursor.fetchone()
-        
-        if not game_result:
-            messagebox.showerror("Error", "Selected game not found")
-            cursor.close()
-            conn.close()
-            return
-        
-        game_id = game_result[0]
-        
-        
-        cursor.execute("""
-            INSERT INTO tournaments (name, game_id, created_by)
-            VALUES (%s, %s, %s)
-            RETURNING id
-        """, (name, game_id, admin_id))
-        
-        tournament_id = cursor.fetchone()[0]
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        messagebox.showinfo("Success", f"Tournament '{name}' created successfully!")
-        name_var.set("")
-        game_var.set("")
-        
-    
-        refresh_tree(tree)
-        refresh_tournaments(tournament_tree)
-        
-    except psycopg2.IntegrityError as e:
-        if "unique constraint" in str(e).lower():
-            messagebox.showerror("Error", "A tournament with this name already exists")
-        else:
-            messagebox.showerror("Error", f"Database error: {str(e)}")
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to create tournament: {str(e)}")
-
-def create_match(player1_var, player2_var, game_var, winner_var, match_type_var, tree, match_tree):
-    player1 = player1_var.get()
-    player2 = player2_var.get()
-    game = game_var.get()
-    winner = winner_var.get()
-    match_type = match_type_var.get().lower()  # Convert to lowercase
-    
-    if not all([player1, player2, game, winner, match_type]):
-        messagebox.showerror("Error", "Please fill in all fields")
-        return
-    
-    try:
-        conn = get_db_connection()
-        if conn is None:
-            return
-        
-        cursor = conn.cursor()
-        
-        
-        cursor.execute("SELECT id FROM users WHERE username = %s", (player1,))
-        player1_id = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT id FROM users WHERE username = %s", (player2,))
-        player2_id = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT id FROM users WHERE username = %s", (winner,))
-        winner_id = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT id FROM games WHERE name = %s", (game,))
-        game_id = cursor.fetchone()[0]
-        
-        
-        cursor.execute("""
-            INSERT INTO matches (game_id, player1_id, player2_id, winner_id, match_type)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (game_id, player1_id, player2_id, winner_id, match_type))
-        
-        
-        cursor.execute("""
-            UPDATE player_stats
-            SET matches_won = matches_won + 1,
-                total_matches = total_matches + 1
-            WHERE player_id = %s
-        """, (winner_id,))
-        
-        
-        cursor.execute("""
-            UPDATE player_stats
-            SET total_matches = total_matches + 1
-            WHERE player_id IN (%s, %s)
-            AND player_id != %s
-        """, (player1_id, player2_id, winner_id))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        messagebox.showinfo("Success", "Match recorded successfully!")
-        
-        player1_var.set("")
-        player2_var.set("")
-        game_var.set("")
-        winner_var.set("")
-        match_type_var.set("")
-        
-        
-        refresh_tree(tree)
-        refresh_matches(match_tree)
-        
-    except Exception as e:
-        messagebox.showerror("Error", str(e))
-
-
-def refresh_tournaments(tree):
-    for item in tree.get_children():
-        tree.delete(item)
-    
-    try:
-        conn = get_db_connection()
-        if conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT t.id, t.name, g.name, u.username
-                FROM tournaments t
-                JOIN games g ON t.game_id = g.id
-                JOIN users u ON t.created_by = u.id
-                ORDER BY t.id DESC
-            """)
-            
-            for row in cursor.fetchall():
-                tree.insert('', tk.END, values=row)
-            
-            cursor.close()
-            conn.close()
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to refresh tournaments: {str(e)}")
-
-def refresh_matches(tree):
-    for item in tree.get_children():
-        tree.delete(item)
-    
-    try:
-        conn = get_db_connection()
-        if conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT m.id, g.name, 
-                       u1.username as player1, 
-                       u2.username as player2,
-                       w.username as winner,
-                       m.match_type
-                FROM matches m
-                JOIN games g ON m.game_id = g.id
-                JOIN users u1 ON m.player1_id = u1.id
-                JOIN users u2 ON m.player2_id = u2.id
-                JOIN users w ON m.winner_id = w.id
-                ORDER BY m.id DESC
-            """)
-            
-            for row in cursor.fetchall():
-                tree.insert('', tk.END, values=row)
-            
-            cursor.close()
-            conn.close()
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to refresh matches: {str(e)}")
-
-def show_admin_dashboard(root, current_user):
-    clear_window(root)
-    
-    main_frame = ttk.Frame(root, padding="20")
-    main_frame.pack(expand=True, fill='both')
-    
-    ttk.Label(main_frame, text=f"Admin Dashboard - {current_user['username']}", 
-              style='Header.TLabel').pack(pady=10)
-    
-    notebook = ttk.Notebook(main_frame)
-    notebook.pack(fill='both', expand=True, padx=10, pady=5)
-    
-    
-    players_frame = ttk.Frame(notebook)
-    notebook.add(players_frame, text='Players')
-    
-    columns = ('ID', 'Username', 'Games', 'Team', 'Tournaments Won', 'Matches Won')
-    tree = ttk.Treeview(players_frame, columns=columns, show='headings', height=10)
-    
-    for col in columns:
-        tree.heading(col, text=col)
-        tree.column(col, width=80)
-    
-    tree.pack(pady=10, padx=10, fill='both', expand=True)
-    
-    scrollbar = ttk.Scrollbar(players_frame, orient=tk.VERTICAL, command=tree.yview)
-    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-    tree.configure(yscrollcommand=scrollbar.set)
-    
-    btn_frame = ttk.Frame(players_frame)
-    btn_frame.pack(pady=5)
-    
-    ttk.Button(btn_frame, text="Delete Player", 
-               command=lambda: delete_player(tree)).pack(side=tk.LEFT, padx=5)
-    
-    
-    tournaments_frame = ttk.Frame(notebook)
-    notebook.add(tournaments_frame, text='Tournaments')
-    
-    tournament_form = ttk.Frame(tournaments_frame)
-    tournament_form.pack(pady=20)
-    
-    ttk.Label(tournament_form, text="Tournament Name:").grid(row=0, column=0, padx=5, pady=5)
-    tournament_name = tk.StringVar()
-    ttk.Entry(tournament_form, textvariable=tournament_name).grid(row=0, column=1, padx=5, pady=5)
-    
-    ttk.Label(tournament_form, text="Game:").grid(row=1, column=0, padx=5, pady=5)
-    tournament_game = tk.StringVar()
-    game_combo = ttk.Combobox(tournament_form, textvariable=tournament_game)
-    game_combo['values'] = get_games()
-    game_combo.grid(row=1, column=1, padx=5, pady=5)
-
-    ttk.Label(tournaments_frame, text="Existing Tournaments").pack(pady=10)
-    tournament_tree = ttk.Treeview(tournaments_frame, columns=('ID', 'Name', 'Game', 'Created By'), show='headings', height=5)
-    
-    for col in ('ID', 'Name', 'Game', 'Created By'):
-        tournament_tree.heading(col, text=col)
-        tournament_tree.column(col, width=100)
-    
-    tournament_tree.pack(pady=10, padx=10, fill='both', expand=True)
-    
-    tournament_buttons = ttk.Frame(tournaments_frame)
-    tournament_buttons.pack(pady=5)
-    
-    ttk.Button(tournament_form, text="Create Tournament", 
-               command=lambda: create_tournament(tournament_name, tournament_game, tree, current_user['id'], tournament_tree)).grid(row=2, column=0, columnspan=2, pady=10)
-    
-    ttk.Button(tournament_buttons, text="Edit Tournament", 
-               command=lambda: edit_tournament(tournament_tree, tournament_name, tournament_game)).pack(side=tk.LEFT, padx=5)
-    
-    ttk.Button(tournament_buttons, text="Delete Tournament", 
-               command=lambda: delete_tournament(tournament_tree)).pack(side=tk.LEFT, padx=5)
-    
-    ttk.Button(tournament_buttons, text="Undo Delete Tournament", 
-               command=lambda: restore_tournament(tournament_tree)).pack(side=tk.LEFT, padx=5)
-    
-   
-    matches_frame = ttk.Frame(notebook)
-    notebook.add(matches_frame, text='Matches')
-    
-    match_form = ttk.Frame(matches_frame)
-    match_form.pack(pady=20)
-    
-    players = get_players()
-    
-    ttk.Label(match_form, text="Player 1:").grid(row=0, column=0, padx=5, pady=5)
-    player1_var = tk.StringVar()
-    player1_combo = ttk.Combobox(match_form, textvariable=player1_var)
-    player1_combo['values'] = players
-    player1_combo.grid(row=0, column=1, padx=5, pady=5)
-    
-    ttk.Label(match_form, text="Player 2:").grid(row=1, column=0, padx=5, pady=5)
-    player2_var = tk.StringVar()
-    player2_combo = ttk.Combobox(match_form, textvariable=player2_var)
-    player2_combo['values'] = players
-    player2_combo.grid(row=1, column=1, padx=5, pady=5)
-    
-    ttk.Label(match_form, text="Game:").grid(row=2, column=0, padx=5, pady=5)
-    match_game_var = tk.StringVar()
-    match_game_combo = ttk.Combobox(match_form, textvariable=match_game_var)
-    match_game_combo['values'] = get_games()
-    match_game_combo.grid(row=2, column=1, padx=5, pady=5)
-    
-    ttk.Label(match_form, text="Winner:").grid(row=3, column=0, padx=5, pady=5)
-    winner_var = tk.StringVar()
-    winner_combo = ttk.Combobox(match_form, textvariable=winner_var)
-    winner_combo['values'] = players
-    winner_combo.grid(row=3, column=1, padx=5, pady=5)
-    
-    
-    ttk.Label(match_form, text="Match Type:").grid(row=4, column=0, padx=5, pady=5)
-    match_type_var = tk.StringVar()
-    match_type_combo = ttk.Combobox(match_form, textvariable=match_type_var)
-    match_type_combo['values'] = ['Friendly', 'Tournament']
-    match_type_combo.grid(row=4, column=1, padx=5, pady=5)
-    
-    ttk.Button(match_form, text="Record Match", 
-               command=lambda: create_match(player1_var, player2_var, match_game_var, winner_var, match_type_var, tree, match_tree)).grid(row=5, column=0, columnspan=2, pady=10)
-    
-    ttk.Label(matches_frame, text="Match History").pack(pady=10)
-    match_tree = ttk.Treeview(matches_frame, 
-                             columns=('ID', 'Game', 'Player 1', 'Player 2', 'Winner', 'Type'), 
-                             show='headings', 
-                             height=5)
-    
-    for col in ('ID', 'Game', 'Player 1', 'Player 2', 'Winner', 'Type'):
-        match_tree.heading(col, text=col)
-        match_tree.column(col, width=80)
-    
-    match_tree.pack(pady=10, padx=10, fill='both', expand=True)
-    
-    match_buttons = ttk.Frame(matches_frame)
-    match_buttons.pack(pady=5)
-    
-    ttk.Button(match_buttons, text="Edit Match", 
-               command=lambda: edit_match(match_tree, player1_var, player2_var, match_game_var, winner_var, match_type_var)).pack(side=tk.LEFT, padx=5)
-    
-    ttk.Button(match_buttons, text="Delete Match", 
-               command=lambda: delete_match(match_tree)).pack(side=tk.LEFT, padx=5)
-    
-    ttk.Button(match_buttons, text="Undo Delete Match", 
-               command=lambda: restore_match(match_tree, tree)).pack(side=tk.LEFT, padx=5)
-    
-    backup_button_frame = ttk.Frame(main_frame)
-    backup_button_frame.pack(pady=10)
-    
-    ttk.Button(backup_button_frame, text="Backup Database", 
-               command=backup_database).pack(side=tk.LEFT, padx=5)
-    
-    ttk.Button(main_frame, text="Logout", 
-               command=lambda: show_login_window(root)).pack(pady=10)
-    
-    
-    refresh_tree(tree)
-    refresh_tournaments(tournament_tree)
-    refresh_matches(match_tree)
-
-
-def show_player_dashboard(root, current_user):
-    clear_window(root)
-    
-    main_frame = ttk.Frame(root, padding="20")
-    main_frame.pack(expand=True, fill='both')
-    
-    ttk.Label(main_frame, text=f"Player Dashboard - {current_user['username']}", 
-              style='Header.TLabel').pack(pady=10)
-    
-    notebook = ttk.Notebook(main_frame)
-    notebook.pack(fill='both', expand=True, padx=10, pady=5)
-    
-    
-    profile_frame = ttk.Frame(notebook)
-    notebook.add(profile_frame, text='Profile')
-    
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT u.username, ps.tournaments_won, ps.matches_won, ps.total_matches
-            FROM users u
-            JOIN player_stats ps ON u.id = ps.player_id
-            WHERE u.id = %s
-        """, (current_user['id'],))
-        
-        player_info = cursor.fetchone()
-        
-        info_frame = ttk.Frame(profile_frame)
-        info_frame.pack(pady=20)
-        
-        ttk.Label(info_frame, text=f"Username: {player_info[0]}").grid(row=0, column=0, pady=5, sticky='w')
-        ttk.Label(info_frame, text=f"Tournaments Won: {player_info[1]}").grid(row=1, column=0, pady=5, sticky='w')
-        ttk.Label(info_frame, text=f"Matches Won: {player_info[2]}").grid(row=2, column=0, pady=5, sticky='w')
-        ttk.Label(info_frame, text=f"Total Matches: {player_info[3]}").grid(row=3, column=0, pady=5, sticky='w')
-        
-        cursor.close()
-        conn.close()
-    
-    
-    games_frame = ttk.Frame(notebook)
-    notebook.add(games_frame, text='Games')
-    
-    ttk.Label(games_frame, text="Select Games:").pack(pady=10)
-    
-    games_list = ttk.Frame(games_frame)
-    games_list.pack(pady=10)
-    
-    selected_games = []
-    games = get_games()
-    
-    
-    tournaments_frame = ttk.Frame(notebook)
-    notebook.add(tournaments_frame, text='Tournaments')
-    
-    ttk.Label(tournaments_frame, text="Available Tournaments").pack(pady=10)
-    
-    columns = ('Name', 'Game', 'Status')
-    tournaments_tree = ttk.Treeview(tournaments_frame, columns=columns, show='headings', height=10)
-    
-    for col in columns:
-        tournaments_tree.heading(col, text=col)
-        tournaments_tree.column(col, width=150)
-    
-    tournaments_tree.pack(pady=10, padx=10, fill='both', expand=True)
-    
-
-    for i, game in enumerate(games):
-        var = tk.BooleanVar()
-        ttk.Checkbutton(games_list, text=game, variable=var).grid(row=i, column=0, sticky='w', pady=2)
-        selected_games.append((game, var))
-    
-    ttk.Button(games_list, text="Update Games", 
-               command=lambda: update_player_games(current_user['id'], selected_games, tournaments_tree)).grid(row=len(games), column=0, pady=10)
-    
-  
-    teams_frame = ttk.Frame(notebook)
-    notebook.add(teams_frame, text='Teams')
-    
-    ttk.Label(teams_frame, text="Team Management").pack(pady=10)
-    
-    team_form = ttk.Frame(teams_frame)
-    team_form.pack(pady=10)
-    
-    ttk.Label(team_form, text="Join Team:").grid(row=0, column=0, pady=5, padx=5)
-    team_choice = tk.StringVar()
-    team_combo = ttk.Combobox(team_form, textvariable=team_choice, width=28)
-    team_combo['values'] = get_teams()
-    team_combo.grid(row=0, column=1, pady=5)
-    
-    ttk.Button(team_form, text="Join Team", 
-               command=lambda: join_team(current_user['id'], team_choice)).grid(row=1, column=0, columnspan=2, pady=5)
-    
-    ttk.Label(team_form, text="Create Team:").grid(row=2, column=0, pady=5, padx=5)
-    new_team_name = tk.StringVar()
-    ttk.Entry(team_form, textvariable=new_team_name, width=30).grid(row=2, column=1, pady=5)
-    
-    ttk.Button(team_form, text="Create Team", 
-               command=lambda: create_team(current_user['id'], new_team_name)).grid(row=3, column=0, columnspan=2, pady=5)
-    
-    ttk.Button(tournaments_frame, text="Register for Tournament", 
-               command=lambda: register_for_tournament(tournaments_tree, current_user['id'])).pack(pady=10)
-    
-    ttk.Button(main_frame, text="Logout", 
-               command=lambda: show_login_window(root)).pack(pady=10)
-    
-  
-    refresh_player_tournaments(tournaments_tree, current_user['id'])
-
-def refresh_player_tournaments(tree, player_id):
-    """Refresh the tournaments view for a player based on their selected games"""
-    for item in tree.get_children():
-        tree.delete(item)
-    
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
-        try:
-            cursor.execute("""
-                SELECT DISTINCT 
-                    t.name as tournament_name, 
-                    g.name as game_name,
-                    CASE 
-                        WHEN tp.player_id IS NOT NULL THEN 'Registered'
-                        ELSE 'Available'
-                    END as status
-                FROM tournaments t
-                INNER JOIN games g ON t.game_id = g.id
-                INNER JOIN player_games pg ON g.id = pg.game_id AND pg.player_id = %s
-                LEFT JOIN tournament_participants tp ON t.id = tp.tournament_id AND tp.player_id = %s
-                ORDER BY t.name ASC
-            """, (player_id, player_id))
-            
-            for row in cursor.fetchall():
-                tree.insert('', tk.END, values=row)
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to refresh tournaments: {str(e)}")
-        finally:
-            cursor.close()
-            conn.close()
-
-def update_player_games(player_id, selected_games, tournaments_tree=None):
-    conn = get_db_connection()
-    if conn is None:
-        return
-    
-    cursor = conn.cursor()
-    
-    try:
-        
-        cursor.execute("BEGIN")
-        
-    
-        cursor.execute("ALTER TABLE player_games DISABLE TRIGGER player_games_backup_trigger")
-        
-       
-        cursor.execute("DELETE FROM player_games WHERE player_id = %s", (player_id,))
-        
-      
-        for game, var in selected_games:
-            if var.get():
-                cursor.execute("""
-                    INSERT INTO player_games (player_id, game_id)
-                    SELECT %s, id FROM games WHERE name = %s
-                """, (player_id, game))
-        
-      
-        cursor.execute("ALTER TABLE player_games ENABLE TRIGGER player_games_backup_trigger")
-        
-     
-        cursor.execute("COMMIT")
-        messagebox.showinfo("Success", "Games updated successfully!")
-        
-      
-        if tournaments_tree:
-            refresh_player_tournaments(tournaments_tree, player_id)
-            
-    except Exception as e:
-        cursor.execute("ROLLBACK")
-        messagebox.showerror("Error", str(e))
-    finally:
-        cursor.close()
-        conn.close()
-
-def join_team(player_id, team_choice):
-    team_name = team_choice.get()
-    if not team_name:
-        messagebox.showerror("Error", "Please select a team")
-        return
-    
-    conn = get_db_connection()
-    if conn is None:
-        return
-    
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute("SELECT id FROM teams WHERE name = %s", (team_name,))
-        team_id = cursor.fetchone()[0]
-        
-        cursor.execute("""
-            INSERT INTO team_members (team_id, player_id)
-            VALUES (%s, %s)
-        """, (team_id, player_id))
-        
-        conn.commit()
-        messagebox.showinfo("Success", f"Joined team {team_name} successfully!")
-    except psycopg2.IntegrityError:
-        messagebox.showerror("Error", "Already a member of this team")
-    finally:
-        cursor.close()
-        conn.close()
-
-def create_team(player_id, team_name_var):
-    team_name = team_name_var.get()
-    if not team_name:
-        messagebox.showerror("Error", "Please enter a team name")
-        return
-    
-    conn = get_db_connection()
-    if conn is None:
-        return
-    
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute("""
-            INSERT INTO teams (name)
-            VALUES (%s)
-            RETURNING id
-        """, (team_name,))
-        
-        team_id = cursor.fetchone()[0]
-        
-        cursor.execute("""
-            INSERT INTO team_members (team_id, player_id)
-            VALUES (%s, %s)
-        """, (team_id, player_id))
-        
-        conn.commit()
-        messagebox.showinfo("Success", f"Team {team_name} created successfully!")
-        team_name_var.set("")
-    except psycopg2.IntegrityError:
-        messagebox.showerror("Error", "Team name already exists")
-    finally:
-        cursor.close()
-        conn.close()
-
-def register_for_tournament(tree, player_id):
-    selected_item = tree.selection()
-    if not selected_item:
-        messagebox.showerror("Error", "Please select a tournament")
-        return
-    
-    tournament_name = tree.item(selected_item[0])['values'][0]
-    
-    conn = get_db_connection()
-    if conn is None:
-        return
-    
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute("""
-            INSERT INTO tournament_participants (tournament_id, player_id)
-            SELECT t.id, %s
-            FROM tournaments t
-            WHERE t.name = %s
-        """, (player_id, tournament_name))
-        
-        conn.commit()
-        messagebox.showinfo("Success", f"Registered for tournament {tournament_name} successfully!")
-    except psycopg2.IntegrityError:
-        messagebox.showerror("Error", "Already registered for this tournament")
-    finally:
-        cursor.close()
-        conn.close()
-
-def delete_tournament(tree):
-    selected_items = tree.selection()
-    if not selected_items:
-        messagebox.showwarning("Warning", "No tournament selected for deletion.")
-        return
-
-    confirm = messagebox.askyesno("Confirm Delete", f"Delete {len(selected_items)} tournament(s)?")
-    if not confirm:
-        return
-
-    try:
-        conn = get_db_connection()
-        if conn is None:
-            return
-        
-        cursor = conn.cursor()
-        
-        for item in selected_items:
-            tournament_id = tree.item(item)['values'][0]
-          
-            cursor.execute("DELETE FROM tournament_participants WHERE tournament_id = %s", (tournament_id,))
-            cursor.execute("DELETE FROM tournaments WHERE id = %s", (tournament_id,))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        messagebox.showinfo("Success", "Tournament(s) deleted successfully!")
-        refresh_tournaments(tree)
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to delete tournament(s): {str(e)}")
-
-def edit_tournament(tree, name_var, game_var):
-    selected_items = tree.selection()
-    if not selected_items:
-        messagebox.showwarning("Warning", "No tournament selected for editing.")
-        return
-    
-    if len(selected_items) > 1:
-        messagebox.showwarning("Warning", "Please select only one tournament to edit.")
-        return
-
-    tournament_id = tree.item(selected_items[0])['values'][0]
-    new_name = name_var.get()
-    new_game = game_var.get()
-
-    if not new_name or not new_game:
-        messagebox.showerror("Error", "Please fill in all fields")
-        return
-
-    try:
-        conn = get_db_connection()
-        if conn is None:
-            return
-        
-        cursor = conn.cursor()
-        
-        
-        cursor.execute("SELECT id FROM games WHERE name = %s", (new_game,))
-        game_result = cursor.fetchone()
-        
-        if not game_result:
-            messagebox.showerror("Error", "Selected game not found")
-            cursor.close()
-            conn.close()
-            return
-        
-        game_id = game_result[0]
-        
-
-        cursor.execute("""
-            UPDATE tournaments 
-            SET name = %s, game_id = %s
-            WHERE id = %s
-        """, (new_name, game_id, tournament_id))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        messagebox.showinfo("Success", f"Tournament updated successfully!")
-        name_var.set("")
-        game_var.set("")
-        refresh_tournaments(tree)
-        
-    except psycopg2.IntegrityError as e:
-        if "unique constraint" in str(e).lower():
-            messagebox.showerror("Error", "A tournament with this name already exists")
-        else:
-            messagebox.showerror("Error", f"Database error: {str(e)}")
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to update tournament: {str(e)}")
-
-def delete_match(tree):
-    selected_items = tree.selection()
-    if not selected_items:
-        messagebox.showwarning("Warning", "No match selected for deletion.")
-        return
-
-    confirm = messagebox.askyesno("Confirm Delete", f"Delete {len(selected_items)} match(es)?")
-    if not confirm:
-        return
-
-    try:
-        conn = get_db_connection()
-        if conn is None:
-            return
-        
-        cursor = conn.cursor()
-        
-        for item in selected_items:
-            match_id = tree.item(item)['values'][0]
-            
-            cursor.execute("""
-                SELECT player1_id, player2_id, winner_id
-                FROM matches
-                WHERE id = %s
-            """, (match_id,))
-            match_info = cursor.fetchone()
-            
-            if match_info:
-                player1_id, player2_id, winner_id = match_info
-                
-                
-                cursor.execute("""
-                    UPDATE player_stats
-                    SET total_matches = total_matches - 1
-                    WHERE player_id IN (%s, %s)
-                """, (player1_id, player2_id))
-                
-                cursor.execute("""
-                    UPDATE player_stats
-                    SET matches_won = matches_won - 1
-                    WHERE player_id = %s
-                """, (winner_id,))
-            
-            
-            cursor.execute("DELETE FROM matches WHERE id = %s", (match_id,))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        messagebox.showinfo("Success", "Match(es) deleted successfully!")
-        refresh_matches(tree)
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to delete match(es): {str(e)}")
-
-def edit_match(tree, player1_var, player2_var, game_var, winner_var, match_type_var):
-    selected_items = tree.selection()
-    if not selected_items:
-        messagebox.showwarning("Warning", "No match selected for editing.")
-        return
-    
-    if len(selected_items) > 1:
-        messagebox.showwarning("Warning", "Please select only one match to edit.")
-        return
-
-    match_id = tree.item(selected_items[0])['values'][0]
-    player1 = player1_var.get()
-    player2 = player2_var.get()
-    game = game_var.get()
-    winner = winner_var.get()
-    match_type = match_type_var.get().lower()
-
-    if not all([player1, player2, game, winner, match_type]):
-        messagebox.showerror("Error", "Please fill in all fields")
-        return
-
-    try:
-        conn = get_db_connection()
-        if conn is None:
-            return
-        
-        cursor = conn.cursor()
-        
-        
-        cursor.execute("SELECT id FROM users WHERE username = %s", (player1,))
-        player1_id = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT id FROM users WHERE username = %s", (player2,))
-        player2_id = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT id FROM users WHERE username = %s", (winner,))
-        winner_id = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT id FROM games WHERE name = %s", (game,))
-        game_id = cursor.fetchone()[0]
-        
-        
-        cursor.execute("""
-            SELECT winner_id, player1_id, player2_id
-            FROM matches
-            WHERE id = %s
-        """, (match_id,))
-        old_match_info = cursor.fetchone()
-        old_winner_id = old_match_info[0]
-        
-
-        cursor.execute("""
-            UPDATE matches 
-            SET game_id = %s, 
-                player1_id = %s, 
-                player2_id = %s, 
-                winner_id = %s, 
-                match_type = %s
-            WHERE id = %s
-        """, (game_id, player1_id, player2_id, winner_id, match_type, match_id))
-        
-        
-        if old_winner_id != winner_id:
-            
-            cursor.execute("""
-                UPDATE player_stats
-                SET matches_won = matches_won - 1
-                WHERE player_id = %s
-            """, (old_winner_id,))
-            
-            
-            cursor.execute("""
-                UPDATE player_stats
-                SET matches_won = matches_won + 1
-                WHERE player_id = %s
-            """, (winner_id,))
-            
-            
-            cursor.execute("""
-                UPDATE player_stats
-                SET total_matches = total_matches - 1
-                WHERE player_id IN (%s, %s)
-            """, (old_match_info[1], old_match_info[2]))
-            
-            cursor.execute("""
-                UPDATE player_stats
-                SET total_matches = total_matches + 1
-                WHERE player_id IN (%s, %s)
-            """, (player1_id, player2_id))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        messagebox.showinfo("Success", "Match updated successfully!")
-        
-        player1_var.set("")
-        player2_var.set("")
-        game_var.set("")
-        winner_var.set("")
-        match_type_var.set("")
-        
-        
-        refresh_matches(tree)
-        
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to update match: {str(e)}")
-
-def restore_tournament(tree):
-    try:
-        conn = get_db_connection()
-        if conn is None:
-            return
-        
-        cursor = conn.cursor()
-        
-        
-        cursor.execute("""
-            WITH deleted_tournament AS (
-                DELETE FROM tournaments_backup
-                WHERE id = (
-                    SELECT id 
-                    FROM tournaments_backup 
-                    ORDER BY created_at DESC 
-                    LIMIT 1
-                )
-                RETURNING *
-            )
-            INSERT INTO tournaments (id, name, game_id, created_by, created_at, winner_id)
-            SELECT id, name, game_id, created_by, created_at, winner_id
-            FROM deleted_tournament
-            RETURNING id;
-        """)
-        
-        restored_id = cursor.fetchone()
-        if restored_id:
-            
-            cursor.execute("""
-                WITH deleted_participants AS (
-                    DELETE FROM tournament_participants_backup
-                    WHERE tournament_id = %s
-                    RETURNING *
-                )
-                INSERT INTO tournament_participants (tournament_id, player_id, registered_at)
-                SELECT tournament_id, player_id, registered_at
-                FROM deleted_participants;
-            """, (restored_id[0],))
-            
-            conn.commit()
-            messagebox.showinfo("Success", "Tournament restored successfully!")
-            refresh_tournaments(tree)
-        else:
-            messagebox.showinfo("Info", "No deleted tournaments to restore.")
-        
-        cursor.close()
-        conn.close()
-        
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to restore tournament: {str(e)}")
-
-def restore_match(tree, player_tree):
-    try:
-        conn = get_db_connection()
-        if conn is None:
-            return
-        
-        cursor = conn.cursor()
-        
-        
-        cursor.execute("""
-            WITH deleted_match AS (
-                DELETE FROM matches_backup
-                WHERE id = (
-                    SELECT id 
-                    FROM matches_backup 
-                    ORDER BY created_at DESC 
-                    LIMIT 1
-                )
-                RETURNING *
-            )
-            INSERT INTO matches (id, game_id, player1_id, player2_id, winner_id, match_type, created_at)
-            SELECT id, game_id, player1_id, player2_id, winner_id, match_type, created_at
-            FROM deleted_match
-            RETURNING winner_id, player1_id, player2_id;
-        """)
-        
-        restored = cursor.fetchone()
-        if restored:
-            winner_id, player1_id, player2_id = restored
-            
-            
-            cursor.execute("""
-                UPDATE player_stats
-                SET matches_won = matches_won + 1,
-                    total_matches = total_matches + 1
-                WHERE player_id = %s
-            """, (winner_id,))
-            
-            cursor.execute("""
-                UPDATE player_stats
-                SET total_matches = total_matches + 1
-                WHERE player_id IN (%s, %s)
-                  AND player_id != %s
-            """, (player1_id, player2_id, winner_id))
-            
-            conn.commit()
-            messagebox.showinfo("Success", "Match restored successfully!")
-            refresh_matches(tree)
-            refresh_tree(player_tree)
-        else:
-            messagebox.showinfo("Info", "No deleted matches to restore.")
-        
-        cursor.close()
-        conn.close()
-        
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to restore match: {str(e)}")
-
-def restore_player(tree):
-    try:
-        conn = get_db_connection()
-        if conn is None:
-            return
-        
-        cursor = conn.cursor()
-        
-        
-        cursor.execute("""
-            WITH deleted_user AS (
-                DELETE FROM users_backup
-                WHERE id = (
-                    SELECT id 
-                    FROM users_backup 
-                    ORDER BY created_at DESC 
-                    LIMIT 1
-                )
-                RETURNING *
-            )
-            INSERT INTO users (id, username, password, role, created_at)
-            SELECT id, username, password, role, created_at
-            FROM deleted_user
-            RETURNING id;
-        """)
-        
-        restored_id = cursor.fetchone()
-        if restored_id:
-            
-            cursor.execute("""
-                WITH deleted_stats AS (
-                    DELETE FROM player_stats_backup
-                    WHERE player_id = %s
-                    RETURNING *
-                )
-                INSERT INTO player_stats (player_id, tournaments_won, matches_won, total_matches)
-                SELECT player_id, tournaments_won, matches_won, total_matches
-                FROM deleted_stats;
-            """, (restored_id[0],))
-            
-            
-            cursor.execute("""
-                WITH deleted_games AS (
-                    DELETE FROM player_games_backup
-                    WHERE player_id = %s
-                    RETURNING *
-                )
-                INSERT INTO player_games (player_id, game_id)
-                SELECT player_id, game_id
-                FROM deleted_games;
-            """, (restored_id[0],))
-            
-            
-            cursor.execute("""
-                WITH deleted_memberships AS (
-                    DELETE FROM team_members_backup
-                    WHERE player_id = %s
-                    RETURNING *
-                )
-                INSERT INTO team_members (team_id, player_id, joined_at)
-                SELECT team_id, player_id, joined_at
-                FROM deleted_memberships;
-            """, (restored_id[0],))
-            
-            conn.commit()
-            messagebox.showinfo("Success", "Player restored successfully!")
-            refresh_tree(tree)
-        else:
-            messagebox.showinfo("Info", "No deleted players to restore.")
-        
-        cursor.close()
-        conn.close()
-        
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to restore player: {str(e)}")
-
-def main():
-    root = tk.Tk()
-    root.title("Tournament Manager")
-    root.geometry("800x600")
-    show_login_window(root)
-    root.mainloop()
-
-if __name__ == "__main__":
+import tkinter as tk
+from tkinter import ttk, messagebox
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+import psycopg2.extras
+import psycopg2.pool
+import argparse
+import csv
+import hashlib
+import io
+import itertools
+import json
+import os
+import queue
+import re
+import select
+import struct
+import sys
+import threading
+import time
+import uuid
+import weakref
+import zlib
+from collections import OrderedDict
+from concurrent import futures
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from configparser import ConfigParser
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit
+from firebase_admin import credentials, firestore
+from google.auth.credentials import AnonymousCredentials
+import firebase_admin
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_config_cache = {}
+_config_lock = threading.Lock()
+
+
+def config(filename='database.ini', section='postgresql'):
+    # database.ini is parsed once per section; call reload_config() after editing it
+    key = (filename, section)
+    with _config_lock:
+        if key in _config_cache:
+            return dict(_config_cache[key])
+
+    parser = ConfigParser()
+    parser.read(filename)
+    db = {}
+    if parser.has_section(section):
+        params = parser.items(section)
+        for param in params:
+            db[param[0]] = param[1]
+    else:
+        raise Exception(f'Section {section} not found in {filename}')
+
+    with _config_lock:
+        _config_cache[key] = dict(db)
+    return db
+
+
+def reload_config():
+    with _config_lock:
+        _config_cache.clear()
+
+
+def pool_settings(filename='database.ini'):
+    settings = {
+        'minconn': 1,
+        'maxconn': 8,
+        'max_idle': 300.0,
+        'checkout_timeout': 10.0,
+        'health_check_after': 30.0,
+    }
+    try:
+        overrides = config(filename, 'pool')
+    except Exception:
+        return settings
+
+    for name, value in overrides.items():
+        if name in ('minconn', 'maxconn'):
+            settings[name] = int(value)
+        elif name in settings:
+            settings[name] = float(value)
+    return settings
+
+
+class PooledConnection:
+    """psycopg2 connection borrowed from a ConnectionPool; close() hands it back."""
+
+    def __init__(self, pool, conn):
+        object.__setattr__(self, '_pool', pool)
+        object.__setattr__(self, '_conn', conn)
+
+    def __getattr__(self, name):
+        conn = object.__getattribute__(self, '_conn')
+        if conn is None:
+            raise psycopg2.InterfaceError("connection already returned to the pool")
+        return getattr(conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    @property
+    def raw(self):
+        return self._conn
+
+    def close(self):
+        conn = self._conn
+        if conn is not None:
+            object.__setattr__(self, '_conn', None)
+            self._pool.putconn(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self._conn is not None and not self._conn.closed:
+                if exc_type is None:
+                    self._conn.commit()
+                else:
+                    self._conn.rollback()
+        finally:
+            self.close()
+        return False
+
+    def __del__(self):
+        # safety net for handlers that bail out before reaching conn.close()
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections with health checks and idle reaping."""
+
+    def __init__(self, params, minconn=1, maxconn=8, max_idle=300.0,
+                 checkout_timeout=10.0, health_check_after=30.0):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("invalid pool size: minconn=%s maxconn=%s" % (minconn, maxconn))
+        self.params = dict(params)
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.max_idle = max_idle
+        self.checkout_timeout = checkout_timeout
+        self.health_check_after = health_check_after
+
+        self._idle = []
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._reaper = None
+        self.stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'exhausted': 0,
+            'created': 0,
+            'closed': 0,
+            'reaped': 0,
+            'health_check_failures': 0,
+        }
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.params)
+        with self._cond:
+            self.stats['created'] += 1
+        return conn
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self.stats['closed'] += 1
+
+    def _reserve(self, deadline):
+        # (conn, idle_since), or (None, None) to open a new one; PoolError past the deadline
+        with self._cond:
+            if self._closed:
+                raise psycopg2.pool.PoolError("connection pool is closed")
+            waited_from = None
+            while not self._idle and self._in_use >= self.maxconn:
+                now = time.monotonic()
+                if waited_from is None:
+                    waited_from = now
+                    self.stats['waits'] += 1
+                if now >= deadline:
+                    self.stats['wait_time'] += now - waited_from
+                    self.stats['exhausted'] += 1
+                    raise psycopg2.pool.PoolError(
+                        "connection pool exhausted (%d connections in use)" % self._in_use)
+                self._cond.wait(deadline - now)
+                if self._closed:
+                    raise psycopg2.pool.PoolError("connection pool is closed")
+            if waited_from is not None:
+                self.stats['wait_time'] += time.monotonic() - waited_from
+
+            self._in_use += 1
+            if self._idle:
+                return self._idle.pop()
+            return None, None
+
+    def _release_slot(self):
+        with self._cond:
+            self._in_use -= 1
+            self._cond.notify()
+
+    def _is_healthy(self, conn, idle_since):
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.health_check_after:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._cond:
+            self.stats['checkouts'] += 1
+        self._start_reaper()
+
+        while True:
+            conn, idle_since = self._reserve(deadline)
+            if conn is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    self._release_slot()
+                    raise
+            if self._is_healthy(conn, idle_since):
+                return conn
+            with self._cond:
+                self.stats['health_check_failures'] += 1
+            self._close_quietly(conn)
+            self._release_slot()
+
+    def putconn(self, conn, close=False):
+        if not conn.closed and not close:
+            try:
+                status = conn.info.transaction_status
+                if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if conn.autocommit:
+                    # client-side flag, nothing to send to the server
+                    conn.autocommit = False
+                if conn.readonly is not None or conn.isolation_level is not None:
+                    # also client-side; a reset() would cost a round trip
+                    conn.readonly = None
+                    conn.isolation_level = None
+            except Exception:
+                close = True
+
+        with self._cond:
+            self._in_use -= 1
+            keep = not (close or conn.closed or self._closed)
+            if keep:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if not keep and not conn.closed:
+            self._close_quietly(conn)
+
+    def reap_idle(self):
+        now = time.monotonic()
+        stale = []
+        with self._cond:
+            keep = []
+            # oldest first, so the most recently used connections survive
+            for conn, idle_since in self._idle:
+                surplus = len(self._idle) - len(stale) > self.minconn
+                if surplus and (conn.closed or now - idle_since >= self.max_idle):
+                    stale.append(conn)
+                else:
+                    keep.append((conn, idle_since))
+            self._idle = keep
+            self.stats['reaped'] += len(stale)
+        for conn in stale:
+            self._close_quietly(conn)
+        return len(stale)
+
+    def discard_idle(self):
+        """Close every idle connection, e.g. once the server is known to have gone away."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close_quietly(conn)
+        return len(idle)
+
+    def _start_reaper(self):
+        if self._reaper is not None or self.max_idle <= 0:
+            return
+        with self._cond:
+            if self._reaper is not None:
+                return
+            self._reaper = threading.Thread(target=self._reap_loop, name="db-pool-reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap_loop(self):
+        interval = max(1.0, self.max_idle / 2)
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed, timeout=interval)
+                if self._closed:
+                    return
+            self.reap_idle()
+
+    def connection(self):
+        return PooledConnection(self, self.getconn())
+
+    def snapshot_stats(self):
+        with self._cond:
+            stats = dict(self.stats)
+            stats['in_use'] = self._in_use
+            stats['idle'] = len(self._idle)
+        return stats
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(config(), **pool_settings())
+    return _pool
+
+
+def close_pool():
+    global _pool, _replica_router
+    with _pool_lock:
+        pool, _pool = _pool, None
+        router, _replica_router = _replica_router, None
+    if pool is not None:
+        pool.closeall()
+    if router is not None:
+        router.close()
+
+
+def pool_stats():
+    if _pool is None:
+        return {}
+    return _pool.snapshot_stats()
+
+
+def get_db_connection():
+    try:
+        return get_pool().connection()
+    except Exception as e:
+        print(f"Error connecting to PostgreSQL: {e}")
+        return None
+
+
+@contextmanager
+def pooled_connection(autocommit=False):
+    """Borrow a pooled connection; commits on success, rolls back on error."""
+    conn = get_pool().connection()
+    if autocommit:
+        conn.autocommit = True
+    with conn:
+        yield conn
+
+
+class StatementCatalog:
+    """Named hot statements, run as prepared statements on each connection."""
+
+    def __init__(self):
+        self.statements = {}
+        self.prepared = weakref.WeakKeyDictionary()
+        self.lock = threading.Lock()
+        self.enabled = True
+        self.stats = {'prepares': 0, 'executes': 0, 'reprepares': 0}
+
+    def define(self, name, sql):
+        """Add sql to the catalog as name (an identifier); returns name."""
+        known = self.statements.get(name)
+        if known is not None:
+            if known[0] != sql:
+                raise ValueError(f"Prepared statement {name} is already defined differently")
+            return name
+
+        keys = []
+
+        def number(match):
+            if match.group(0) == "%%":
+                return "%"
+            if match.group(1) is None:
+                keys.append(None)
+                return f"${len(keys)}"
+            if match.group(1) not in keys:
+                keys.append(match.group(1))
+            return f"${keys.index(match.group(1)) + 1}"
+
+        text = re.sub(r"%%|%\((\w+)\)s|%s", number, sql)
+        run = f"EXECUTE {name}" + (f" ({', '.join(['%s'] * len(keys))})" if keys else "")
+        with self.lock:
+            self.statements.setdefault(name, (sql, text, None if None in keys else keys, run))
+        return name
+
+    def execute(self, cursor, name, params=None, retry=True):
+        """cursor.execute() of the statement defined as name."""
+        sql, text, keys, run = self.statements[name]
+        if not self.enabled:
+            cursor.execute(sql, params)
+            return
+        conn = cursor.connection
+        # nothing of the caller's would be lost by rolling back to retry
+        fresh = conn.autocommit or conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+        with self.lock:
+            stale = conn in self.prepared and self.prepared[conn] is None
+            prepared = self.prepared.get(conn)
+            if prepared is None:
+                prepared = self.prepared[conn] = set()
+            self.stats['executes'] += 1
+        try:
+            if stale:
+                cursor.execute("DEALLOCATE ALL")
+            if name not in prepared:
+                cursor.execute(f"PREPARE {name} AS {text}")
+                prepared.add(name)
+                with self.lock:
+                    self.stats['prepares'] += 1
+            cursor.execute(run, params if keys is None else [params[key] for key in keys])
+        except (psycopg2.errors.InvalidSqlStatementName, psycopg2.errors.DuplicatePreparedStatement):
+            # the session's statements are not the ones recorded: start over
+            with self.lock:
+                self.prepared[conn] = None
+                self.stats['reprepares'] += 1
+            if not (retry and fresh):
+                raise
+            conn.rollback()
+            self.execute(cursor, name, params, retry=False)
+
+    def snapshot_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['statements'] = len(self.statements)
+            stats['connections'] = len(self.prepared)
+        return stats
+
+
+statement_catalog = StatementCatalog()
+
+
+def execute_prepared(cursor, name, params=None):
+    statement_catalog.execute(cursor, name, params)
+
+
+def replica_settings(filename='database.ini'):
+    settings = {
+        'sections': [],
+        'max_lag': 5.0,
+        'read_your_writes': 5.0,
+        'check_interval': 2.0,
+    }
+    try:
+        overrides = config(filename, 'replicas')
+    except Exception:
+        return settings
+
+    for name, value in overrides.items():
+        if name == 'sections':
+            settings[name] = [section.strip() for section in value.split(',') if section.strip()]
+        elif name in settings:
+            settings[name] = float(value)
+    return settings
+
+
+class ReplicaRouter:
+    """Round-robins read-only queries over the healthy replicas, falling back to the primary."""
+
+    def __init__(self, replicas, max_lag=5.0, read_your_writes=5.0, check_interval=2.0, pool_options=None):
+        # replicas: (name, connection params) pairs
+        self.replicas = [{'name': name, 'params': dict(params), 'pool': None, 'healthy': False,
+                          'lag': None, 'error': None, 'reads': 0} for name, params in replicas]
+        self.max_lag = max_lag
+        self.read_your_writes = read_your_writes
+        self.check_interval = check_interval
+        self.pool_options = pool_options or {}
+        self.last_write = float('-inf')
+        self.stats = {'primary_reads': 0, 'replica_reads': 0, 'fallbacks': 0}
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._checker = None
+
+    def wrote(self):
+        self.last_write = time.monotonic()
+
+    def _pool(self, replica):
+        with self._lock:
+            if replica['pool'] is None:
+                replica['pool'] = ConnectionPool(replica['params'], **self.pool_options)
+            return replica['pool']
+
+    def check(self, replica):
+        try:
+            with self._pool(replica).connection() as conn:
+                cursor = conn.cursor()
+                # replay lag: the age of the last replayed commit, or 0 when caught up
+                cursor.execute("""
+                    SELECT pg_is_in_recovery(),
+                           CASE WHEN pg_last_wal_receive_lsn() <= pg_last_wal_replay_lsn() THEN 0
+                                ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+                           END
+                """)
+                in_recovery, lag = cursor.fetchone()
+                cursor.close()
+        except Exception as e:
+            self.failed(replica, e)
+            return False
+
+        lag = None if lag is None else float(lag)
+        if not in_recovery:
+            healthy, error = False, "not a standby"
+        elif lag is None or lag > self.max_lag:
+            healthy, error = False, "lagging"
+        else:
+            healthy, error = True, None
+        with self._lock:
+            replica.update(healthy=healthy, lag=lag, error=error)
+        return healthy
+
+    def failed(self, replica, error):
+        # out of rotation until a check passes; its idle connections are probably dead too
+        with self._lock:
+            replica.update(healthy=False, lag=None, error=str(error).strip())
+        if replica['pool'] is not None:
+            replica['pool'].discard_idle()
+
+    def _start_checker(self):
+        if self._checker is not None or not self.replicas:
+            return
+        with self._lock:
+            if self._checker is not None:
+                return
+            self._checker = threading.Thread(target=self._check_loop, name="replica-checker", daemon=True)
+        # the first round runs here, so the first reads can already use the replicas
+        for replica in self.replicas:
+            self.check(replica)
+        self._checker.start()
+
+    def _check_loop(self):
+        while not self._stop.wait(self.check_interval):
+            for replica in self.replicas:
+                self.check(replica)
+
+    def pick(self):
+        """The replica the next read should go to, or None for the primary."""
+        if not self.replicas or time.monotonic() - self.last_write < self.read_your_writes:
+            return None
+        self._start_checker()
+        with self._lock:
+            healthy = [replica for replica in self.replicas if replica['healthy']]
+        if not healthy:
+            return None
+        return healthy[next(self._turn) % len(healthy)]
+
+    def connection(self):
+        """(connection, replica) for one read; replica is None when it is the primary's."""
+        replica = self.pick()
+        if replica is not None:
+            try:
+                conn = self._pool(replica).connection()
+            except Exception as e:
+                self.failed(replica, e)
+                with self._lock:
+                    self.stats['fallbacks'] += 1
+            else:
+                with self._lock:
+                    replica['reads'] += 1
+                    self.stats['replica_reads'] += 1
+                return conn, replica
+        with self._lock:
+            self.stats['primary_reads'] += 1
+        return get_pool().connection(), None
+
+    def snapshot_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['replicas'] = {replica['name']: {'healthy': replica['healthy'], 'lag': replica['lag'],
+                                                   'error': replica['error'], 'reads': replica['reads']}
+                                 for replica in self.replicas}
+        return stats
+
+    def close(self):
+        self._stop.set()
+        for replica in self.replicas:
+            if replica['pool'] is not None:
+                replica['pool'].closeall()
+
+
+_replica_router = None
+
+
+def get_replica_router():
+    global _replica_router
+    if _replica_router is None:
+        with _pool_lock:
+            if _replica_router is None:
+                settings = replica_settings()
+                # a replica section only needs the [postgresql] keys that differ
+                replicas = [(section, {**config(), 'connect_timeout': 3, **config(section=section)})
+                            for section in settings.pop('sections')]
+                _replica_router = ReplicaRouter(replicas, pool_options=pool_settings(), **settings)
+    return _replica_router
+
+
+def note_write():
+    """Send this process's reads to the primary for the read-your-writes window."""
+    get_replica_router().wrote()
+
+
+def replica_stats():
+    if _replica_router is None:
+        return {}
+    return _replica_router.snapshot_stats()
+
+
+@contextmanager
+def read_connection():
+    """pooled_connection() for read-only queries; a usable replica answers when there is one."""
+    router = get_replica_router()
+    conn, replica = router.connection()
+    try:
+        with conn:
+            yield conn
+    except psycopg2.OperationalError as e:
+        if replica is not None:
+            router.failed(replica, e)
+        raise
+
+
+@contextmanager
+def exported_snapshot():
+    """Yield the exported snapshot id of a REPEATABLE READ transaction held open meanwhile."""
+    conn = get_pool().connection()
+    try:
+        conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_export_snapshot()")
+        snapshot_id = cursor.fetchone()[0]
+        cursor.close()
+        yield snapshot_id
+    finally:
+        conn.close()
+
+
+@contextmanager
+def snapshot_connection(snapshot_id, readonly=True):
+    conn = get_pool().connection()
+    with conn:
+        conn.set_session(isolation_level='REPEATABLE READ', readonly=readonly)
+        cursor = conn.cursor()
+        cursor.execute("SET TRANSACTION SNAPSHOT %s", (snapshot_id,))
+        cursor.close()
+        yield conn
+
+
+IDENTITY_TABLES = {"users": "username", "games": "name", "teams": "name"}
+IDENTITY_CACHE_SIZE = 10000
+
+
+class IdentityCache:
+    """Process-wide LRU of username / game name / team name -> id."""
+
+    def __init__(self, capacity=IDENTITY_CACHE_SIZE):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'queries': 0}
+
+    def resolve(self, table, names, cursor=None):
+        """Map names to ids; names that do not exist are left out."""
+        column = IDENTITY_TABLES[table]
+        found, missing = {}, []
+        with self.lock:
+            for name in set(names):
+                key = (table, name)
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    found[name] = self.entries[key]
+                else:
+                    missing.append(name)
+            self.stats['hits'] += len(found)
+            self.stats['misses'] += len(missing)
+        if not missing:
+            return found
+
+        query = statement_catalog.define(f"resolve_{table}",
+                                         f"SELECT {column}, id FROM {table} WHERE {column} = ANY(%s)")
+        if cursor is None:
+            with pooled_connection(autocommit=True) as conn:
+                lookup = conn.cursor()
+                execute_prepared(lookup, query, (missing,))
+                rows = lookup.fetchall()
+                lookup.close()
+        else:
+            execute_prepared(cursor, query, (missing,))
+            rows = cursor.fetchall()
+        with self.lock:
+            self.stats['queries'] += 1
+        self.remember(table, rows)
+        found.update(rows)
+        return found
+
+    def remember(self, table, pairs):
+        with self.lock:
+            for name, row_id in pairs:
+                self.entries[(table, name)] = row_id
+                self.entries.move_to_end((table, name))
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def forget(self, table, ids=()):
+        ids = set(ids)
+        with self.lock:
+            for key in [key for key, row_id in self.entries.items() if key[0] == table and row_id in ids]:
+                del self.entries[key]
+
+    def warm(self):
+        """Load every game and team and the newest users in one query."""
+        with pooled_connection(autocommit=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT 'games', name, id FROM games
+                UNION ALL
+                SELECT 'teams', name, id FROM teams
+                UNION ALL
+                (SELECT 'users', username, id FROM users ORDER BY id DESC LIMIT %s)
+            """, (self.capacity,))
+            rows = cursor.fetchall()
+            cursor.close()
+        for table in IDENTITY_TABLES:
+            self.remember(table, [(name, row_id) for kind, name, row_id in rows if kind == table])
+        return len(rows)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+identity_cache = IdentityCache()
+
+
+def require_ids(table, names, cursor=None):
+    """resolve() that fails on an unknown name, for handlers that need every id."""
+    ids = identity_cache.resolve(table, names, cursor)
+    missing = [name for name in names if name not in ids]
+    if missing:
+        label = {"users": "player", "games": "game", "teams": "team"}[table]
+        raise ValueError(f"Unknown {label}: {', '.join(missing)}")
+    return ids
+
+
+NOTIFY_CHANNEL = "gaming_portal_changes"
+NOTIFY_MAX_IDS = 300
+# tells this process's own change events apart from other consoles'
+APP_INSTANCE = uuid.uuid4().hex
+
+
+statement_catalog.define("notify_change", "SELECT pg_notify(%s, %s)")
+
+
+def notify_change(cursor, table, action, ids=None, players=None):
+    """Tell the other app instances that rows of table changed, once the transaction commits."""
+    def listed(values):
+        values = None if values is None else sorted(set(values))
+        return values if values is not None and len(values) <= NOTIFY_MAX_IDS else None
+
+    payload = {'source': APP_INSTANCE, 'table': table, 'action': action,
+               'ids': listed(ids), 'players': listed(players)}
+    execute_prepared(cursor, "notify_change", (NOTIFY_CHANNEL, json.dumps(payload)))
+    note_write()
+
+
+class ChangeListener:
+    """Delivers other app instances' change events from a dedicated LISTEN connection."""
+
+    def __init__(self, deliver, poll_seconds=1.0):
+        self.deliver = deliver
+        self.poll_seconds = poll_seconds
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="change-listener", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        self.thread.join(timeout=2 * self.poll_seconds)
+
+    def _run(self):
+        delay, reconnecting = 1.0, False
+        while not self.stopping.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**config())
+                conn.autocommit = True
+                cursor = conn.cursor()
+                cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                cursor.close()
+                if reconnecting:
+                    note_write()
+                    self.deliver([{'source': None, 'table': None, 'action': 'reload', 'ids': None, 'players': None}])
+                reconnecting, delay = True, 1.0
+
+                while not self.stopping.is_set():
+                    if select.select([conn], [], [], self.poll_seconds) == ([], [], []):
+                        continue
+                    conn.poll()
+                    events = []
+                    while conn.notifies:
+                        event = json.loads(conn.notifies.pop(0).payload)
+                        if event.get('source') != APP_INSTANCE:
+                            events.append(event)
+                    if events:
+                        # the replicas may not have replayed these writes yet
+                        note_write()
+                        self.deliver(events)
+            except Exception as e:
+                sys.stderr.write(f"Change listener: {e}; reconnecting in {delay:.0f}s\n")
+                self.stopping.wait(delay)
+                delay = min(2 * delay, 30.0)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+
+def group_changes(events):
+    """{(table, action): ids} for a batch of change events, or None after a reconnect."""
+    changes = {}
+
+    def add(key, ids):
+        if ids is None or changes.get(key, ()) is None:
+            changes[key] = None
+        else:
+            changes.setdefault(key, set()).update(ids)
+
+    for event in events:
+        if event['table'] is None:
+            return None
+        add((event['table'], event['action']), event['ids'])
+        if event['table'] == "matches":
+            add(("users", "update"), event['players'])
+    return changes
+
+
+def _forget_deleted_users(events):
+    changes = group_changes(events)
+    if changes is None:
+        identity_cache.clear()
+    elif ("users", "delete") in changes:
+        deleted = changes[("users", "delete")]
+        if deleted is None:
+            identity_cache.clear()
+        else:
+            identity_cache.forget("users", deleted)
+
+
+BACKUP_TABLES = {
+    "users": "users",
+    "games": "games",
+    "player_games": "player_games",
+    "teams": "teams",
+    "team_members": "team_members",
+    "tournaments": "tournaments",
+    "tournament_participants": "tournament_participants",
+    "matches": "matches",
+    "player_stats": "player_stats"
+}
+
+# deleted rows, partitioned by month of deletion (see Queries_Ran.sql)
+TOMBSTONE_TABLES = [f"{table}_backup" for table in BACKUP_TABLES] + ["tournament_winners_backup"]
+
+# Firestore rejects write batches with more than 500 operations
+FIRESTORE_BATCH_LIMIT = 500
+
+
+class _EmulatorCredential(credentials.Base):
+    # the Firestore emulator accepts unauthenticated requests
+    def get_credential(self):
+        return AnonymousCredentials()
+
+
+def firebase_settings(filename='database.ini'):
+    settings = {
+        'credentials': '',
+        'project_id': '',
+        'batch_size': FIRESTORE_BATCH_LIMIT,
+        'workers': 8,
+        'table_workers': 4,
+    }
+    try:
+        settings.update(config(filename, 'firebase'))
+    except Exception:
+        pass
+    settings['batch_size'] = max(1, min(int(settings['batch_size']), FIRESTORE_BATCH_LIMIT))
+    settings['workers'] = max(1, int(settings['workers']))
+    settings['table_workers'] = max(1, int(settings['table_workers']))
+    return settings
+
+
+def tombstone_settings(filename='database.ini'):
+    settings = {
+        'retention_days': 90,
+        'months_ahead': 2,
+    }
+    try:
+        settings.update(config(filename, 'tombstones'))
+    except Exception:
+        pass
+    settings['retention_days'] = max(1, int(settings['retention_days']))
+    settings['months_ahead'] = max(1, int(settings['months_ahead']))
+    return settings
+
+
+def get_firestore_client():
+    if not firebase_admin._apps:
+        settings = firebase_settings()
+        if os.environ.get('FIRESTORE_EMULATOR_HOST'):
+            project_id = settings['project_id'] or os.environ.get('GOOGLE_CLOUD_PROJECT', 'demo-gaming-portal')
+            firebase_admin.initialize_app(_EmulatorCredential(), {'projectId': project_id})
+        else:
+            cred = credentials.Certificate(settings['credentials'])
+            options = {'projectId': settings['project_id']} if settings['project_id'] else None
+            firebase_admin.initialize_app(cred, options)
+    return firestore.client()
+
+
+# primary key columns, joined with "_", give each row a stable Firestore document id
+BACKUP_KEYS = {
+    "users": ("id",),
+    "games": ("id",),
+    "player_games": ("player_id", "game_id"),
+    "teams": ("id",),
+    "team_members": ("team_id", "player_id"),
+    "tournaments": ("id",),
+    "tournament_participants": ("tournament_id", "player_id"),
+    "matches": ("id",),
+    "player_stats": ("player_id",)
+}
+
+# set by trigger to the id of the transaction that last wrote the row
+CHANGE_COLUMN = "change_xid"
+
+
+def backup_doc_id(table, data):
+    return "_".join(str(data[column]) for column in BACKUP_KEYS[table])
+
+
+def backup_row_hash(data):
+    # data keeps the table's column order, so its repr is stable between runs
+    return hashlib.md5(repr(data).encode('utf-8')).hexdigest()
+
+
+def _commit_firestore_batch(db, collection, ops):
+    # ops are (doc_id, data) pairs; data of None deletes the document
+    batch = db.batch()
+    ref = db.collection(collection)
+    for doc_id, data in ops:
+        if data is None:
+            batch.delete(ref.document(doc_id))
+        else:
+            batch.set(ref.document(doc_id), data)
+    batch.commit()
+    return len(ops)
+
+
+def _load_backup_hashes(cursor, table, doc_ids):
+    cursor.execute("""
+        SELECT doc_id, row_hash
+        FROM backup_row_hashes
+        WHERE table_name = %s AND doc_id = ANY(%s)
+    """, (table, doc_ids))
+    return dict(cursor.fetchall())
+
+
+def _save_backup_hashes(cursor, table, hashes):
+    if not hashes:
+        return
+    psycopg2.extras.execute_values(cursor, """
+        INSERT INTO backup_row_hashes (table_name, doc_id, row_hash)
+        VALUES %s
+        ON CONFLICT (table_name, doc_id) DO UPDATE SET row_hash = EXCLUDED.row_hash
+    """, [(table, doc_id, row_hash) for doc_id, row_hash in hashes], page_size=len(hashes))
+
+
+def _drop_backup_hashes(cursor, table, doc_ids):
+    if doc_ids:
+        cursor.execute("DELETE FROM backup_row_hashes WHERE table_name = %s AND doc_id = ANY(%s)",
+                       (table, list(doc_ids)))
+
+
+def print_backup_progress(table, rows, elapsed, label="Backup"):
+    rate = rows / elapsed if elapsed > 0 else 0.0
+    print(f"{label} {table}: {rows} rows ({rate:.0f} rows/s)")
+
+
+def print_restore_progress(table, rows, elapsed):
+    print_backup_progress(table, rows, elapsed, label="Restore")
+
+
+def print_ingest_progress(table, rows, elapsed):
+    print_backup_progress(table, rows, elapsed, label="Ingest")
+
+
+def backup_table_to_firestore(db, conn, table, collection, pool, since=0, force=False,
+                              batch_size=FIRESTORE_BATCH_LIMIT, max_in_flight=16, progress=None):
+    # rows stream through a server-side cursor; unchanged rows are skipped unless force
+    started = time.monotonic()
+    stats = {'rows': 0, 'written': 0, 'skipped': 0, 'deleted': 0}
+    pending = {}
+    cursor = conn.cursor()
+    stream = conn.cursor(name=f"backup_{table}")
+    stream.itersize = batch_size
+
+    def collect(return_when):
+        nonlocal pending
+        done, not_done = futures.wait(pending, return_when=return_when)
+        for future in done:
+            future.result()
+            kind, entries = pending[future]
+            if kind == 'delete':
+                _drop_backup_hashes(cursor, table, entries)
+                stats['deleted'] += len(entries)
+            else:
+                _save_backup_hashes(cursor, table, entries)
+                stats['written'] += len(entries)
+        pending = {future: pending[future] for future in not_done}
+        if done and progress:
+            progress(table, stats['written'] + stats['deleted'], time.monotonic() - started)
+
+    def submit(ops, kind, entries):
+        future = pool.submit(_commit_firestore_batch, db, collection, ops)
+        pending[future] = (kind, entries)
+        if len(pending) >= max_in_flight:
+            collect(futures.FIRST_COMPLETED)
+
+    try:
+        # deletions land before the upserts, so a re-created row ends up present
+        cursor.execute("""
+            SELECT DISTINCT doc_id
+            FROM deleted_rows
+            WHERE table_name = %s AND change_xid >= %s
+        """, (table, since))
+        deleted = [row[0] for row in cursor.fetchall()]
+        for i in range(0, len(deleted), batch_size):
+            chunk = deleted[i:i + batch_size]
+            submit([(doc_id, None) for doc_id in chunk], 'delete', chunk)
+        collect(futures.ALL_COMPLETED)
+
+        stream.execute(f"SELECT * FROM {table} WHERE {CHANGE_COLUMN} >= %s", (since,))
+        columns = None
+        while True:
+            rows = stream.fetchmany(batch_size)
+            if not rows:
+                break
+            if columns is None:
+                columns = [desc[0] for desc in stream.description]
+            stats['rows'] += len(rows)
+
+            docs = []
+            for row in rows:
+                data = dict(zip(columns, row))
+                data.pop(CHANGE_COLUMN, None)
+                docs.append((backup_doc_id(table, data), backup_row_hash(data), data))
+
+            known = {} if force else _load_backup_hashes(cursor, table, [doc[0] for doc in docs])
+            changed = [doc for doc in docs if known.get(doc[0]) != doc[1]]
+            stats['skipped'] += len(docs) - len(changed)
+            if changed:
+                submit([(doc_id, data) for doc_id, _, data in changed], 'set',
+                       [(doc_id, row_hash) for doc_id, row_hash, _ in changed])
+        collect(futures.ALL_COMPLETED)
+    finally:
+        for future in pending:
+            future.cancel()
+        stream.close()
+        cursor.close()
+
+    elapsed = time.monotonic() - started
+    stats['seconds'] = elapsed
+    stats['rows_per_sec'] = stats['rows'] / elapsed if elapsed > 0 else 0.0
+    return stats
+
+
+def _backup_table_in_snapshot(db, snapshot_id, table, collection, pool, since, force,
+                              batch_size, max_in_flight, progress):
+    with snapshot_connection(snapshot_id, readonly=False) as conn:
+        stats = backup_table_to_firestore(
+            db, conn, table, collection, pool, since=since, force=force,
+            batch_size=batch_size, max_in_flight=max_in_flight, progress=progress)
+
+        # the next run only needs rows written at or after the snapshot's xmin
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO backup_watermarks (table_name, change_xid, updated_at)
+            VALUES (%s, pg_snapshot_xmin(pg_current_snapshot())::text::bigint, current_timestamp)
+            ON CONFLICT (table_name) DO UPDATE
+            SET change_xid = EXCLUDED.change_xid, updated_at = EXCLUDED.updated_at
+        """, (table,))
+        cursor.close()
+    return stats
+
+
+def run_firestore_backup(db, tables=None, incremental=True, batch_size=None, workers=None,
+                         table_workers=None, progress=print_backup_progress):
+    settings = firebase_settings()
+    tables = tables or BACKUP_TABLES
+    batch_size = min(batch_size or settings['batch_size'], FIRESTORE_BATCH_LIMIT)
+    workers = workers or settings['workers']
+    table_workers = table_workers or settings['table_workers']
+
+    previous = {}
+    if incremental:
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT table_name, change_xid FROM backup_watermarks")
+            previous = dict(cursor.fetchall())
+            cursor.close()
+
+    # tables are read in parallel from one exported snapshot
+    summary = {}
+    with futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="firestore-backup") as pool, \
+            futures.ThreadPoolExecutor(max_workers=table_workers, thread_name_prefix="backup-table") as readers, \
+            exported_snapshot() as snapshot_id:
+        jobs = {table: readers.submit(_backup_table_in_snapshot, db, snapshot_id, table, collection, pool,
+                                      previous.get(table, 0), not incremental,
+                                      batch_size, workers * 2, progress)
+                for table, collection in tables.items()}
+        for table, job in jobs.items():
+            summary[table] = job.result()
+
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            DELETE FROM deleted_rows
+            WHERE change_xid < (SELECT coalesce(min(change_xid), 0) FROM backup_watermarks)
+        """)
+        cursor.close()
+    return summary
+
+
+def format_backup_summary(summary):
+    total_rows = sum(stats['rows'] for stats in summary.values())
+    total_seconds = sum(stats['seconds'] for stats in summary.values())
+    lines = [f"{table}: {stats['written']} written, {stats['skipped']} unchanged, "
+             f"{stats['deleted']} deleted ({stats['rows_per_sec']:.0f} rows/s)"
+             for table, stats in summary.items()]
+    rate = total_rows / total_seconds if total_seconds > 0 else 0.0
+    lines.append(f"Total: {total_rows} rows in {total_seconds:.1f}s ({rate:.0f} rows/s)")
+    return "\n".join(lines)
+
+
+def format_restore_summary(summary):
+    total_rows = sum(stats['rows'] for stats in summary.values())
+    total_seconds = sum(stats['seconds'] for stats in summary.values())
+    lines = [f"{table}: {stats['rows']} rows ({stats['rows_per_sec']:.0f} rows/s)"
+             for table, stats in summary.items()]
+    rate = total_rows / total_seconds if total_seconds > 0 else 0.0
+    lines.append(f"Total: {total_rows} rows in {total_seconds:.1f}s ({rate:.0f} rows/s)")
+    return "\n".join(lines)
+
+
+def purge_tombstones(retention_days=None):
+    """Create the coming months' tombstone partitions and drop the expired ones."""
+    settings = tombstone_settings()
+    retention_days = retention_days or settings['retention_days']
+    started = time.monotonic()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT ensure_tombstone_partitions(%s)", (settings['months_ahead'],))
+        created = cursor.fetchone()[0]
+        cursor.execute("SELECT partition_name, tombstones FROM purge_tombstones(make_interval(days => %s))",
+                       (retention_days,))
+        purged = cursor.fetchall()
+        cursor.close()
+    return {'created': created, 'purged': purged, 'retention_days': retention_days,
+            'seconds': time.monotonic() - started}
+
+
+def format_purge_summary(summary):
+    lines = [f"{summary['created']} partitions created, tombstones older than "
+             f"{summary['retention_days']} days removed in {summary['seconds']:.1f}s"]
+    for partition, tombstones in summary['purged']:
+        lines.append(f"  {partition}: {tombstones} rows")
+    return "\n".join(lines)
+
+
+TOMBSTONE_KINDS = {"players": "users", "tournaments": "tournaments", "matches": "matches"}
+
+_TOMBSTONE_COLUMNS = {
+    "users": ("id", "username", "password", "role", "created_at"),
+    "player_stats": ("player_id", "tournaments_won", "matches_won", "total_matches"),
+    "player_games": ("player_id", "game_id"),
+    "team_members": ("team_id", "player_id", "joined_at"),
+    "tournaments": ("id", "name", "game_id", "created_by", "created_at", "winner_id"),
+    "tournament_participants": ("tournament_id", "player_id", "registered_at"),
+    "matches": ("id", "game_id", "player1_id", "player2_id", "winner_id", "match_type", "created_at", "external_id"),
+}
+
+_TOMBSTONE_KEYS = {
+    "users": ("id",),
+    "player_stats": ("player_id",),
+    "player_games": ("player_id", "game_id"),
+    "team_members": ("team_id", "player_id"),
+    "tournaments": ("id",),
+    "tournament_participants": ("tournament_id", "player_id"),
+    "matches": ("id",),
+}
+
+# foreign key columns of the tombstoned tables and the table they point at
+_TOMBSTONE_PARENTS = {
+    "player_id": "users", "game_id": "games", "team_id": "teams", "tournament_id": "tournaments",
+    "created_by": "users", "winner_id": "users", "player1_id": "users", "player2_id": "users",
+}
+
+# rows deleted with a player or tournament; the condition links them to the restored ids
+_TOMBSTONE_DEPENDENTS = {
+    "users": [("player_stats", "b.player_id = ANY(%(ids)s::int[])"),
+              ("player_games", "b.player_id = ANY(%(ids)s::int[])"),
+              ("team_members", "b.player_id = ANY(%(ids)s::int[])"),
+              ("tournament_participants", "b.player_id = ANY(%(ids)s::int[])"),
+              ("matches", "(b.player1_id = ANY(%(ids)s::int[]) OR b.player2_id = ANY(%(ids)s::int[]) "
+                          "OR b.winner_id = ANY(%(ids)s::int[]))")],
+    "tournaments": [("tournament_participants", "b.tournament_id = ANY(%(ids)s::int[])")],
+    "matches": [],
+}
+
+
+def _restore_tombstone_rows(cursor, table, where, params):
+    # a row whose key is taken again or whose parent rows are gone stays a tombstone
+    columns = ", ".join(_TOMBSTONE_COLUMNS[table])
+    keys = ", ".join(_TOMBSTONE_KEYS[table])
+    parents = " AND ".join(f"(b.{column} IS NULL OR EXISTS (SELECT 1 FROM {parent} WHERE id = b.{column}))"
+                           for column, parent in _TOMBSTONE_PARENTS.items()
+                           if column in _TOMBSTONE_COLUMNS[table])
+    cursor.execute(f"""
+        WITH selected AS (
+            SELECT b.tombstone_id, b.deleted_at, {", ".join(f"b.{key}" for key in _TOMBSTONE_KEYS[table])},
+                   {parents or "true"} AS restorable
+            FROM {table}_backup b
+            WHERE {where}
+        ), picked AS (
+            -- a row deleted more than once comes back as its latest copy
+            SELECT DISTINCT ON ({keys}) b.*
+            FROM {table}_backup b
+            JOIN selected s ON s.tombstone_id = b.tombstone_id AND s.deleted_at = b.deleted_at
+            WHERE s.restorable
+            ORDER BY {keys}, b.deleted_at DESC, b.tombstone_id DESC
+        ), restored AS (
+            INSERT INTO {table} ({columns})
+            SELECT {columns} FROM picked
+            ON CONFLICT DO NOTHING
+            RETURNING {keys}
+        ), cleared AS (
+            DELETE FROM {table}_backup b
+            USING selected s
+            JOIN restored r USING ({keys})
+            WHERE b.tombstone_id = s.tombstone_id AND b.deleted_at = s.deleted_at
+            RETURNING 1
+        )
+        SELECT (SELECT count(*) FROM selected),
+               coalesce(array_agg(p.{_TOMBSTONE_KEYS[table][0]} ORDER BY p.deletion_batch), '{{}}'),
+               coalesce(array_agg(p.deletion_batch ORDER BY p.deletion_batch), '{{}}')
+        FROM restored r
+        JOIN picked p USING ({keys})
+    """, params)
+    selected, ids, batches = cursor.fetchone()
+    return selected, list(zip(ids, batches))
+
+
+def _restore_tournament_winners(cursor, linked):
+    # a tournament that has a winner again keeps it, and its tombstone stays
+    cursor.execute("""
+        WITH picked AS (
+            SELECT DISTINCT ON (tournament_id) tournament_id, winner_id
+            FROM tournament_winners_backup
+            WHERE deletion_batch = ANY(%(batches)s::bigint[]) AND winner_id = ANY(%(ids)s::int[])
+            ORDER BY tournament_id, deleted_at DESC, tombstone_id DESC
+        ), updated AS (
+            UPDATE tournaments t
+            SET winner_id = p.winner_id
+            FROM picked p
+            WHERE t.id = p.tournament_id AND t.winner_id IS NULL
+            RETURNING t.id
+        ), cleared AS (
+            DELETE FROM tournament_winners_backup b
+            USING updated u
+            WHERE b.tournament_id = u.id AND b.deletion_batch = ANY(%(batches)s::bigint[])
+              AND b.winner_id = ANY(%(ids)s::int[])
+            RETURNING 1
+        )
+        SELECT count(*) FROM updated
+    """, linked)
+    return cursor.fetchone()[0]
+
+
+def restore_tombstones(kind, tombstone_ids=None, batches=None, since=None, until=None):
+    """Restore deleted players, tournaments or matches, with the rows deleted alongside them."""
+    table = TOMBSTONE_KINDS[kind]
+    conditions, params = [], {}
+    if tombstone_ids:
+        conditions.append("b.tombstone_id = ANY(%(tombstones)s::bigint[])")
+        params['tombstones'] = _array_literal(int(tombstone_id) for tombstone_id in tombstone_ids)
+    if batches:
+        conditions.append("b.deletion_batch = ANY(%(batches)s::bigint[])")
+        params['batches'] = _array_literal(int(batch) for batch in batches)
+    if since is not None:
+        conditions.append("b.deleted_at >= %(since)s")
+        params['since'] = since
+    if until is not None:
+        conditions.append("b.deleted_at < %(until)s")
+        params['until'] = until
+    if not conditions:
+        raise Exception("Choose the deleted rows to restore")
+
+    summary = {'selected': 0, 'restored': {}, 'ids': []}
+    started = time.monotonic()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        summary['selected'], restored = _restore_tombstone_rows(cursor, table, " AND ".join(conditions), params)
+        summary['ids'] = [row_id for row_id, _ in restored]
+        summary['restored'][table] = len(restored)
+        match_ids = summary['ids'] if table == "matches" else []
+
+        if restored:
+            linked = {'ids': _array_literal(summary['ids']),
+                      'batches': _array_literal(sorted({batch for _, batch in restored}))}
+            for dependent, condition in _TOMBSTONE_DEPENDENTS[table]:
+                _, rows = _restore_tombstone_rows(
+                    cursor, dependent, f"b.deletion_batch = ANY(%(batches)s::bigint[]) AND {condition}", linked)
+                summary['restored'][dependent] = len(rows)
+                if dependent == "matches":
+                    match_ids = [row_id for row_id, _ in rows]
+            if table == "users":
+                summary['restored']['tournament wins'] = _restore_tournament_winners(cursor, linked)
+
+        if match_ids:
+            cursor.execute("""
+                WITH restored AS (
+                    SELECT player1_id, player2_id, winner_id, 1 AS sign
+                    FROM matches
+                    WHERE id = ANY(%(ids)s::int[])
+                ), """ + _PLAYER_STATS_CHANGES.format(changes="restored") + """
+                SELECT id, game_id, player1_id, player2_id, winner_id
+                FROM matches
+                WHERE id = ANY(%(ids)s::int[])
+                ORDER BY created_at, id
+            """, {'ids': _array_literal(match_ids)})
+            rate_matches(cursor, cursor.fetchall())
+        if summary['ids']:
+            notify_change(cursor, table, "insert", summary['ids'])
+        if match_ids and table != "matches":
+            notify_change(cursor, "matches", "insert", match_ids)
+        summary['match_ids'] = match_ids
+        cursor.close()
+
+    if table == "users":
+        identity_cache.forget("users", summary['ids'])
+    summary['seconds'] = time.monotonic() - started
+    return summary
+
+
+def latest_deletion_batch(kind):
+    """The deletion batch of the most recently deleted player, tournament or match, or None."""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT deletion_batch
+            FROM {TOMBSTONE_KINDS[kind]}_backup
+            ORDER BY deleted_at DESC, tombstone_id DESC
+            LIMIT 1
+        """)
+        row = cursor.fetchone()
+        cursor.close()
+    return row[0] if row else None
+
+
+def format_restore_tombstones_summary(summary):
+    lines = [f"restored {count} {table}" for table, count in summary['restored'].items() if count]
+    skipped = summary['selected'] - next(iter(summary['restored'].values()), 0)
+    if skipped:
+        lines.append(f"{skipped} left deleted: their id or name is in use again, or a row they refer to is gone")
+    return "\n".join(lines) or "Nothing was restored."
+
+
+def backup_database(incremental=True):
+    if job_running("backup_database"):
+        messagebox.showinfo("Backup", "A backup is already running.")
+        return
+
+    try:
+        db = get_firestore_client()
+    except Exception as e:
+        messagebox.showerror("Firebase Error", f"Error initializing Firebase:\n{e}")
+        return
+
+    def progress(table, rows, elapsed):
+        report_status(f"Backing up {table}: {rows} rows written ({elapsed:.0f}s)")
+
+    def done(summary):
+        messagebox.showinfo("Success", "Database backed up to Firebase successfully.\n\n"
+                            + format_backup_summary(summary))
+
+    def failed(e):
+        if isinstance(e, (psycopg2.OperationalError, psycopg2.pool.PoolError)):
+            messagebox.showerror("Database Error", f"Could not connect to PostgreSQL database.\n{e}")
+        else:
+            messagebox.showerror("Backup Error", f"Error during backup:\n{e}")
+
+    run_in_background("backup_database",
+                      lambda: run_firestore_backup(db, incremental=incremental, progress=progress),
+                      on_done=done, on_error=failed)
+
+
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_MANIFEST = "manifest.json"
+
+# tables in the same wave have no foreign keys between them and are loaded in parallel
+RESTORE_WAVES = [
+    ("games", "users", "teams"),
+    ("player_games", "team_members", "tournaments", "player_stats"),
+    ("tournament_participants", "matches"),
+]
+
+_frame_header = struct.Struct(">I")
+COPY_BUFFER_SIZE = 1024 * 1024
+RESTORE_INDEX_MEMORY = "512MB"
+
+
+def _snapshot_codec(name=None):
+    name = name or ('zstd' if zstandard is not None else 'zlib')
+    if name == 'zstd':
+        if zstandard is None:
+            raise Exception("This snapshot is zstd-compressed; install the zstandard package to restore it")
+        return name, zstandard.ZstdCompressor(level=3).compress, zstandard.ZstdDecompressor().decompress
+    if name == 'zlib':
+        return name, lambda data: zlib.compress(data, 6), zlib.decompress
+    raise Exception(f"Unknown snapshot codec {name}")
+
+
+class _FrameWriter:
+    # file-like COPY sink that cuts the stream into compressed frames on row boundaries
+    def __init__(self, out, compress, frame_bytes):
+        self.out = out
+        self.compress = compress
+        self.frame_bytes = frame_bytes
+        self.buffer = bytearray()
+        self.stats = {'rows': 0, 'frames': 0, 'bytes': 0, 'compressed_bytes': 0}
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.buffer += data
+        if len(self.buffer) >= self.frame_bytes:
+            cut = self.buffer.rfind(b"\n") + 1
+            if cut:
+                self._emit(bytes(self.buffer[:cut]))
+                del self.buffer[:cut]
+
+    def _emit(self, raw):
+        packed = self.compress(raw)
+        self.out.write(_frame_header.pack(len(packed)))
+        self.out.write(packed)
+        self.stats['rows'] += raw.count(b"\n")
+        self.stats['frames'] += 1
+        self.stats['bytes'] += len(raw)
+        self.stats['compressed_bytes'] += len(packed)
+
+    def finish(self):
+        if self.buffer:
+            self._emit(bytes(self.buffer))
+            self.buffer = bytearray()
+        return self.stats
+
+
+class _FrameReader:
+    # file-like source for COPY ... FROM STDIN; decompresses one frame at a time
+    def __init__(self, source, decompress):
+        self.source = source
+        self.decompress = decompress
+        self.frame = b""
+        self.offset = 0
+
+    def read(self, size=-1):
+        if self.offset >= len(self.frame):
+            header = self.source.read(_frame_header.size)
+            if not header:
+                return b""
+            (length,) = _frame_header.unpack(header)
+            self.frame = self.decompress(self.source.read(length))
+            self.offset = 0
+        end = len(self.frame) if size < 0 else self.offset + size
+        data = self.frame[self.offset:end]
+        self.offset += len(data)
+        return data
+
+    readline = read
+
+
+def table_columns(cursor, table):
+    cursor.execute("""
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s
+        ORDER BY ordinal_position
+    """, (table,))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def reset_sequences(cursor, tables):
+    # move every serial sequence past the highest id now in its table
+    cursor.execute("""
+        SELECT table_name, column_name
+        FROM information_schema.columns
+        WHERE table_schema = current_schema()
+          AND table_name = ANY(%s)
+          AND column_default LIKE 'nextval(%%'
+    """, (list(tables),))
+    values = {}
+    for table, column in cursor.fetchall():
+        cursor.execute(f"""
+            SELECT setval(pg_get_serial_sequence(%s, %s), coalesce(max({column}), 0) + 1, false)
+            FROM {table}
+        """, (table, column))
+        values[table] = cursor.fetchone()[0]
+    return values
+
+
+def _export_table_snapshot(directory, snapshot_id, table, codec, frame_bytes):
+    name, compress, _ = _snapshot_codec(codec)
+    filename = f"{table}.copy.{name}"
+    started = time.monotonic()
+    with snapshot_connection(snapshot_id) as conn:
+        cursor = conn.cursor()
+        columns = table_columns(cursor, table)
+        with open(os.path.join(directory, filename), 'wb') as out:
+            writer = _FrameWriter(out, compress, frame_bytes)
+            cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) TO STDOUT", writer)
+            stats = writer.finish()
+        cursor.close()
+    stats.update({'file': filename, 'columns': columns, 'seconds': time.monotonic() - started})
+    return stats
+
+
+def export_snapshot(directory, tables=None, workers=4, codec=None, frame_bytes=8 * 1024 * 1024):
+    """Write every backup table to `directory` as compressed COPY frames plus a manifest."""
+    tables = list(tables or BACKUP_TABLES)
+    codec = _snapshot_codec(codec)[0]
+    os.makedirs(directory, exist_ok=True)
+
+    started = time.monotonic()
+    with futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="snapshot") as pool, \
+            exported_snapshot() as snapshot_id:
+        jobs = {table: pool.submit(_export_table_snapshot, directory, snapshot_id, table, codec, frame_bytes)
+                for table in tables}
+        table_stats = {table: job.result() for table, job in jobs.items()}
+
+    manifest = {
+        'format': SNAPSHOT_FORMAT,
+        'codec': codec,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'database': config().get('database'),
+        'seconds': time.monotonic() - started,
+        'tables': table_stats,
+    }
+    with open(os.path.join(directory, SNAPSHOT_MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def _drop_plain_indexes(cursor, tables):
+    # indexes that back no constraint, dropped so an emptied table is loaded without them and they are built once
+    cursor.execute("""
+        SELECT i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        WHERE i.indrelid = ANY(%s::regclass[])
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+    """, (list(tables),))
+    indexes = cursor.fetchall()
+    for name, _ in indexes:
+        cursor.execute(f"DROP INDEX {name}")
+    return [definition for _, definition in indexes]
+
+
+def restore_snapshot(directory, truncate=True, clear_tombstones=False):
+    """Load a snapshot written by export_snapshot back into the database, in one transaction."""
+    with open(os.path.join(directory, SNAPSHOT_MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != SNAPSHOT_FORMAT:
+        raise Exception(f"Unsupported snapshot format {manifest.get('format')}")
+
+    entries = manifest['tables']
+    _, _, decompress = _snapshot_codec(manifest['codec'])
+    started = time.monotonic()
+    restored = {}
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT rolsuper FROM pg_roles WHERE rolname = current_user")
+        superuser = cursor.fetchone()[0]
+        # the leaderboard and id_blocks are rebuilt once everything is loaded
+        cursor.execute("SET LOCAL gaming_portal.skip_leaderboard = on")
+        cursor.execute("SET LOCAL gaming_portal.skip_id_blocks = on")
+        indexes = []
+        if truncate:
+            cursor.execute(f"TRUNCATE {', '.join(list(entries))} CASCADE")
+            indexes = _drop_plain_indexes(cursor, entries)
+        if clear_tombstones:
+            cursor.execute(f"TRUNCATE {', '.join(TOMBSTONE_TABLES)}")
+
+        if superuser:
+            # the snapshot was consistent, so skip the per-row foreign key and trigger work
+            cursor.execute("SET LOCAL session_replication_role = replica")
+            order = list(entries)
+        else:
+            order = [table for wave in RESTORE_WAVES for table in wave if table in entries]
+            order += [table for table in entries if table not in order]
+
+        for table in order:
+            table_started = time.monotonic()
+            with open(os.path.join(directory, entries[table]['file']), 'rb') as source:
+                cursor.copy_expert(f"COPY {table} ({', '.join(entries[table]['columns'])}) FROM STDIN",
+                                   _FrameReader(source, decompress), size=COPY_BUFFER_SIZE)
+            restored[table] = {'rows': cursor.rowcount, 'seconds': time.monotonic() - table_started}
+
+        indexes_started = time.monotonic()
+        cursor.execute("SET LOCAL maintenance_work_mem = %s", (RESTORE_INDEX_MEMORY,))
+        for definition in indexes:
+            cursor.execute(definition)
+        indexing = time.monotonic() - indexes_started
+
+        if superuser:
+            cursor.execute("SET LOCAL session_replication_role = origin")
+        sequences = reset_sequences(cursor, entries)
+        cursor.execute("SELECT rebuild_leaderboard()")
+        cursor.execute("SELECT rebuild_id_blocks()")
+        cursor.close()
+
+    return {'tables': restored, 'sequences': sequences, 'indexes': {'built': len(indexes), 'seconds': indexing},
+            'seconds': time.monotonic() - started}
+
+
+def _copy_text_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.isoformat(" ")
+    text = str(value)
+    if "\\" in text or "\t" in text or "\n" in text or "\r" in text:
+        text = (text.replace("\\", "\\\\").replace("\t", "\\t")
+                .replace("\n", "\\n").replace("\r", "\\r"))
+    return text
+
+
+def copy_rows(cursor, table, columns, rows):
+    """Bulk-load a list of row tuples into `table` with COPY ... FROM STDIN."""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_text_value(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer, size=COPY_BUFFER_SIZE)
+    return len(rows)
+
+
+def _read_collection(db, collection, columns, out, stop, chunk_rows):
+    # runs on a reader thread; hands row chunks to the loader through `out`
+    def put(item):
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+    try:
+        chunk = []
+        for doc in db.collection(collection).stream():
+            if stop.is_set():
+                return
+            data = doc.to_dict()
+            chunk.append(tuple(data.get(column) for column in columns))
+            if len(chunk) >= chunk_rows:
+                put(chunk)
+                chunk = []
+        if chunk:
+            put(chunk)
+        put(None)
+    except Exception as e:
+        put(e)
+
+
+def restore_from_firestore(db, tables=None, readers=4, chunk_rows=5000, truncate=True,
+                           clear_tombstones=False, progress=print_restore_progress):
+    """Rebuild the database tables from the collections written by backup_database."""
+    tables = tables or BACKUP_TABLES
+    order = [table for wave in RESTORE_WAVES for table in wave if table in tables]
+    order += [table for table in tables if table not in order]
+
+    summary = {}
+    stop = threading.Event()
+    with pooled_connection() as conn, \
+            futures.ThreadPoolExecutor(max_workers=readers, thread_name_prefix="firestore-restore") as pool:
+        cursor = conn.cursor()
+        # foreign keys are checked once at commit, so rows can be loaded as they arrive
+        cursor.execute("SET CONSTRAINTS ALL DEFERRED")
+        cursor.execute("SET LOCAL gaming_portal.skip_leaderboard = on")
+        cursor.execute("SET LOCAL gaming_portal.skip_id_blocks = on")
+        if truncate:
+            cursor.execute(f"TRUNCATE {', '.join(order)} CASCADE")
+        if clear_tombstones:
+            cursor.execute(f"TRUNCATE {', '.join(TOMBSTONE_TABLES)}")
+
+        columns = {}
+        for table in order:
+            columns[table] = [column for column in table_columns(cursor, table) if column != CHANGE_COLUMN]
+
+        # collections are read in parallel; the bounded queues keep readers from running ahead
+        chunks = {table: queue.Queue(maxsize=4) for table in order}
+        for table in order:
+            pool.submit(_read_collection, db, tables[table], columns[table], chunks[table], stop, chunk_rows)
+
+        try:
+            for table in order:
+                started = time.monotonic()
+                loaded = 0
+                while True:
+                    chunk = chunks[table].get()
+                    if chunk is None:
+                        break
+                    if isinstance(chunk, Exception):
+                        raise chunk
+                    loaded += copy_rows(cursor, table, columns[table], chunk)
+                    if progress:
+                        progress(table, loaded, time.monotonic() - started)
+                elapsed = time.monotonic() - started
+                summary[table] = {
+                    'rows': loaded,
+                    'seconds': elapsed,
+                    'rows_per_sec': loaded / elapsed if elapsed > 0 else 0.0,
+                }
+            summary['_sequences'] = reset_sequences(cursor, order)
+            cursor.execute("SELECT rebuild_leaderboard()")
+            cursor.execute("SELECT rebuild_id_blocks()")
+        finally:
+            stop.set()
+        cursor.close()
+    return summary
+
+
+ELO_START = 1500.0
+ELO_K = 24
+ELO_K_PROVISIONAL = 40
+ELO_PROVISIONAL_MATCHES = 20
+RATING_DENSE_KEYS = 1 << 25
+
+_PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+
+
+def _match_score(player1_id, player2_id, winner_id):
+    # player1's result; a winner who played neither side counts as a draw
+    if winner_id == player1_id:
+        return 1.0
+    if winner_id == player2_id:
+        return 0.0
+    return 0.5
+
+
+def elo_deltas(rating1, rating2, played1, played2, score1):
+    """Rating changes for both sides of one match; score1 is 1, 0.5 or 0."""
+    expected1 = 1.0 / (1.0 + 10.0 ** ((rating2 - rating1) / 400.0))
+    k1 = ELO_K_PROVISIONAL if played1 < ELO_PROVISIONAL_MATCHES else ELO_K
+    k2 = ELO_K_PROVISIONAL if played2 < ELO_PROVISIONAL_MATCHES else ELO_K
+    return k1 * (score1 - expected1), k2 * (expected1 - score1)
+
+
+def _array_literal(values):
+    # one '{...}' string is much cheaper than psycopg2 adapting a long list
+    return "{" + ",".join(map(repr, values)) + "}"
+
+
+statement_catalog.define("lock_ratings", """
+    SELECT game_id, player_id, rating, matches FROM player_ratings
+    WHERE (game_id, player_id) IN (SELECT * FROM unnest(%s::int[], %s::int[]))
+    ORDER BY game_id, player_id
+    FOR UPDATE
+""")
+statement_catalog.define("apply_ratings", """
+    WITH rated AS (
+        INSERT INTO match_ratings (match_id, player1_delta, player2_delta)
+        SELECT * FROM unnest(%s::int[], %s::float8[], %s::float8[])
+    )
+    INSERT INTO player_ratings (game_id, player_id, rating, matches)
+    SELECT game_id, player_id, %s + delta, played
+    FROM unnest(%s::int[], %s::int[], %s::float8[], %s::int[]) AS c(game_id, player_id, delta, played)
+    ON CONFLICT (game_id, player_id) DO UPDATE
+    SET rating = player_ratings.rating + (excluded.rating - %s),
+        matches = player_ratings.matches + excluded.matches
+""")
+
+
+def rate_matches(cursor, matches):
+    """Apply the Elo updates for new (id, game_id, player1_id, player2_id, winner_id) matches."""
+    matches = [match for match in matches
+               if None not in match[:4] and match[2] != match[3]]
+    if not matches:
+        return []
+
+    keys = sorted({(game_id, player_id) for _, game_id, player1_id, player2_id, _ in matches
+                   for player_id in (player1_id, player2_id)})
+    execute_prepared(cursor, "lock_ratings",
+                     (_array_literal(key[0] for key in keys), _array_literal(key[1] for key in keys)))
+    current = {key: [ELO_START, 0] for key in keys}
+    for game_id, player_id, rating, played in cursor.fetchall():
+        current[(game_id, player_id)] = [rating, played]
+    start = {key: tuple(value) for key, value in current.items()}
+
+    rated = []
+    for match_id, game_id, player1_id, player2_id, winner_id in matches:
+        side1, side2 = current[(game_id, player1_id)], current[(game_id, player2_id)]
+        delta1, delta2 = elo_deltas(side1[0], side2[0], side1[1], side2[1],
+                                    _match_score(player1_id, player2_id, winner_id))
+        side1[0] += delta1
+        side2[0] += delta2
+        side1[1] += 1
+        side2[1] += 1
+        rated.append((match_id, delta1, delta2))
+
+    # written as changes, so a concurrent first match for the same player adds up
+    changes = [(key, current[key][0] - start[key][0], current[key][1] - start[key][1]) for key in keys]
+    match_ids, deltas1, deltas2 = zip(*rated)
+    execute_prepared(cursor, "apply_ratings", (_array_literal(match_ids),
+                                               _array_literal(deltas1),
+                                               _array_literal(deltas2),
+                                               ELO_START,
+                                               _array_literal(key[0] for key, _, _ in changes),
+                                               _array_literal(key[1] for key, _, _ in changes),
+                                               _array_literal(delta for _, delta, _ in changes),
+                                               _array_literal(played for _, _, played in changes),
+                                               ELO_START))
+    return rated
+
+
+statement_catalog.define("unrate_matches", """
+    WITH removed AS (
+        DELETE FROM match_ratings r
+        USING matches m
+        WHERE r.match_id = m.id AND r.match_id = ANY(%s::int[])
+        RETURNING m.game_id, m.player1_id, m.player2_id, r.player1_delta, r.player2_delta
+    ), sides AS (
+        SELECT game_id, player1_id AS player_id, player1_delta AS delta FROM removed
+        UNION ALL
+        SELECT game_id, player2_id, player2_delta FROM removed
+    )
+    UPDATE player_ratings pr
+    SET rating = pr.rating - d.delta,
+        matches = pr.matches - d.matches
+    FROM (SELECT game_id, player_id, sum(delta) AS delta, count(*) AS matches
+          FROM sides GROUP BY game_id, player_id) d
+    WHERE pr.game_id = d.game_id AND pr.player_id = d.player_id
+""")
+
+
+def unrate_matches(cursor, match_ids):
+    """Take back the rating changes of matches; call before they are edited or deleted."""
+    execute_prepared(cursor, "unrate_matches", (_array_literal(match_ids),))
+
+
+# {changes} names a CTE of (player1_id, player2_id, winner_id, sign) rows, sign -1 to take a match back
+_PLAYER_STATS_CHANGES = """
+    deltas AS (
+        SELECT p.player_id, sum(c.sign * p.won) AS won, sum(c.sign) AS played
+        FROM {changes} c
+        CROSS JOIN LATERAL (
+            SELECT DISTINCT player_id, (player_id = c.winner_id)::int AS won
+            FROM unnest(ARRAY[c.player1_id, c.player2_id, c.winner_id]) AS player_id
+            WHERE player_id IS NOT NULL
+        ) p
+        GROUP BY p.player_id
+    ), stats AS (
+        UPDATE player_stats ps
+        SET matches_won = ps.matches_won + d.won,
+            total_matches = ps.total_matches + d.played
+        FROM deltas d
+        WHERE ps.player_id = d.player_id AND (d.won <> 0 OR d.played <> 0)
+        RETURNING ps.player_id
+    )
+"""
+
+
+statement_catalog.define("delete_matches", """
+    WITH deleted AS (
+        DELETE FROM matches
+        WHERE id = ANY(%s::int[])
+        RETURNING id, player1_id, player2_id, winner_id, -1 AS sign
+    ), """ + _PLAYER_STATS_CHANGES.format(changes="deleted") + """
+    SELECT id, (SELECT array_agg(player_id) FROM stats) FROM deleted
+""")
+
+
+def delete_matches(cursor, match_ids):
+    """Delete matches, take them out of player_stats and the ratings and return their ids."""
+    unrate_matches(cursor, match_ids)
+    execute_prepared(cursor, "delete_matches", (_array_literal(match_ids),))
+    rows = cursor.fetchall()
+    deleted = [row[0] for row in rows]
+    if deleted:
+        notify_change(cursor, "matches", "delete", deleted, rows[0][1] or [])
+    return deleted
+
+
+def _match_rating_levels(side1, side2):
+    # a match's level is one above both players' previous matches, found a wave at a time
+    count = len(side1)
+    slots = 2 * count
+    # sorting (key, slot) values is much quicker than an argsort
+    key, slot = np.divmod(np.sort(np.column_stack([side1, side2]).ravel() * slots + np.arange(slots)), slots)
+    match = slot // 2
+    chained = (key[1:] == key[:-1]) & (match[1:] != match[:-1])
+    following = np.full(slots, -1)
+    following[slot[:-1][chained]] = match[1:][chained]
+    following = following.reshape(count, 2)
+    waiting = np.bincount(match[1:][chained], minlength=count)
+
+    levels = np.zeros(count, dtype=np.int64)
+    seen = np.empty(count, dtype=np.int64)
+    ready = np.flatnonzero(waiting == 0)
+    level = 0
+    while len(ready):
+        level += 1
+        levels[ready] = level
+        after = following[ready].ravel()
+        after = after[after >= 0]
+        np.subtract.at(waiting, after, 1)
+        # a match both of whose previous matches were in this wave comes twice
+        ready = after[waiting[after] == 0]
+        position = np.arange(len(ready))
+        seen[ready] = position
+        ready = ready[seen[ready] == position]
+    return levels
+
+
+def replay_ratings(game_ids, player1_ids, player2_ids, winner_ids):
+    """Elo over a whole match history with NumPy; the arrays are in play order."""
+    game_ids = np.asarray(game_ids, dtype=np.int64)
+    player1_ids = np.asarray(player1_ids, dtype=np.int64)
+    player2_ids = np.asarray(player2_ids, dtype=np.int64)
+    winner_ids = np.asarray(winner_ids, dtype=np.int64)
+
+    # number every (game, player) pair 0..n, through a lookup table when the ids are small
+    span = int(max(player1_ids.max(initial=0), player2_ids.max(initial=0))) + 1
+    flat1, flat2 = game_ids * span + player1_ids, game_ids * span + player2_ids
+    size = (int(game_ids.max(initial=0)) + 1) * span
+    if size <= RATING_DENSE_KEYS:
+        present = np.zeros(size, dtype=bool)
+        present[flat1] = True
+        present[flat2] = True
+        keys = np.flatnonzero(present)
+        lookup = np.zeros(size, dtype=np.int64)
+        lookup[keys] = np.arange(len(keys))
+        side1, side2 = lookup[flat1], lookup[flat2]
+    else:
+        keys, sides = np.unique(np.concatenate([flat1, flat2]), return_inverse=True)
+        side1, side2 = sides[:len(game_ids)], sides[len(game_ids):]
+    score1 = np.where(winner_ids == player1_ids, 1.0, np.where(winner_ids == player2_ids, 0.0, 0.5))
+
+    levels = _match_rating_levels(side1, side2)
+    order = np.argsort(levels, kind='stable')
+    bounds = np.flatnonzero(np.diff(levels[order])) + 1
+
+    ratings = np.full(len(keys), ELO_START)
+    played = np.zeros(len(keys), dtype=np.int64)
+    delta1 = np.empty(len(game_ids))
+    delta2 = np.empty(len(game_ids))
+    for level in np.split(order, bounds):
+        a, b = side1[level], side2[level]
+        expected1 = 1.0 / (1.0 + 10.0 ** ((ratings[b] - ratings[a]) / 400.0))
+        k1 = np.where(played[a] < ELO_PROVISIONAL_MATCHES, ELO_K_PROVISIONAL, ELO_K)
+        k2 = np.where(played[b] < ELO_PROVISIONAL_MATCHES, ELO_K_PROVISIONAL, ELO_K)
+        d1 = k1 * (score1[level] - expected1)
+        d2 = k2 * (expected1 - score1[level])
+        ratings[a] += d1
+        ratings[b] += d2
+        played[a] += 1
+        played[b] += 1
+        delta1[level] = d1
+        delta2[level] = d2
+    return (keys // span, keys % span, ratings, played), (delta1, delta2)
+
+
+def _copy_binary_records(columns):
+    # binary COPY tuples of fixed-width non-null columns, as one numpy record
+    fields = [('count', '>i2')]
+    for index, (_, dtype) in enumerate(columns):
+        fields += [(f'len{index}', '>i4'), (f'col{index}', dtype)]
+    return np.dtype(fields)
+
+
+def _read_copy_binary(cursor, query, columns):
+    buffer = io.BytesIO()
+    cursor.copy_expert(f"COPY ({query}) TO STDOUT (FORMAT binary)", buffer, size=COPY_BUFFER_SIZE)
+    data = buffer.getbuffer()[len(_PGCOPY_HEADER):-2]
+    records = np.frombuffer(data, dtype=_copy_binary_records(columns))
+    return [records[f'col{index}'] for index in range(len(columns))]
+
+
+def _write_copy_binary(cursor, table, columns, arrays):
+    records = np.empty(len(arrays[0]), dtype=_copy_binary_records(columns))
+    records['count'] = len(columns)
+    for index, (_, dtype) in enumerate(columns):
+        records[f'len{index}'] = np.dtype(dtype).itemsize
+        records[f'col{index}'] = arrays[index]
+    buffer = io.BytesIO(_PGCOPY_HEADER + records.tobytes() + struct.pack(">h", -1))
+    cursor.copy_expert(f"COPY {table} ({', '.join(name for name, _ in columns)}) FROM STDIN (FORMAT binary)",
+                       buffer, size=COPY_BUFFER_SIZE)
+
+
+def rebuild_ratings(progress=None):
+    """Recompute every rating by replaying the matches table in played order."""
+    if np is None:
+        raise Exception("Rebuilding ratings needs numpy (pip install numpy)")
+    started = time.monotonic()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        # matches cannot change during the replay, so the foreign key checks can be skipped
+        cursor.execute("LOCK TABLE matches IN SHARE MODE")
+        cursor.execute("LOCK TABLE player_ratings, match_ratings IN EXCLUSIVE MODE")
+        cursor.execute("SELECT rolsuper FROM pg_roles WHERE rolname = current_user")
+        if cursor.fetchone()[0]:
+            cursor.execute("SET LOCAL session_replication_role = replica")
+        match_ids, game_ids, player1_ids, player2_ids, winner_ids = _read_copy_binary(cursor, """
+            SELECT id, game_id, player1_id, player2_id, coalesce(winner_id, 0) FROM matches
+            WHERE game_id IS NOT NULL AND player1_id IS NOT NULL AND player2_id IS NOT NULL
+              AND player1_id <> player2_id
+            ORDER BY created_at, id
+        """, [('id', '>i4')] * 5)
+        if progress:
+            progress("read", len(match_ids), time.monotonic() - started)
+
+        (games, players, ratings, played), (delta1, delta2) = replay_ratings(
+            game_ids, player1_ids, player2_ids, winner_ids)
+        if progress:
+            progress("replayed", len(match_ids), time.monotonic() - started)
+
+        cursor.execute("TRUNCATE match_ratings, player_ratings")
+        _write_copy_binary(cursor, "player_ratings",
+                           [('game_id', '>i4'), ('player_id', '>i4'), ('rating', '>f8'), ('matches', '>i4')],
+                           [games, players, ratings, played])
+        _write_copy_binary(cursor, "match_ratings",
+                           [('match_id', '>i4'), ('player1_delta', '>f8'), ('player2_delta', '>f8')],
+                           [match_ids, delta1, delta2])
+        cursor.close()
+    elapsed = time.monotonic() - started
+    if progress:
+        progress("written", len(match_ids), elapsed)
+    return {'matches': len(match_ids), 'players': len(games), 'seconds': elapsed}
+
+
+def print_ratings_rebuild():
+    # restores empty the rating tables along with matches, so they end with this too
+    if np is None:
+        print("numpy is not installed; run rebuild-ratings once it is")
+        return
+    result = rebuild_ratings()
+    print(f"Ratings rebuilt from {result['matches']} matches for {result['players']} "
+          f"player/game pairs in {result['seconds']:.1f}s")
+
+
+def fetch_player_ratings(player_id):
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT g.name, round(pr.rating)::int, pr.matches
+            FROM player_ratings pr
+            JOIN games g ON g.id = pr.game_id
+            WHERE pr.player_id = %s
+            ORDER BY pr.rating DESC
+        """, (player_id,))
+        rows = cursor.fetchall()
+        cursor.close()
+    return rows
+
+
+MATCH_FEED_FIELDS = ("external_id", "game", "player1", "player2", "winner", "match_type", "created_at")
+INGEST_BATCH_ROWS = 20000
+INGEST_MAX_ERRORS = 20
+
+
+def read_match_feed(stream, fmt):
+    """Yield one dict per match from a CSV feed (with a header row) or a JSON Lines feed."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    elif fmt == 'jsonl':
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    else:
+        raise Exception(f"Unknown feed format {fmt}")
+
+
+def _resolve_match_batch(records):
+    # one identity-cache lookup per table for the whole batch
+    players = identity_cache.resolve("users", {record.get(field) for record in records
+                                               for field in ("player1", "player2", "winner")
+                                               if record.get(field)})
+    games = identity_cache.resolve("games", {record.get("game") for record in records if record.get("game")})
+
+    rows, rejected, seen = [], [], set()
+    for record in records:
+        external_id = record.get("external_id")
+        if external_id in seen:
+            # repeated within the batch: counted as a duplicate like one already stored
+            continue
+        missing = [field for field in MATCH_FEED_FIELDS[:5] if not record.get(field)]
+        if missing:
+            rejected.append((external_id, f"missing {', '.join(missing)}"))
+            continue
+        unknown = [record[field] for field in ("player1", "player2", "winner") if record[field] not in players]
+        if record["game"] not in games:
+            unknown.append(record["game"])
+        if unknown:
+            rejected.append((external_id, f"unknown {', '.join(unknown)}"))
+            continue
+        seen.add(external_id)
+        rows.append((str(external_id), games[record["game"]], players[record["player1"]],
+                     players[record["player2"]], players[record["winner"]],
+                     (record.get("match_type") or "friendly").lower(), record.get("created_at") or None))
+    return rows, rejected
+
+
+def _read_match_batches(records, batch_rows, out, stop):
+    # reader thread: parses and resolves the next batch while the previous one loads
+    def put(item):
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+    try:
+        batch = []
+        for record in records:
+            if stop.is_set():
+                return
+            batch.append(record)
+            if len(batch) >= batch_rows:
+                put((len(batch),) + _resolve_match_batch(batch))
+                batch = []
+        if batch:
+            put((len(batch),) + _resolve_match_batch(batch))
+        put(None)
+    except Exception as e:
+        put(e)
+
+
+def ingest_matches(stream, fmt='csv', batch_rows=INGEST_BATCH_ROWS, progress=print_ingest_progress):
+    """Load a feed of match results, skipping matches whose external_id is already stored."""
+    summary = {'rows': 0, 'inserted': 0, 'duplicates': 0, 'rejected': 0, 'batches': 0, 'errors': []}
+    started = time.monotonic()
+    batches = queue.Queue(maxsize=2)
+    stop = threading.Event()
+    reader = threading.Thread(target=_read_match_batches, name="match-feed-reader",
+                              args=(read_match_feed(stream, fmt), batch_rows, batches, stop), daemon=True)
+
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS match_staging (
+                external_id varchar(100),
+                game_id integer,
+                player1_id integer,
+                player2_id integer,
+                winner_id integer,
+                match_type varchar(20),
+                created_at timestamp
+            ) ON COMMIT DELETE ROWS
+        """)
+        conn.commit()
+
+        reader.start()
+        try:
+            while True:
+                batch = batches.get()
+                if batch is None:
+                    break
+                if isinstance(batch, Exception):
+                    raise batch
+                read, rows, rejected = batch
+
+                copy_rows(cursor, "match_staging", ("external_id", "game_id", "player1_id", "player2_id",
+                                                    "winner_id", "match_type", "created_at"), rows)
+                cursor.execute("""
+                    WITH inserted AS (
+                        INSERT INTO matches (external_id, game_id, player1_id, player2_id, winner_id,
+                                             match_type, created_at)
+                        SELECT external_id, game_id, player1_id, player2_id, winner_id, match_type,
+                               coalesce(created_at, current_timestamp)
+                        FROM match_staging
+                        ON CONFLICT (external_id) DO NOTHING
+                        RETURNING id, game_id, player1_id, player2_id, winner_id, created_at, 1 AS sign
+                    ), """ + _PLAYER_STATS_CHANGES.format(changes="inserted") + """
+                    SELECT id, game_id, player1_id, player2_id, winner_id
+                    FROM inserted
+                    ORDER BY created_at, id
+                """)
+                recorded = cursor.fetchall()
+                rate_matches(cursor, recorded)
+                inserted = len(recorded)
+                if recorded:
+                    notify_change(cursor, "matches", "insert", [row[0] for row in recorded],
+                                  {player_id for row in recorded for player_id in row[2:]})
+                conn.commit()
+
+                summary['rows'] += read
+                summary['batches'] += 1
+                summary['inserted'] += inserted
+                summary['duplicates'] += read - len(rejected) - inserted
+                summary['rejected'] += len(rejected)
+                summary['errors'] += rejected[:INGEST_MAX_ERRORS - len(summary['errors'])]
+                if progress:
+                    progress("matches", summary['rows'], time.monotonic() - started)
+        finally:
+            stop.set()
+        cursor.close()
+
+    summary['seconds'] = time.monotonic() - started
+    summary['rows_per_sec'] = summary['rows'] / summary['seconds'] if summary['seconds'] > 0 else 0.0
+    return summary
+
+
+def format_ingest_summary(summary):
+    lines = [f"{summary['rows']} rows in {summary['batches']} batches, {summary['seconds']:.1f}s "
+             f"({summary['rows_per_sec']:.0f} rows/s)",
+             f"inserted {summary['inserted']}, already present {summary['duplicates']}, "
+             f"rejected {summary['rejected']}"]
+    for external_id, reason in summary['errors']:
+        lines.append(f"  {external_id}: {reason}")
+    return "\n".join(lines)
+
+
+RECONCILE_CHUNK_PLAYERS = 50000
+RECONCILE_MAX_REPORTED = 20
+_RECONCILE_LOCK = 7301500
+
+_RECONCILE_CHUNK = """
+    WITH played AS (
+        -- same rule as create_match: everyone in the match played it once
+        SELECT player1_id AS player_id, (player1_id = winner_id)::int AS won
+        FROM matches
+        WHERE player1_id >= %(low)s AND player1_id < %(high)s
+        UNION ALL
+        SELECT player2_id, (player2_id = winner_id)::int
+        FROM matches
+        WHERE player2_id >= %(low)s AND player2_id < %(high)s
+          AND player2_id IS DISTINCT FROM player1_id
+        UNION ALL
+        SELECT winner_id, 1
+        FROM matches
+        WHERE winner_id >= %(low)s AND winner_id < %(high)s
+          AND winner_id IS DISTINCT FROM player1_id AND winner_id IS DISTINCT FROM player2_id
+    ), counted AS (
+        SELECT player_id, sum(won) AS won, count(*) AS played
+        FROM played
+        GROUP BY player_id
+    ), titles AS (
+        SELECT winner_id AS player_id, count(*) AS won
+        FROM tournaments
+        WHERE winner_id >= %(low)s AND winner_id < %(high)s
+        GROUP BY winner_id
+    ), expected AS (
+        SELECT u.id AS player_id, u.username,
+               coalesce(t.won, 0)::int AS tournaments_won,
+               coalesce(c.won, 0)::int AS matches_won,
+               coalesce(c.played, 0)::int AS total_matches
+        FROM users u
+        LEFT JOIN counted c ON c.player_id = u.id
+        LEFT JOIN titles t ON t.player_id = u.id
+        WHERE u.id >= %(low)s AND u.id < %(high)s
+          AND (u.role = 'player' OR c.player_id IS NOT NULL OR t.player_id IS NOT NULL
+               OR EXISTS (SELECT 1 FROM player_stats ps WHERE ps.player_id = u.id))
+    ), drift AS (
+        SELECT e.player_id, e.username, ps.player_id IS NULL AS missing,
+               ARRAY[ps.tournaments_won, ps.matches_won, ps.total_matches] AS stored,
+               ARRAY[e.tournaments_won, e.matches_won, e.total_matches] AS expected
+        FROM expected e
+        LEFT JOIN player_stats ps ON ps.player_id = e.player_id
+        WHERE ps.player_id IS NULL
+           OR (ps.tournaments_won, ps.matches_won, ps.total_matches)
+              IS DISTINCT FROM (e.tournaments_won, e.matches_won, e.total_matches)
+    ), fixed AS (
+        -- applied as a correction to whatever the row holds by the time it
+        -- is locked, so a match recorded while this runs is not lost
+        UPDATE player_stats ps
+        SET tournaments_won = coalesce(ps.tournaments_won, 0) + d.expected[1] - coalesce(d.stored[1], 0),
+            matches_won = coalesce(ps.matches_won, 0) + d.expected[2] - coalesce(d.stored[2], 0),
+            total_matches = coalesce(ps.total_matches, 0) + d.expected[3] - coalesce(d.stored[3], 0)
+        FROM drift d
+        WHERE %(apply)s AND NOT d.missing AND ps.player_id = d.player_id
+        RETURNING ps.player_id
+    ), added AS (
+        INSERT INTO player_stats (player_id, tournaments_won, matches_won, total_matches)
+        SELECT player_id, expected[1], expected[2], expected[3]
+        FROM drift
+        WHERE %(apply)s AND missing
+        ON CONFLICT (player_id) DO NOTHING
+        RETURNING player_id
+    )
+    SELECT (SELECT count(*) FROM expected),
+           (SELECT count(*) FROM drift),
+           (SELECT count(*) FROM drift WHERE missing),
+           (SELECT count(*) FROM fixed) + (SELECT count(*) FROM added),
+           (SELECT coalesce(json_agg(json_build_array(player_id, username, missing, stored, expected)), '[]')
+            FROM (SELECT * FROM drift ORDER BY player_id LIMIT %(report)s) sample)
+"""
+
+
+def reconcile_player_stats(apply=False, chunk_players=RECONCILE_CHUNK_PLAYERS, progress=None):
+    """Recompute player_stats in chunks and report (or with apply=True fix) the rows that differ."""
+    summary = {'players': 0, 'drifted': 0, 'missing': 0, 'fixed': 0, 'chunks': 0, 'samples': []}
+    started = time.monotonic()
+    with pooled_connection(autocommit=True) as conn:
+        cursor = conn.cursor()
+        # two runs applying the same correction would apply it twice
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", (_RECONCILE_LOCK,))
+        if not cursor.fetchone()[0]:
+            raise Exception("Another stats reconciliation is already running")
+        try:
+            cursor.execute("SELECT min(id), max(id) FROM users")
+            first, last = cursor.fetchone()
+            low = first or 0
+            while first is not None and low <= last:
+                cursor.execute(_RECONCILE_CHUNK, {'low': low, 'high': low + chunk_players, 'apply': apply,
+                                                  'report': RECONCILE_MAX_REPORTED - len(summary['samples'])})
+                players, drifted, missing, fixed, samples = cursor.fetchone()
+                summary['players'] += players
+                summary['drifted'] += drifted
+                summary['missing'] += missing
+                summary['fixed'] += fixed
+                summary['chunks'] += 1
+                summary['samples'] += [tuple(sample) for sample in samples]
+                low += chunk_players
+                if progress:
+                    progress("player_stats", summary['players'], time.monotonic() - started)
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (_RECONCILE_LOCK,))
+            cursor.close()
+
+    summary['seconds'] = time.monotonic() - started
+    return summary
+
+
+def format_reconcile_summary(summary):
+    lines = [f"{summary['players']} players checked in {summary['chunks']} chunks, {summary['seconds']:.1f}s",
+             f"{summary['drifted']} differ from the match history ({summary['missing']} without a stats row)"]
+    if summary['fixed']:
+        lines.append(f"corrected {summary['fixed']}")
+    for player_id, username, missing, stored, expected in summary['samples']:
+        stored = "missing" if missing else "/".join(map(str, stored))
+        lines.append(f"  {username} (#{player_id}): tournaments/wins/played {stored} -> "
+                     f"{'/'.join(map(str, expected))}")
+    if summary['drifted'] > len(summary['samples']):
+        lines.append(f"  ... and {summary['drifted'] - len(summary['samples'])} more")
+    return "\n".join(lines)
+
+
+class BackgroundExecutor:
+    """Runs database jobs on worker threads and hands their results back to the Tk thread."""
+
+    def __init__(self, root, max_workers=4, poll_ms=15):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.pool = futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-job")
+        self.results = queue.Queue()
+        self.status = tk.StringVar(master=root, value="Ready")
+        # the last report_status() text, kept until the next one
+        self.message = tk.StringVar(master=root, value="")
+        self.pending = {}
+        self.latest = {}
+        self.stats = {}
+        self._ids = itertools.count(1)
+        self._closed = False
+        root.after(poll_ms, self._poll)
+
+    def submit(self, name, func, *args, on_done=None, on_error=None, key=None):
+        # a job with the same key as an earlier one cancels it or drops its result
+        job_id = next(self._ids)
+        if key is not None:
+            previous = self.latest.get(key)
+            if previous in self.pending and self.pending[previous][0].cancel():
+                self._record(self.pending.pop(previous)[1], 'cancelled')
+            self.latest[key] = job_id
+        future = self.pool.submit(self._run, job_id, func, args, time.monotonic())
+        self.pending[job_id] = (future, name, key, on_done, on_error)
+        self._show_busy()
+        return future
+
+    def report(self, text):
+        # safe to call from worker threads
+        self.results.put((None, 'report', text, 0.0, 0.0))
+
+    def call_soon(self, func, *args):
+        # safe to call from any thread; func runs on the Tk thread
+        self.results.put((None, 'call', (func, args), 0.0, 0.0))
+
+    def _run(self, job_id, func, args, submitted):
+        started = time.monotonic()
+        try:
+            result = ('ok', func(*args))
+        except Exception as e:
+            result = ('error', e)
+        self.results.put((job_id, result[0], result[1], started - submitted, time.monotonic() - started))
+
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    job_id, outcome, value, waited, ran = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                if job_id is None:
+                    if outcome == 'call':
+                        self._call(*value)
+                    else:
+                        self.message.set(value)
+                    continue
+                self._deliver(job_id, outcome, value, waited, ran)
+        finally:
+            if not self._closed:
+                self.root.after(self.poll_ms, self._poll)
+
+    def _call(self, func, args):
+        try:
+            func(*args)
+        except tk.TclError:
+            pass
+        except Exception as e:
+            report_status(f"{getattr(func, '__name__', 'callback')} failed: {e}")
+
+    def _deliver(self, job_id, outcome, value, waited, ran):
+        entry = self.pending.pop(job_id, None)
+        if entry is None:
+            return
+        _, name, key, on_done, on_error = entry
+        superseded = key is not None and self.latest.get(key) != job_id
+        if key is not None and not superseded:
+            del self.latest[key]
+        self._record(name, 'superseded' if superseded else outcome, waited, ran)
+        self._show_busy()
+        if superseded:
+            return
+
+        try:
+            if outcome == 'ok':
+                if on_done is not None:
+                    on_done(value)
+            elif on_error is not None:
+                on_error(value)
+            else:
+                messagebox.showerror("Error", str(value))
+        except tk.TclError:
+            # the widgets this job was meant for have been destroyed
+            pass
+
+    def _record(self, name, outcome, waited=0.0, ran=0.0):
+        stats = self.stats.setdefault(name, {'count': 0, 'errors': 0, 'dropped': 0,
+                                             'wait_time': 0.0, 'run_time': 0.0, 'max_latency': 0.0,
+                                             'last_latency': 0.0})
+        if outcome in ('cancelled', 'superseded'):
+            stats['dropped'] += 1
+            return
+        stats['count'] += 1
+        if outcome == 'error':
+            stats['errors'] += 1
+        stats['wait_time'] += waited
+        stats['run_time'] += ran
+        stats['max_latency'] = max(stats['max_latency'], waited + ran)
+        stats['last_latency'] = waited + ran
+
+    def _show_busy(self):
+        if self.pending:
+            names = sorted({entry[1] for entry in self.pending.values()})
+            self.status.set("Working: " + ", ".join(names))
+            self.root.configure(cursor="watch")
+        else:
+            self.status.set("Ready")
+            self.root.configure(cursor="")
+
+    def job_stats(self):
+        return {name: dict(stats) for name, stats in self.stats.items()}
+
+    def shutdown(self):
+        self._closed = True
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+_executor = None
+
+
+def start_executor(root, max_workers=4):
+    global _executor
+    _executor = BackgroundExecutor(root, max_workers=max_workers)
+    return _executor
+
+
+def run_in_background(name, func, *args, on_done=None, on_error=None, key=None):
+    """Run func(*args) off the Tk thread, then on_done(result) or on_error(exc) on it."""
+    if _executor is None:
+        # no Tk loop (maintenance commands); run inline
+        try:
+            result = func(*args)
+        except Exception as e:
+            if on_error is None:
+                raise
+            on_error(e)
+            return
+        if on_done is not None:
+            on_done(result)
+        return
+    return _executor.submit(name, func, *args, on_done=on_done, on_error=on_error, key=key)
+
+
+def report_status(text):
+    if _executor is not None:
+        _executor.report(text)
+
+
+def job_running(name):
+    return _executor is not None and any(entry[1] == name for entry in _executor.pending.values())
+
+
+def add_status_bar(parent):
+    if _executor is not None:
+        bar = ttk.Frame(parent)
+        bar.pack(side=tk.BOTTOM, fill='x')
+        ttk.Label(bar, textvariable=_executor.status, anchor='w').pack(side=tk.LEFT)
+        ttk.Label(bar, textvariable=_executor.message, anchor='e').pack(side=tk.RIGHT, fill='x', expand=True)
+
+
+_change_subscribers = []
+
+
+def subscribe_changes(widget, handler):
+    """Call handler(group_changes(batch)) on the Tk thread while widget exists."""
+    _change_subscribers.append((widget, handler))
+
+
+def dispatch_changes(events):
+    changes = group_changes(events)
+    for widget, handler in list(_change_subscribers):
+        if not widget.winfo_exists():
+            _change_subscribers.remove((widget, handler))
+            continue
+        handler(changes)
+
+
+def start_change_listener():
+    def deliver(events):
+        _forget_deleted_users(events)
+        if _executor is not None:
+            _executor.call_soon(dispatch_changes, events)
+
+    return ChangeListener(deliver).start()
+
+
+def show_changed_rows(tree, changes, table, fetch_rows, insert_at):
+    """Apply other instances' changes to table's rows in a VirtualTreeview."""
+    deleted = changes.get((table, "delete"), set())
+    inserted = changes.get((table, "insert"), set())
+    updated = changes.get((table, "update"), set())
+    if deleted is None or inserted is None or updated is None:
+        tree.refresh()
+        return
+    if deleted:
+        remove_rows(tree, deleted)
+    wanted = sorted((inserted | updated) - deleted)
+    if not wanted:
+        return
+
+    def done(rows):
+        if not tree.winfo_exists():
+            return
+        for row in rows:
+            index = None
+            if row[0] in inserted and tree.cached_row(row[0]) is None:
+                index = insert_at(tree, row)
+                if index is None:
+                    tree.refresh()
+                    return
+            upsert_row(tree, row, index)
+
+    run_in_background(f"live_{table}", fetch_rows, wanted, on_done=done,
+                      on_error=lambda e: report_status(f"Live update failed: {e}"))
+
+
+def _newest_first_position(tree, row):
+    # a row newer than the top one goes on top
+    first = tree.pages.get(0)
+    if not first:
+        return 0 if tree.total == 0 else None
+    return 0 if row[0] > first[0][0] else None
+
+
+def _oldest_first_position(tree, row):
+    # a row newer than the bottom one goes at the bottom
+    last = tree.pages.get((tree.total - 1) // tree.page_size) if tree.total else []
+    if not last:
+        return 0 if tree.total == 0 else None
+    return tree.total if row[0] > last[-1][0] else None
+
+
+def _row_items(rows, key_column):
+    # item ids are the row keys; a repeated key gets its position appended
+    items = []
+    seen = set()
+    for row in rows:
+        iid = str(row[key_column])
+        if iid in seen:
+            iid = f"{iid}:{len(items)}"
+        seen.add(iid)
+        items.append((iid, tuple(row)))
+    return items
+
+
+def sync_tree(tree, rows, key_column=0):
+    """Make tree show rows, in order, touching only the items that differ."""
+    if tree.winfo_exists():
+        _sync_items(tree, _row_items(rows, key_column))
+
+
+def _sync_items(tree, wanted):
+    shown = tree.__dict__.setdefault('synced_rows', {})
+    keep = {iid for iid, _ in wanted}
+
+    stale = [iid for iid in ttk.Treeview.get_children(tree) if iid not in keep]
+    if stale:
+        ttk.Treeview.delete(tree, *stale)
+        for iid in stale:
+            shown.pop(iid, None)
+
+    children = list(ttk.Treeview.get_children(tree))
+    for index, (iid, row) in enumerate(wanted):
+        if iid not in shown:
+            ttk.Treeview.insert(tree, '', index, iid=iid, values=row)
+            children.insert(index, iid)
+        else:
+            if shown[iid] != row:
+                ttk.Treeview.item(tree, iid, values=row)
+            if children[index] != iid:
+                ttk.Treeview.move(tree, iid, '', index)
+                children.remove(iid)
+                children.insert(index, iid)
+        shown[iid] = row
+
+
+def upsert_row(tree, row, index=None, key_column=0):
+    """Show a row returned by a write: update it in place, or insert it at index."""
+    if isinstance(tree, VirtualTreeview):
+        tree.upsert(row, index)
+        return
+    if not tree.winfo_exists():
+        return
+    shown = tree.__dict__.setdefault('synced_rows', {})
+    iid = str(row[key_column])
+    if iid in shown:
+        ttk.Treeview.item(tree, iid, values=row)
+    elif index is not None:
+        ttk.Treeview.insert(tree, '', index, iid=iid, values=row)
+    else:
+        return
+    shown[iid] = tuple(row)
+
+
+def remove_rows(tree, keys):
+    if isinstance(tree, VirtualTreeview):
+        tree.remove(*keys)
+        return
+    if not tree.winfo_exists():
+        return
+    shown = tree.__dict__.setdefault('synced_rows', {})
+    gone = [str(key) for key in keys if str(key) in shown]
+    if gone:
+        ttk.Treeview.delete(tree, *gone)
+    for iid in gone:
+        del shown[iid]
+
+
+def fill_combo(combo, name, fetch):
+    def done(values):
+        if combo.winfo_exists():
+            combo['values'] = values
+    run_in_background(name, fetch, on_done=done, key=(name, str(combo)))
+
+
+PAGE_SIZE = 100
+ID_BLOCK = 1024
+
+
+def _keyset(column, after, before, descending):
+    # after/before key the rows either side of the page; before-pages are read reversed
+    if after is not None:
+        return f"{column} {'<' if descending else '>'} %s", after
+    if before is not None:
+        return f"{column} {'>' if descending else '<'} %s", before
+    return None, None
+
+
+def _seek_position(listing, column, offset, descending):
+    # id_blocks counts a listing's rows per block of ID_BLOCK ids: the block holding offset, then a skip into it
+    order = "DESC" if descending else "ASC"
+    start = f"""
+        WITH start AS (
+            SELECT block, %s - (through - entries) AS skip
+            FROM (SELECT block, entries, sum(entries) OVER (ORDER BY block {order}) AS through
+                  FROM id_blocks WHERE listing = %s) b
+            WHERE through > %s
+            ORDER BY block {order} LIMIT 1
+        )
+    """
+    if descending:
+        bound = f"{column} < ((SELECT block FROM start) + 1) * {ID_BLOCK}"
+    else:
+        bound = f"{column} >= (SELECT block FROM start) * {ID_BLOCK}"
+    return start, [offset, listing, offset], bound
+
+
+def _page_query(ids_query, ids_params, select, order, before, prepared=None):
+    # prepared names the shape of the query, to run it from the statement catalog
+    rows_query = select.format(ids=ids_query, order=order)
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        if prepared is None:
+            cursor.execute(rows_query, ids_params)
+        else:
+            execute_prepared(cursor, statement_catalog.define(prepared, rows_query), ids_params)
+        rows = cursor.fetchall()
+        cursor.close()
+    if before is not None:
+        rows.reverse()
+    return rows
+
+
+def count_matches(game_id=None, player_id=None):
+    conditions, params = [], []
+    if game_id is not None:
+        conditions.append("game_id = %s")
+        params.append(game_id)
+    if player_id is not None:
+        conditions.append("(player1_id = %s OR player2_id = %s)")
+        params += [player_id, player_id]
+    shape = ("_game" if game_id is not None else "") + ("_player" if player_id is not None else "")
+    if conditions:
+        sql = "SELECT count(*) FROM matches WHERE " + " AND ".join(conditions)
+    else:
+        sql = "SELECT coalesce(sum(entries), 0) FROM id_blocks WHERE listing = 'matches'"
+    query = statement_catalog.define("count_matches" + shape, sql)
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        execute_prepared(cursor, query, params)
+        total = cursor.fetchone()[0]
+        cursor.close()
+    return total
+
+
+_MATCH_ROWS = """
+    SELECT m.id, g.name,
+           u1.username as player1,
+           u2.username as player2,
+           w.username as winner,
+           m.match_type
+    FROM ({ids}) page
+    JOIN matches m ON m.id = page.id
+    LEFT JOIN games g ON m.game_id = g.id
+    LEFT JOIN users u1 ON m.player1_id = u1.id
+    LEFT JOIN users u2 ON m.player2_id = u2.id
+    LEFT JOIN users w ON m.winner_id = w.id
+    ORDER BY m.id {order}
+"""
+
+
+def fetch_matches_page(after=None, before=None, offset=0, limit=PAGE_SIZE, game_id=None, player_id=None):
+    """One page of match history, newest first; after/before are match ids."""
+    descending = before is None
+    order = "DESC" if descending else "ASC"
+    keyset, key = _keyset("id", after, before, True)
+    conditions, params = [], []
+    if keyset:
+        conditions.append(keyset)
+        params.append(key)
+    if game_id is not None:
+        conditions.append("game_id = %s")
+        params.append(game_id)
+
+    # the usual page runs as a prepared statement with PAGE_SIZE in its text
+    usual = limit == PAGE_SIZE and not offset
+    start, start_params = "", []
+    if usual:
+        page, page_params = f"LIMIT {PAGE_SIZE}", []
+    elif offset and not keyset and game_id is None and player_id is None:
+        start, start_params, bound = _seek_position("matches", "id", offset, True)
+        conditions.append(bound)
+        page, page_params = "LIMIT %s OFFSET (SELECT skip FROM start)", [limit]
+    elif offset:
+        page, page_params = "LIMIT %s OFFSET %s", [limit, offset]
+    else:
+        page, page_params = "LIMIT %s", [limit]
+    if player_id is None:
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        ids = f"{start} SELECT id FROM matches {where} ORDER BY id {order} {page}"
+        ids_params = start_params + params + page_params
+    else:
+        # one index scan per side of the match, merged
+        branches, ids_params = [], []
+        for column in ("player1_id", "player2_id"):
+            where = " AND ".join([f"{column} = %s"] + conditions)
+            branches.append(f"(SELECT id FROM matches WHERE {where} ORDER BY id {order} "
+                            f"LIMIT {PAGE_SIZE if usual else '%s'})")
+            ids_params += [player_id] + params + ([] if usual else [offset + limit])
+        ids = " UNION ".join(branches) + f" ORDER BY id {order} {page}"
+        ids_params += page_params
+
+    prepared = None
+    if usual:
+        prepared = ("matches_page" + f"_{order.lower()}" + ("_keyset" if keyset else "")
+                    + ("_game" if game_id is not None else "") + ("_player" if player_id is not None else ""))
+    return _page_query(ids, ids_params, _MATCH_ROWS, order, before, prepared=prepared)
+
+
+def fetch_match_rows(match_ids):
+    """Match history rows for the given ids, in id order."""
+    return _page_query("SELECT unnest(%s::int[]) AS id", [_array_literal(match_ids)], _MATCH_ROWS, "ASC", None,
+                       prepared="match_rows")
+
+
+def _player_conditions(game_id, team_id):
+    conditions, params = ["role = 'player'"], []
+    if game_id is not None:
+        conditions.append("EXISTS (SELECT 1 FROM player_games pg WHERE pg.player_id = users.id AND pg.game_id = %s)")
+        params.append(game_id)
+    if team_id is not None:
+        conditions.append("EXISTS (SELECT 1 FROM team_members tm WHERE tm.player_id = users.id AND tm.team_id = %s)")
+        params.append(team_id)
+    return conditions, params
+
+
+def count_players(game_id=None, team_id=None):
+    conditions, params = _player_conditions(game_id, team_id)
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        if params:
+            cursor.execute("SELECT count(*) FROM users WHERE " + " AND ".join(conditions), params)
+        else:
+            cursor.execute("SELECT coalesce(sum(entries), 0) FROM id_blocks WHERE listing = 'users'")
+        total = cursor.fetchone()[0]
+        cursor.close()
+    return total
+
+
+_PLAYER_ROWS = """
+    SELECT u.id, u.username,
+           STRING_AGG(DISTINCT g.name, ', ') as games,
+           STRING_AGG(DISTINCT t.name, ', ') as team,
+           ps.tournaments_won,
+           ps.matches_won
+    FROM ({ids}) page
+    JOIN users u ON u.id = page.id
+    LEFT JOIN player_games pg ON u.id = pg.player_id
+    LEFT JOIN games g ON pg.game_id = g.id
+    LEFT JOIN team_members tm ON u.id = tm.player_id
+    LEFT JOIN teams t ON tm.team_id = t.id
+    LEFT JOIN player_stats ps ON u.id = ps.player_id
+    GROUP BY u.id, u.username, ps.tournaments_won, ps.matches_won
+    ORDER BY u.id {order}
+"""
+
+
+def fetch_players_page(after=None, before=None, offset=0, limit=PAGE_SIZE, game_id=None, team_id=None):
+    """One page of the player roster in id order; after/before are player ids."""
+    order = "ASC" if before is None else "DESC"
+    keyset, key = _keyset("id", after, before, False)
+    conditions, params = _player_conditions(game_id, team_id)
+    start, start_params, page, page_params = "", [], "LIMIT %s", [limit]
+    if keyset:
+        conditions.append(keyset)
+        params.append(key)
+    elif offset and game_id is None and team_id is None:
+        start, start_params, bound = _seek_position("users", "id", offset, False)
+        conditions.append(bound)
+        page = "LIMIT %s OFFSET (SELECT skip FROM start)"
+    elif offset:
+        page, page_params = "LIMIT %s OFFSET %s", [limit, offset]
+    ids = f"{start} SELECT id FROM users WHERE {' AND '.join(conditions)} ORDER BY id {order} {page}"
+
+    return _page_query(ids, start_params + params + page_params, _PLAYER_ROWS, order, before)
+
+
+def fetch_player_rows(player_ids):
+    """Roster rows for the given player ids, in id order."""
+    return _page_query("SELECT id FROM users WHERE id = ANY(%s::int[]) AND role = 'player'",
+                       [_array_literal(player_ids)], _PLAYER_ROWS, "ASC", None)
+
+
+LEADERBOARD_OVERALL = 0
+
+# the player a keyset page starts from; rows are ordered by wins, then id
+_LEADERBOARD_ANCHOR_BY_NAME = """
+    SELECT s.player_id, s.wins, s.played
+    FROM leaderboard_scores s JOIN users u ON u.id = s.player_id
+    WHERE s.game_id = %(game)s AND u.username = %(key)s
+"""
+_LEADERBOARD_ANCHOR_BY_ID = """
+    SELECT player_id, wins, played FROM leaderboard_scores
+    WHERE game_id = %(game)s AND player_id = %(key)s
+"""
+
+# ties on the anchor's wins, then everyone below (or above) it: two index range scans
+_LEADERBOARD_AFTER = """
+    SELECT * FROM (
+        (SELECT player_id, wins, played FROM leaderboard_scores
+         WHERE game_id = %(game)s AND wins = (SELECT wins FROM anchor)
+           AND player_id > (SELECT player_id FROM anchor)
+         ORDER BY wins DESC, player_id LIMIT %(limit)s)
+        UNION ALL
+        (SELECT player_id, wins, played FROM leaderboard_scores
+         WHERE game_id = %(game)s AND wins < (SELECT wins FROM anchor)
+         ORDER BY wins DESC, player_id LIMIT %(limit)s)
+        ORDER BY wins DESC, player_id LIMIT %(limit)s
+    ) after_anchor
+"""
+_LEADERBOARD_BEFORE = """
+    SELECT * FROM (
+        (SELECT player_id, wins, played FROM leaderboard_scores
+         WHERE game_id = %(game)s AND wins = (SELECT wins FROM anchor)
+           AND player_id < (SELECT player_id FROM anchor)
+         ORDER BY wins, player_id DESC LIMIT %(limit)s)
+        UNION ALL
+        (SELECT player_id, wins, played FROM leaderboard_scores
+         WHERE game_id = %(game)s AND wins > (SELECT wins FROM anchor)
+         ORDER BY wins, player_id DESC LIMIT %(limit)s)
+        ORDER BY wins, player_id DESC LIMIT %(limit)s
+    ) before_anchor
+"""
+
+
+def _ranked_page(ids_query, params):
+    # ranks come from the bucket counts above the page, never from the player rows
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            WITH page AS ({ids_query}),
+            span AS (SELECT min(wins) AS low, max(wins) AS high FROM page),
+            above AS (
+                SELECT coalesce(sum(players), 0) AS players FROM leaderboard_buckets
+                WHERE game_id = %(game)s AND wins > (SELECT high FROM span)
+            ),
+            ranks AS (
+                SELECT wins, 1 + (SELECT players FROM above)
+                             + coalesce(sum(players) OVER (ORDER BY wins DESC
+                                        ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING), 0) AS rank
+                FROM leaderboard_buckets
+                WHERE game_id = %(game)s AND wins BETWEEN (SELECT low FROM span) AND (SELECT high FROM span)
+            )
+            SELECT r.rank, u.username, ps.tournaments_won, page.wins, page.played
+            FROM page
+            JOIN ranks r ON r.wins = page.wins
+            JOIN users u ON u.id = page.player_id
+            LEFT JOIN player_stats ps ON ps.player_id = page.player_id
+            ORDER BY page.wins DESC, page.player_id
+        """, params)
+        rows = cursor.fetchall()
+        cursor.close()
+    return rows
+
+
+def count_leaderboard(game_id=LEADERBOARD_OVERALL):
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT coalesce(sum(players), 0) FROM leaderboard_buckets WHERE game_id = %s", (game_id,))
+        total = cursor.fetchone()[0]
+        cursor.close()
+    return total
+
+
+def fetch_leaderboard_page(after=None, before=None, offset=0, limit=PAGE_SIZE, game_id=LEADERBOARD_OVERALL):
+    """One page of a leaderboard as (rank, username, tournaments won, wins, played)."""
+    params = {'game': game_id, 'limit': limit, 'offset': offset,
+              'key': after if after is not None else before}
+    if after is not None or before is not None:
+        ids = (f"WITH anchor AS ({_LEADERBOARD_ANCHOR_BY_NAME}) "
+               + (_LEADERBOARD_AFTER if after is not None else _LEADERBOARD_BEFORE))
+    elif offset:
+        ids = """
+            WITH start AS (
+                SELECT wins, %(offset)s - (through - players) AS skip
+                FROM (SELECT wins, players, sum(players) OVER (ORDER BY wins DESC) AS through
+                      FROM leaderboard_buckets WHERE game_id = %(game)s) b
+                WHERE through > %(offset)s
+                ORDER BY wins DESC LIMIT 1
+            )
+            SELECT player_id, wins, played FROM leaderboard_scores
+            WHERE game_id = %(game)s AND wins <= (SELECT wins FROM start)
+            ORDER BY wins DESC, player_id
+            OFFSET (SELECT skip FROM start) LIMIT %(limit)s
+        """
+    else:
+        ids = """
+            SELECT player_id, wins, played FROM leaderboard_scores
+            WHERE game_id = %(game)s
+            ORDER BY wins DESC, player_id LIMIT %(limit)s
+        """
+    return _ranked_page(ids, params)
+
+
+def leaderboard_top(limit=10, game_id=LEADERBOARD_OVERALL):
+    return fetch_leaderboard_page(limit=limit, game_id=game_id)
+
+
+def leaderboard_around(player_id, span=5, game_id=LEADERBOARD_OVERALL):
+    """The player's row with up to `span` players either side; empty if they are not on the board."""
+    params = {'game': game_id, 'limit': span, 'key': player_id}
+    ids = (f"WITH anchor AS ({_LEADERBOARD_ANCHOR_BY_ID}) "
+           f"{_LEADERBOARD_BEFORE} UNION ALL SELECT * FROM anchor UNION ALL {_LEADERBOARD_AFTER}")
+    return _ranked_page(ids, params)
+
+
+def player_rank(player_id, game_id=LEADERBOARD_OVERALL):
+    """(rank, players on the board) for one player, or None if they are not on it."""
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT 1 + coalesce((SELECT sum(players) FROM leaderboard_buckets b
+                                 WHERE b.game_id = s.game_id AND b.wins > s.wins), 0),
+                   (SELECT sum(players) FROM leaderboard_buckets b WHERE b.game_id = s.game_id)
+            FROM leaderboard_scores s
+            WHERE s.game_id = %s AND s.player_id = %s
+        """, (game_id, player_id))
+        row = cursor.fetchone()
+        cursor.close()
+    return row
+
+
+_TOMBSTONE_DETAILS = {
+    "players": ("b.username", ""),
+    "tournaments": ("b.name || ' (' || coalesce(g.name, '?') || ')'", "LEFT JOIN games g ON g.id = b.game_id"),
+    "matches": ("""coalesce(p1.username, '#' || b.player1_id) || ' vs ' || coalesce(p2.username, '#' || b.player2_id)
+                   || ', won by ' || coalesce(w.username, '#' || b.winner_id)
+                   || ' (' || coalesce(g.name, '?') || ')'""",
+                """LEFT JOIN games g ON g.id = b.game_id
+                   LEFT JOIN users p1 ON p1.id = b.player1_id
+                   LEFT JOIN users p2 ON p2.id = b.player2_id
+                   LEFT JOIN users w ON w.id = b.winner_id"""),
+}
+
+
+def count_tombstones(kind='matches'):
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT coalesce(sum(entries), 0) FROM id_blocks WHERE listing = %s",
+                       (f"{TOMBSTONE_KINDS[kind]}_backup",))
+        total = cursor.fetchone()[0]
+        cursor.close()
+    return total
+
+
+def fetch_tombstones_page(after=None, before=None, offset=0, limit=PAGE_SIZE, kind='matches'):
+    """One page of deleted players, tournaments or matches, latest first; after/before are tombstone ids."""
+    table = TOMBSTONE_KINDS[kind]
+    order = "DESC" if before is None else "ASC"
+    keyset, key = _keyset("tombstone_id", after, before, True)
+    start, start_params, where, params, page = "", [], "", [], "LIMIT %s"
+    if keyset:
+        where, params = f"WHERE {keyset}", [key]
+    elif offset:
+        start, start_params, bound = _seek_position(f"{table}_backup", "tombstone_id", offset, True)
+        where, page = f"WHERE {bound}", "LIMIT %s OFFSET (SELECT skip FROM start)"
+    ids = f"{start} SELECT tombstone_id FROM {table}_backup {where} ORDER BY tombstone_id {order} {page}"
+    details, joins = _TOMBSTONE_DETAILS[kind]
+
+    return _page_query(ids, start_params + params + [limit], f"""
+        SELECT b.tombstone_id, b.deletion_batch, to_char(b.deleted_at, 'YYYY-MM-DD HH24:MI:SS'),
+               {details}
+        FROM ({{ids}}) page
+        JOIN {table}_backup b ON b.tombstone_id = page.tombstone_id
+        {joins}
+        ORDER BY b.tombstone_id {{order}}
+    """, order, before)
+
+
+def iter_pages(fetch_page, key_column=0, limit=PAGE_SIZE, **filters):
+    """Yield every page of fetch_page in order, seeking from the last key each time."""
+    after = None
+    while True:
+        rows = fetch_page(after=after, limit=limit, **filters)
+        if rows:
+            yield rows
+        if len(rows) < limit:
+            return
+        after = rows[-1][key_column]
+
+
+class KeysetSource:
+    """Row source for VirtualTreeview over one of the fetch_*_page functions."""
+
+    def __init__(self, fetch_page, count, key_column=0, **filters):
+        self.fetch_page = fetch_page
+        self.count_rows = count
+        self.key_column = key_column
+        self.filters = filters
+
+    def count(self):
+        return self.count_rows(**self.filters)
+
+    def fetch(self, offset, limit):
+        return self.fetch_page(offset=offset, limit=limit, **self.filters)
+
+    def fetch_after(self, key, limit):
+        return self.fetch_page(after=key, limit=limit, **self.filters)
+
+    def fetch_before(self, key, limit):
+        return self.fetch_page(before=key, limit=limit, **self.filters)
+
+
+PLAYER_ROSTER = KeysetSource(fetch_players_page, count_players)
+MATCH_HISTORY = KeysetSource(fetch_matches_page, count_matches)
+LEADERBOARD = KeysetSource(fetch_leaderboard_page, count_leaderboard, key_column=1)
+DELETED_MATCHES = KeysetSource(fetch_tombstones_page, count_tombstones, kind="matches")
+ALL_GAMES = "All games"
+
+
+class VirtualTreeview(ttk.Treeview):
+    """Treeview that only materializes the rows currently on screen."""
+
+    def __init__(self, master, source, key_column=0, page_size=PAGE_SIZE, max_pages=20, **kw):
+        self._yscroll = kw.pop('yscrollcommand', None)
+        super().__init__(master, **kw)
+        self.source = source
+        self.key_column = key_column
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.pages = OrderedDict()
+        self.loading = set()
+        self.total = 0
+        self.top = 0
+        self.generation = 0
+        self.selected = {}
+        self._plain_click = False
+        self._rows_on_screen = int(self.cget('height'))
+
+        self.bind('<Configure>', self._on_resize, add='+')
+        self.bind('<<TreeviewSelect>>', self._on_select, add='+')
+        self.bind('<ButtonPress-1>', self._on_press, add='+')
+        self.bind('<MouseWheel>', self._on_wheel)
+        self.bind('<Button-4>', lambda event: self._scroll_by(-3))
+        self.bind('<Button-5>', lambda event: self._scroll_by(3))
+        self.bind('<Up>', lambda event: self._on_arrow(-1))
+        self.bind('<Down>', lambda event: self._on_arrow(1))
+        self.bind('<Prior>', lambda event: self._scroll_by(-self._rows_on_screen))
+        self.bind('<Next>', lambda event: self._scroll_by(self._rows_on_screen))
+
+    # Treeview API used by the handlers
+
+    def configure(self, cnf=None, **kw):
+        if cnf and 'yscrollcommand' in cnf:
+            cnf = dict(cnf)
+            self._yscroll = cnf.pop('yscrollcommand')
+        if 'yscrollcommand' in kw:
+            self._yscroll = kw.pop('yscrollcommand')
+        if cnf or kw:
+            return super().configure(cnf, **kw)
+
+    config = configure
+
+    def yview(self, *args):
+        if not args:
+            return self._fractions()
+        if args[0] == 'moveto':
+            self._move_to(int(float(args[1]) * self.total))
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= self._rows_on_screen
+            self._scroll_by(step)
+
+    def selection(self):
+        return tuple(self.selected)
+
+    def item(self, item, option=None, **kw):
+        if item in self.selected and not self.exists(item):
+            values = list(self.selected[item])
+            info = {'text': '', 'image': '', 'values': values, 'open': 0, 'tags': ''}
+            return info[option] if option else info
+        return super().item(item, option, **kw)
+
+    def get_children(self, item=None):
+        return tuple(iid for iid in super().get_children(item) if not iid.startswith('loading-'))
+
+    def delete(self, *items):
+        self.remove(*items)
+
+    def cached_row(self, key):
+        key = str(key)
+        for rows in self.pages.values():
+            for row in rows:
+                if str(row[self.key_column]) == key:
+                    return tuple(row)
+        return None
+
+    def upsert(self, row, index=None):
+        """Show a row returned by a write without reloading."""
+        key = str(row[self.key_column])
+        for page, rows in self.pages.items():
+            for offset, cached in enumerate(rows):
+                if str(cached[self.key_column]) == key:
+                    rows[offset] = tuple(row)
+                    self._render()
+                    return
+        if index is not None:
+            self._shift(index, 1, tuple(row))
+            self._render()
+
+    def remove(self, *keys):
+        """Drop rows by key; the cached rows after each one move up."""
+        keys = {str(key) for key in keys}
+        for key in keys:
+            self.selected.pop(key, None)
+        found = sorted((page * self.page_size + offset
+                        for page, rows in self.pages.items()
+                        for offset, row in enumerate(rows)
+                        if str(row[self.key_column]) in keys), reverse=True)
+        if len(found) < len(keys):
+            # some of them are outside the cache, so positions are unknown
+            self.refresh()
+            return
+        for index in found:
+            self._shift(index, -1)
+        self._render()
+
+    def _shift(self, index, delta, row=None):
+        # move the cached rows at or after index by delta; pages left with a gap are dropped
+        size = self.page_size
+        rows = {}
+        for page, cached in self.pages.items():
+            for offset, cached_row in enumerate(cached):
+                position = page * size + offset
+                if position < index:
+                    rows[position] = cached_row
+                elif delta > 0:
+                    rows[position + 1] = cached_row
+                elif position > index:
+                    rows[position - 1] = cached_row
+        if row is not None:
+            rows[index] = row
+        self.total = max(0, self.total + delta)
+
+        pages = OrderedDict()
+        for page in self.pages:
+            span = range(page * size, min((page + 1) * size, self.total))
+            if span and all(position in rows for position in span):
+                pages[page] = [rows[position] for position in span]
+        self.pages = pages
+        # page reads already in flight were computed against the old positions
+        self.generation += 1
+        self.loading.clear()
+
+    def refresh(self):
+        """Reload the row count and the visible pages, dropping the cache."""
+        self.generation += 1
+        generation = self.generation
+        self.loading.clear()
+        self.selected.clear()
+        wanted = self._pages_around(self.top)
+
+        def work():
+            total = self.source.count()
+            pages = {}
+            for page in wanted:
+                func, args = self._fetcher(page, pages)
+                pages[page] = func(*args)
+            return total, pages
+
+        def done(result):
+            if generation != self.generation or not self.winfo_exists():
+                return
+            self.total, pages = result
+            self.pages = OrderedDict(pages)
+            self.top = max(0, min(self.top, self.total - self._rows_on_screen))
+            self._render()
+
+        run_in_background("refresh_view", work, on_done=done, key=("refresh_view", str(self)))
+
+    # paging
+
+    def _pages_around(self, top):
+        # the visible window plus one screen of buffer either side
+        first = max(0, top - self._rows_on_screen) // self.page_size
+        last = (top + 2 * self._rows_on_screen) // self.page_size
+        return list(range(first, last + 1))
+
+    def _fetcher(self, page, pages):
+        # seek from a cached neighbour when the source supports it
+        if hasattr(self.source, 'fetch_after'):
+            previous, following = pages.get(page - 1), pages.get(page + 1)
+            if previous and len(previous) == self.page_size:
+                return self.source.fetch_after, (previous[-1][self.key_column], self.page_size)
+            if following:
+                return self.source.fetch_before, (following[0][self.key_column], self.page_size)
+        return self.source.fetch, (page * self.page_size, self.page_size)
+
+    def _request(self, page):
+        if page in self.pages or page in self.loading or page * self.page_size >= max(self.total, 1):
+            return
+        self.loading.add(page)
+        generation = self.generation
+
+        def done(rows):
+            if generation != self.generation:
+                return
+            self.loading.discard(page)
+            self.pages[page] = rows
+            while len(self.pages) > self.max_pages:
+                self.pages.popitem(last=False)
+            if self.winfo_exists():
+                self._render()
+
+        def failed(e):
+            self.loading.discard(page)
+            messagebox.showerror("Error", f"Failed to load rows: {str(e)}")
+
+        func, args = self._fetcher(page, self.pages)
+        run_in_background("fetch_page", func, *args, on_done=done, on_error=failed)
+
+    def _row(self, index):
+        page = self.pages.get(index // self.page_size)
+        if page is None:
+            return None
+        self.pages.move_to_end(index // self.page_size)
+        offset = index % self.page_size
+        return page[offset] if offset < len(page) else None
+
+    # drawing
+
+    def _render(self):
+        for page in self._pages_around(self.top):
+            self._request(page)
+
+        items = []
+        seen = set()
+        for index in range(self.top, min(self.top + self._rows_on_screen, self.total)):
+            row = self._row(index)
+            if row is None:
+                items.append((f"loading-{index}", ("…",)))
+                continue
+            iid = str(row[self.key_column])
+            if iid in seen:
+                iid = f"{iid}:{index}"
+            seen.add(iid)
+            items.append((iid, tuple(row)))
+            if iid in self.selected:
+                self.selected[iid] = row
+        _sync_items(self, items)
+
+        visible = [iid for iid, _ in items if iid in self.selected]
+        if set(visible) != set(self.tk.splitlist(self.tk.call(self._w, 'selection'))):
+            self.selection_set(visible)
+        self.tk.call(self._w, 'yview', 'moveto', 0)
+        if self._yscroll:
+            self._yscroll(*self._fractions())
+
+    def _fractions(self):
+        if not self.total:
+            return 0.0, 1.0
+        return self.top / self.total, min(1.0, (self.top + self._rows_on_screen) / self.total)
+
+    def _move_to(self, top):
+        top = max(0, min(top, self.total - self._rows_on_screen))
+        if top != self.top:
+            self.top = top
+            self._render()
+
+    def _scroll_by(self, rows):
+        self._move_to(self.top + rows)
+        return "break"
+
+    def _on_wheel(self, event):
+        return self._scroll_by(-3 if event.delta > 0 else 3)
+
+    def _on_arrow(self, step):
+        # scroll when the cursor would leave the materialized window
+        children = self.get_children()
+        focus = self.focus()
+        if not children or focus not in (children[0], children[-1]):
+            return None
+        if (step < 0 and focus == children[0] and self.top > 0) or \
+           (step > 0 and focus == children[-1] and self.top + self._rows_on_screen < self.total):
+            index = self.top + (0 if step < 0 else len(children) - 1) + step
+            self._scroll_by(step)
+            row = self._row(index)
+            if row is not None:
+                iid = str(row[self.key_column])
+                self._plain_click = True
+                self.focus(iid)
+                self.selection_set(iid)
+            return "break"
+        return None
+
+    def _on_resize(self, event):
+        children = super().get_children()
+        box = self.bbox(children[0]) if children else ''
+        if box:
+            rows = max(1, (self.winfo_height() - box[1]) // box[3])
+            if rows != self._rows_on_screen:
+                self._rows_on_screen = rows
+                self.top = max(0, min(self.top, self.total - rows))
+                self._render()
+
+    # selection of rows that are not on screen is kept in self.selected
+
+    def _on_press(self, event):
+        # a click without Shift/Control replaces the whole selection
+        self._plain_click = not event.state & 0x0005
+
+    def _on_select(self, event):
+        on_screen = set(self.get_children())
+        chosen = set(self.tk.splitlist(self.tk.call(self._w, 'selection')))
+        if self._plain_click:
+            self.selected = {iid: values for iid, values in self.selected.items() if iid in on_screen}
+            self._plain_click = False
+        for iid in on_screen:
+            if iid in chosen:
+                self.selected[iid] = super().item(iid, 'values')
+            else:
+                self.selected.pop(iid, None)
+
+
+def setup_styles():
+    style = ttk.Style()
+    style.configure('TFrame', background='#f0f0f0')
+    style.configure('TLabel', background='#f0f0f0', font=('Arial', 10))
+    style.configure('TButton', font=('Arial', 10))
+    style.configure('Header.TLabel', font=('Arial', 16, 'bold'))
+    style.configure('TEntry', font=('Arial', 10))
+
+def clear_window(root):
+    for widget in root.winfo_children():
+        widget.destroy()
+
+def get_games():
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name, id FROM games")
+        rows = cursor.fetchall()
+        cursor.close()
+    identity_cache.remember("games", rows)
+    return [row[0] for row in rows]
+
+def get_players():
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT username, id FROM users WHERE role = 'player'")
+        rows = cursor.fetchall()
+        cursor.close()
+    identity_cache.remember("users", rows)
+    return [row[0] for row in rows]
+
+def get_teams():
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name, id FROM teams")
+        rows = cursor.fetchall()
+        cursor.close()
+    identity_cache.remember("teams", rows)
+    return [row[0] for row in rows]
+
+
+def show_db_error(e):
+    messagebox.showerror("Database Error", f"Could not connect to PostgreSQL database.\n{e}")
+
+
+def login(root, username_var, password_var):
+    username = username_var.get()
+    password = password_var.get()
+
+    if not username or not password:
+        messagebox.showerror("Error", "Please fill in all fields")
+        return
+
+    def work():
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, role FROM users WHERE username = %s AND password = %s",
+                          (username, password))
+            user = cursor.fetchone()
+            cursor.close()
+        return user
+
+    def done(user):
+        if user:
+            run_in_background("warm_identity_cache", identity_cache.warm)
+            current_user = {'id': user[0], 'username': username, 'role': user[1]}
+            if user[1] == 'admin':
+                show_admin_dashboard(root, current_user)
+            else:
+                show_player_dashboard(root, current_user)
+        else:
+            messagebox.showerror("Error", "Invalid username or password")
+
+    run_in_background("login", work, on_done=done, on_error=show_db_error)
+
+def register_user(root, username_var, password_var):
+    username = username_var.get()
+    password = password_var.get()
+
+    if not username or not password:
+        messagebox.showerror("Error", "Please fill in all fields")
+        return
+
+    def work():
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
+            if cursor.fetchone():
+                raise ValueError("Username already exists")
+
+            cursor.execute("""
+                INSERT INTO users (username, password, role)
+                VALUES (%s, %s, 'player')
+                RETURNING id
+            """, (username, password))
+
+            user_id = cursor.fetchone()[0]
+
+            cursor.execute("""
+                INSERT INTO player_stats (player_id)
+                VALUES (%s)
+            """, (user_id,))
+            notify_change(cursor, "users", "insert", [user_id])
+            cursor.close()
+        identity_cache.remember("users", [(username, user_id)])
+
+    def done(_):
+        messagebox.showinfo("Success", "Registration successful! Please login.")
+        show_login_window(root)
+
+    run_in_background("register_user", work, on_done=done,
+                      on_error=lambda e: messagebox.showerror("Error", str(e)))
+
+def show_register_window(root):
+    clear_window(root)
+
+    main_frame = ttk.Frame(root, padding="20")
+    main_frame.pack(expand=True, fill='both')
+    add_status_bar(main_frame)
+
+    ttk.Label(main_frame, text="Register New Player", style='Header.TLabel').pack(pady=20)
+
+    register_frame = ttk.Frame(main_frame)
+    register_frame.pack(pady=10)
+
+    ttk.Label(register_frame, text="Username:").grid(row=0, column=0, pady=5, padx=5)
+    username_var = tk.StringVar()
+    ttk.Entry(register_frame, textvariable=username_var, width=30).grid(row=0, column=1, pady=5)
+
+    ttk.Label(register_frame, text="Password:").grid(row=1, column=0, pady=5, padx=5)
+    password_var = tk.StringVar()
+    ttk.Entry(register_frame, textvariable=password_var, width=30, show="*").grid(row=1, column=1, pady=5)
+
+    ttk.Button(register_frame, text="Register",
+               command=lambda: register_user(root, username_var, password_var),
+               width=20).grid(row=2, column=0, columnspan=2, pady=10)
+
+    ttk.Button(register_frame, text="Back to Login",
+               command=lambda: show_login_window(root),
+               width=20).grid(row=3, column=0, columnspan=2, pady=5)
+
+def show_login_window(root):
+    clear_window(root)
+    setup_styles()
+
+    main_frame = ttk.Frame(root, padding="20")
+    main_frame.pack(expand=True, fill='both')
+    add_status_bar(main_frame)
+
+    ttk.Label(main_frame, text="Gaming Portal Project", style='Header.TLabel').pack(pady=20)
+
+    login_frame = ttk.Frame(main_frame)
+    login_frame.pack(pady=10)
+
+    ttk.Label(login_frame, text="Username:").grid(row=0, column=0, pady=5, padx=5)
+    username_var = tk.StringVar()
+    ttk.Entry(login_frame, textvariable=username_var, width=30).grid(row=0, column=1, pady=5)
+
+    ttk.Label(login_frame, text="Password:").grid(row=1, column=0, pady=5, padx=5)
+    password_var = tk.StringVar()
+    ttk.Entry(login_frame, textvariable=password_var, width=30, show="*").grid(row=1, column=1, pady=5)
+
+    ttk.Button(login_frame, text="Login",
+               command=lambda: login(root, username_var, password_var),
+               width=20).grid(row=2, column=0, columnspan=2, pady=10)
+
+    ttk.Button(login_frame, text="Register as Player",
+               command=lambda: show_register_window(root),
+               width=20).grid(row=3, column=0, columnspan=2, pady=5)
+
+    ttk.Button(login_frame, text="View as Spectator",
+               command=lambda: show_spectator_view(root),
+               width=20).grid(row=4, column=0, columnspan=2, pady=5)
+
+
+def show_spectator_view(root):
+    clear_window(root)
+
+    main_frame = ttk.Frame(root, padding="20")
+    main_frame.pack(expand=True, fill='both')
+    add_status_bar(main_frame)
+
+    ttk.Label(main_frame, text="Leaderboard", style='Header.TLabel').pack(pady=10)
+
+    board_form = ttk.Frame(main_frame)
+    board_form.pack(pady=5)
+    ttk.Label(board_form, text="Game:").grid(row=0, column=0, padx=5)
+    board_var = tk.StringVar(value=ALL_GAMES)
+    board_combo = ttk.Combobox(board_form, textvariable=board_var, width=28, state='readonly')
+    fill_combo(board_combo, "get_games", lambda: [ALL_GAMES] + get_games())
+    board_combo.grid(row=0, column=1)
+
+    columns = ('Rank', 'Username', 'Tournaments Won', 'Matches Won', 'Total Matches')
+    tree = VirtualTreeview(main_frame, LEADERBOARD, key_column=1, columns=columns, show='headings', height=10)
+
+    for col in columns:
+        tree.heading(col, text=col)
+        tree.column(col, width=120)
+
+    tree.pack(pady=10, padx=10, fill='both', expand=True)
+
+    scrollbar = ttk.Scrollbar(main_frame, orient=tk.VERTICAL, command=tree.yview)
+    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    tree.configure(yscrollcommand=scrollbar.set)
+
+    def show_board(event=None):
+        game = board_var.get()
+
+        def work():
+            if game == ALL_GAMES:
+                return LEADERBOARD
+            return KeysetSource(fetch_leaderboard_page, count_leaderboard, key_column=1,
+                                game_id=require_ids("games", [game])[game])
+
+        def done(source):
+            if tree.winfo_exists():
+                tree.source = source
+                tree.top = 0
+                tree.refresh()
+
+        run_in_background("leaderboard", work, on_done=done, on_error=show_db_error)
+
+    board_combo.bind('<<ComboboxSelected>>', show_board)
+    tree.refresh()
+
+    def changed(changes):
+        if changes is None or any(table in ("matches", "users") for table, _ in changes):
+            tree.refresh()
+
+    subscribe_changes(tree, changed)
+
+    ttk.Button(main_frame, text="Back to Login",
+               command=lambda: show_login_window(root)).pack(pady=10)
+
+def fetch_data():
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT u.id, u.username, 
+                   STRING_AGG(g.name, ', ') as games,
+                   t.name as team,
+                   ps.tournaments_won,
+                   ps.matches_won
+            FROM users u
+            LEFT JOIN player_games pg ON u.id = pg.player_id
+            LEFT JOIN games g ON pg.game_id = g.id
+            LEFT JOIN team_members tm ON u.id = tm.player_id
+            LEFT JOIN teams t ON tm.team_id = t.id
+            LEFT JOIN player_stats ps ON u.id = ps.player_id
+            WHERE u.role = 'player'
+            GROUP BY u.id, u.username, t.name, ps.tournaments_won, ps.matches_won
+        """)
+        rows = cur.fetchall()
+        columns = [desc[0] for desc in cur.description]
+        cur.close()
+        conn.close()
+        return columns, rows
+    except Exception as e:
+        print("Database error:", e)
+        return [], []
+
+def refresh_tree(tree):
+    tree.refresh()
+
+def verify_player_stats(tree):
+    if job_running("reconcile_stats"):
+        messagebox.showinfo("Verify Stats", "A stats check is already running.")
+        return
+
+    def progress(table, rows, elapsed):
+        report_status(f"Checking {table}: {rows} players ({elapsed:.0f}s)")
+
+    def applied(summary):
+        tree.refresh()
+        messagebox.showinfo("Verify Stats", "Player stats corrected.\n\n" + format_reconcile_summary(summary))
+
+    def checked(summary):
+        if not summary['drifted']:
+            messagebox.showinfo("Verify Stats", "Player stats match the match history.\n\n"
+                                + format_reconcile_summary(summary))
+            return
+        if messagebox.askyesno("Verify Stats", format_reconcile_summary(summary) + "\n\nCorrect these players?"):
+            run_in_background("reconcile_stats", lambda: reconcile_player_stats(apply=True, progress=progress),
+                              on_done=applied, on_error=failed)
+
+    def failed(e):
+        messagebox.showerror("Error", f"Failed to verify player stats: {str(e)}")
+
+    run_in_background("reconcile_stats", lambda: reconcile_player_stats(progress=progress),
+                      on_done=checked, on_error=failed)
+
+def delete_player(tree, match_tree=None):
+    selected_items = tree.selection()
+    if not selected_items:
+        messagebox.showwarning("Warning", "No player selected for deletion.")
+        return
+
+    confirm = messagebox.askyesno("Confirm Delete", f"Delete {len(selected_items)} player(s)?")
+    if not confirm:
+        return
+
+    player_ids = [int(tree.item(item)['values'][0]) for item in selected_items]
+
+    def work():
+        ids = _array_literal(player_ids)
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+
+            # their matches go first, so the opponents' stats and ratings lose them too
+            cursor.execute("""
+                SELECT id FROM matches
+                WHERE player1_id = ANY(%(ids)s::int[])
+                   OR player2_id = ANY(%(ids)s::int[])
+                   OR (winner_id = ANY(%(ids)s::int[])
+                       AND winner_id IS DISTINCT FROM player1_id AND winner_id IS DISTINCT FROM player2_id)
+            """, {'ids': ids})
+            match_ids = delete_matches(cursor, [row[0] for row in cursor.fetchall()])
+            # the tournaments they won lose their winner, kept with this batch for restore_tombstones
+            cursor.execute("""
+                WITH cleared AS (
+                    UPDATE tournaments t
+                    SET winner_id = NULL
+                    FROM (SELECT id, winner_id FROM tournaments WHERE winner_id = ANY(%s::int[]) FOR UPDATE) won
+                    WHERE t.id = won.id
+                    RETURNING won.id, won.winner_id
+                )
+                INSERT INTO tournament_winners_backup (tournament_id, winner_id)
+                SELECT id, winner_id FROM cleared
+            """, (ids,))
+
+            for table, column in (("player_stats", "player_id"), ("player_games", "player_id"),
+                                  ("team_members", "player_id"), ("tournament_participants", "player_id"),
+                                  ("users", "id")):
+                cursor.execute(f"DELETE FROM {table} WHERE {column} = ANY(%s::int[])", (ids,))
+            notify_change(cursor, "users", "delete", player_ids)
+            cursor.close()
+        identity_cache.forget("users", player_ids)
+        return match_ids
+
+    def done(match_ids):
+        messagebox.showinfo("Success", "Player(s) deleted successfully!")
+        remove_rows(tree, player_ids)
+        if match_tree is not None and match_ids:
+            remove_rows(match_tree, match_ids)
+
+    run_in_background("delete_player", work, on_done=done,
+                      on_error=lambda e: messagebox.showerror("Error", f"Failed to delete player(s): {str(e)}"))
+
+def create_tournament(name_var, game_var, tree, admin_id, tournament_tree):
+    name = name_var.get()
+    game = game_var.get()
+
+    if not name or not game:
+        messagebox.showerror("Error", "Please fill in all fields")
+        return
+
+    def work():
+        game_id = identity_cache.resolve("games", [game]).get(game)
+        if game_id is None:
+            raise ValueError("Selected game not found")
+
+        with pooled_connection(autocommit=True) as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                WITH created AS (
+                    INSERT INTO tournaments (name, game_id, created_by)
+                    VALUES (%s, %s, %s)
+                    RETURNING id, name, game_id, created_by
+                )
+                SELECT c.id, c.name, g.name, u.username
+                FROM created c
+                JOIN games g ON c.game_id = g.id
+                JOIN users u ON c.created_by = u.id
+            """, (name, game_id, admin_id))
+
+            row = cursor.fetchone()
+            notify_change(cursor, "tournaments", "insert", [row[0]])
+            cursor.close()
+        return row
+
+    def done(row):
+        messagebox.showinfo("Success", f"Tournament '{name}' created successfully!")
+        name_var.set("")
+        game_var.set("")
+
+        upsert_row(tournament_tree, row, 0)
+
+    def failed(e):
+        if isinstance(e, ValueError):
+            messagebox.showerror("Error", str(e))
+        elif isinstance(e, psycopg2.IntegrityError):
+            if "unique constraint" in str(e).lower():
+                messagebox.showerror("Error", "A tournament with this name already exists")
+            else:
+                messagebox.showerror("Error", f"Database error: {str(e)}")
+        else:
+            messagebox.showerror("Error", f"Failed to create tournament: {str(e)}")
+
+    run_in_background("create_tournament", work, on_done=done, on_error=failed)
+
+statement_catalog.define("record_match", """
+    WITH recorded AS (
+        INSERT INTO matches (game_id, player1_id, player2_id, winner_id, match_type)
+        VALUES (%(game)s, %(player1)s, %(player2)s, %(winner)s, %(match_type)s)
+        RETURNING id
+    ), stats AS (
+        UPDATE player_stats
+        SET matches_won = matches_won + CASE WHEN player_id = %(winner)s THEN 1 ELSE 0 END,
+            total_matches = total_matches + 1
+        WHERE player_id IN (%(player1)s, %(player2)s, %(winner)s)
+        RETURNING player_id, tournaments_won, matches_won
+    )
+    SELECT recorded.id, stats.player_id, stats.tournaments_won, stats.matches_won
+    FROM recorded
+    LEFT JOIN stats ON true
+""")
+
+
+def record_match(cursor, game_id, player1_id, player2_id, winner_id, match_type):
+    """Insert a match, count it in player_stats and the ratings and return its id and stats rows."""
+    # the match and both stats updates in one statement, then the ratings
+    execute_prepared(cursor, "record_match", {'game': game_id, 'player1': player1_id, 'player2': player2_id,
+                                              'winner': winner_id, 'match_type': match_type})
+    rows = cursor.fetchall()
+    rate_matches(cursor, [(rows[0][0], game_id, player1_id, player2_id, winner_id)])
+    notify_change(cursor, "matches", "insert", [rows[0][0]], [row[1] for row in rows if row[1] is not None])
+    return rows[0][0], [row[1:] for row in rows if row[1] is not None]
+
+
+def create_match(player1_var, player2_var, game_var, winner_var, match_type_var, tree, match_tree):
+    player1 = player1_var.get()
+    player2 = player2_var.get()
+    game = game_var.get()
+    winner = winner_var.get()
+    match_type = match_type_var.get().lower()  # Convert to lowercase
+
+    if not all([player1, player2, game, winner, match_type]):
+        messagebox.showerror("Error", "Please fill in all fields")
+        return
+
+    def work():
+        players = require_ids("users", [player1, player2, winner])
+        game_id = require_ids("games", [game])[game]
+        player1_id, player2_id, winner_id = players[player1], players[player2], players[winner]
+
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+            match_id, player_stats = record_match(cursor, game_id, player1_id, player2_id, winner_id, match_type)
+            cursor.close()
+        return (match_id, game, player1, player2, winner, match_type), player_stats
+
+    def done(result):
+        match_row, player_stats = result
+        messagebox.showinfo("Success", "Match recorded successfully!")
+
+        player1_var.set("")
+        player2_var.set("")
+        game_var.set("")
+        winner_var.set("")
+        match_type_var.set("")
+
+        upsert_row(match_tree, match_row, 0)
+        for player_id, tournaments_won, matches_won in player_stats:
+            row = tree.cached_row(player_id)
+            if row:
+                upsert_row(tree, row[:4] + (tournaments_won, matches_won))
+
+    run_in_background("create_match", work, on_done=done,
+                      on_error=lambda e: messagebox.showerror("Error", str(e)))
+
+
+def fetch_tournaments():
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT t.id, t.name, g.name, u.username
+            FROM tournaments t
+            JOIN games g ON t.game_id = g.id
+            JOIN users u ON t.created_by = u.id
+            ORDER BY t.id DESC
+        """)
+        rows = cursor.fetchall()
+        cursor.close()
+    return rows
+
+
+def refresh_tournaments(tree):
+    run_in_background("refresh_tournaments", fetch_tournaments,
+                      on_done=lambda rows: sync_tree(tree, rows),
+                      on_error=lambda e: messagebox.showerror("Error", f"Failed to refresh tournaments: {str(e)}"),
+                      key=("refresh_tournaments", str(tree)))
+
+def refresh_matches(tree):
+    tree.refresh()
+
+def show_admin_dashboard(root, current_user):
+    clear_window(root)
+    
+    main_frame = ttk.Frame(root, padding="20")
+    main_frame.pack(expand=True, fill='both')
+    add_status_bar(main_frame)
+    
+    ttk.Label(main_frame, text=f"Admin Dashboard - {current_user['username']}", 
+              style='Header.TLabel').pack(pady=10)
+    
+    notebook = ttk.Notebook(main_frame)
+    notebook.pack(fill='both', expand=True, padx=10, pady=5)
+    
+    
+    players_frame = ttk.Frame(notebook)
+    notebook.add(players_frame, text='Players')
+    
+    columns = ('ID', 'Username', 'Games', 'Team', 'Tournaments Won', 'Matches Won')
+    tree = VirtualTreeview(players_frame, PLAYER_ROSTER, columns=columns, show='headings', height=10)
+    
+    for col in columns:
+        tree.heading(col, text=col)
+        tree.column(col, width=80)
+    
+    tree.pack(pady=10, padx=10, fill='both', expand=True)
+    
+    scrollbar = ttk.Scrollbar(players_frame, orient=tk.VERTICAL, command=tree.yview)
+    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    tree.configure(yscrollcommand=scrollbar.set)
+    
+    btn_frame = ttk.Frame(players_frame)
+    btn_frame.pack(pady=5)
+    
+    ttk.Button(btn_frame, text="Delete Player", 
+               command=lambda: delete_player(tree, match_tree)).pack(side=tk.LEFT, padx=5)
+
+    ttk.Button(btn_frame, text="Undo Delete Player", 
+               command=lambda: restore_player(tree, match_tree)).pack(side=tk.LEFT, padx=5)
+    
+    
+    tournaments_frame = ttk.Frame(notebook)
+    notebook.add(tournaments_frame, text='Tournaments')
+    
+    tournament_form = ttk.Frame(tournaments_frame)
+    tournament_form.pack(pady=20)
+    
+    ttk.Label(tournament_form, text="Tournament Name:").grid(row=0, column=0, padx=5, pady=5)
+    tournament_name = tk.StringVar()
+    ttk.Entry(tournament_form, textvariable=tournament_name).grid(row=0, column=1, padx=5, pady=5)
+    
+    ttk.Label(tournament_form, text="Game:").grid(row=1, column=0, padx=5, pady=5)
+    tournament_game = tk.StringVar()
+    game_combo = ttk.Combobox(tournament_form, textvariable=tournament_game)
+    fill_combo(game_combo, "get_games", get_games)
+    game_combo.grid(row=1, column=1, padx=5, pady=5)
+
+    ttk.Label(tournaments_frame, text="Existing Tournaments").pack(pady=10)
+    tournament_tree = ttk.Treeview(tournaments_frame, columns=('ID', 'Name', 'Game', 'Created By'), show='headings', height=5)
+    
+    for col in ('ID', 'Name', 'Game', 'Created By'):
+        tournament_tree.heading(col, text=col)
+        tournament_tree.column(col, width=100)
+    
+    tournament_tree.pack(pady=10, padx=10, fill='both', expand=True)
+    
+    tournament_buttons = ttk.Frame(tournaments_frame)
+    tournament_buttons.pack(pady=5)
+    
+    ttk.Button(tournament_form, text="Create Tournament", 
+               command=lambda: create_tournament(tournament_name, tournament_game, tree, current_user['id'], tournament_tree)).grid(row=2, column=0, columnspan=2, pady=10)
+    
+    ttk.Button(tournament_buttons, text="Edit Tournament", 
+               command=lambda: edit_tournament(tournament_tree, tournament_name, tournament_game)).pack(side=tk.LEFT, padx=5)
+    
+    ttk.Button(tournament_buttons, text="Delete Tournament", 
+               command=lambda: delete_tournament(tournament_tree)).pack(side=tk.LEFT, padx=5)
+    
+    ttk.Button(tournament_buttons, text="Undo Delete Tournament", 
+               command=lambda: restore_tournament(tournament_tree)).pack(side=tk.LEFT, padx=5)
+    
+   
+    matches_frame = ttk.Frame(notebook)
+    notebook.add(matches_frame, text='Matches')
+    
+    match_form = ttk.Frame(matches_frame)
+    match_form.pack(pady=20)
+    
+    ttk.Label(match_form, text="Player 1:").grid(row=0, column=0, padx=5, pady=5)
+    player1_var = tk.StringVar()
+    player1_combo = ttk.Combobox(match_form, textvariable=player1_var)
+    player1_combo.grid(row=0, column=1, padx=5, pady=5)
+    
+    ttk.Label(match_form, text="Player 2:").grid(row=1, column=0, padx=5, pady=5)
+    player2_var = tk.StringVar()
+    player2_combo = ttk.Combobox(match_form, textvariable=player2_var)
+    player2_combo.grid(row=1, column=1, padx=5, pady=5)
+    
+    ttk.Label(match_form, text="Game:").grid(row=2, column=0, padx=5, pady=5)
+    match_game_var = tk.StringVar()
+    match_game_combo = ttk.Combobox(match_form, textvariable=match_game_var)
+    fill_combo(match_game_combo, "get_games", get_games)
+    match_game_combo.grid(row=2, column=1, padx=5, pady=5)
+    
+    ttk.Label(match_form, text="Winner:").grid(row=3, column=0, padx=5, pady=5)
+    winner_var = tk.StringVar()
+    winner_combo = ttk.Combobox(match_form, textvariable=winner_var)
+    winner_combo.grid(row=3, column=1, padx=5, pady=5)
+    
+    
+    ttk.Label(match_form, text="Match Type:").grid(row=4, column=0, padx=5, pady=5)
+    match_type_var = tk.StringVar()
+    match_type_combo = ttk.Combobox(match_form, textvariable=match_type_var)
+    match_type_combo['values'] = ['Friendly', 'Tournament']
+    match_type_combo.grid(row=4, column=1, padx=5, pady=5)
+    
+    def fill_players(players):
+        for combo in (player1_combo, player2_combo, winner_combo):
+            if combo.winfo_exists():
+                combo['values'] = players
+    
+    run_in_background("get_players", get_players, on_done=fill_players)
+    
+    ttk.Button(match_form, text="Record Match", 
+               command=lambda: create_match(player1_var, player2_var, match_game_var, winner_var, match_type_var, tree, match_tree)).grid(row=5, column=0, columnspan=2, pady=10)
+    
+    ttk.Label(matches_frame, text="Match History").pack(pady=10)
+    match_tree = VirtualTreeview(matches_frame, MATCH_HISTORY, 
+                             columns=('ID', 'Game', 'Player 1', 'Player 2', 'Winner', 'Type'), 
+                             show='headings', 
+                             height=5)
+    
+    for col in ('ID', 'Game', 'Player 1', 'Player 2', 'Winner', 'Type'):
+        match_tree.heading(col, text=col)
+        match_tree.column(col, width=80)
+    
+    match_tree.pack(pady=10, padx=10, fill='both', expand=True)
+    
+    match_scrollbar = ttk.Scrollbar(matches_frame, orient=tk.VERTICAL, command=match_tree.yview)
+    match_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    match_tree.configure(yscrollcommand=match_scrollbar.set)
+    
+    match_buttons = ttk.Frame(matches_frame)
+    match_buttons.pack(pady=5)
+    
+    ttk.Button(match_buttons, text="Edit Match", 
+               command=lambda: edit_match(match_tree, player1_var, player2_var, match_game_var, winner_var, match_type_var)).pack(side=tk.LEFT, padx=5)
+    
+    ttk.Button(match_buttons, text="Delete Match", 
+               command=lambda: delete_match(match_tree)).pack(side=tk.LEFT, padx=5)
+    
+    ttk.Button(match_buttons, text="Undo Delete Match", 
+               command=lambda: restore_match(match_tree, tree)).pack(side=tk.LEFT, padx=5)
+    
+    deleted_frame = ttk.Frame(notebook)
+    notebook.add(deleted_frame, text='Deleted')
+
+    deleted_form = ttk.Frame(deleted_frame)
+    deleted_form.pack(pady=5)
+
+    ttk.Label(deleted_form, text="Show:").grid(row=0, column=0, padx=5)
+    deleted_kind_var = tk.StringVar(value="matches")
+    deleted_kind_combo = ttk.Combobox(deleted_form, textvariable=deleted_kind_var, width=12, state='readonly',
+                                      values=list(TOMBSTONE_KINDS))
+    deleted_kind_combo.grid(row=0, column=1, padx=5)
+
+    ttk.Label(deleted_form, text="Deleted from:").grid(row=0, column=2, padx=5)
+    deleted_since_var = tk.StringVar()
+    ttk.Entry(deleted_form, textvariable=deleted_since_var, width=18).grid(row=0, column=3, padx=5)
+
+    ttk.Label(deleted_form, text="to:").grid(row=0, column=4, padx=5)
+    deleted_until_var = tk.StringVar()
+    ttk.Entry(deleted_form, textvariable=deleted_until_var, width=18).grid(row=0, column=5, padx=5)
+
+    deleted_columns = ('Tombstone', 'Batch', 'Deleted At', 'Details')
+    deleted_tree = VirtualTreeview(deleted_frame, DELETED_MATCHES, columns=deleted_columns,
+                                   show='headings', height=10)
+
+    for col in deleted_columns:
+        deleted_tree.heading(col, text=col)
+        deleted_tree.column(col, width=80 if col != 'Details' else 320)
+
+    deleted_tree.pack(pady=10, padx=10, fill='both', expand=True)
+
+    deleted_scrollbar = ttk.Scrollbar(deleted_frame, orient=tk.VERTICAL, command=deleted_tree.yview)
+    deleted_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    deleted_tree.configure(yscrollcommand=deleted_scrollbar.set)
+
+    def show_deleted(event=None):
+        deleted_tree.source = KeysetSource(fetch_tombstones_page, count_tombstones, kind=deleted_kind_var.get())
+        deleted_tree.top = 0
+        deleted_tree.refresh()
+
+    def refresh_restored(kind):
+        if kind == "tournaments":
+            refresh_tournaments(tournament_tree)
+        else:
+            tree.refresh()
+            match_tree.refresh()
+
+    def restore(mode):
+        restore_deleted(deleted_tree, deleted_kind_var.get(), mode, deleted_since_var.get().strip(),
+                        deleted_until_var.get().strip(), on_restored=refresh_restored)
+
+    deleted_kind_combo.bind('<<ComboboxSelected>>', show_deleted)
+    notebook.bind('<<NotebookTabChanged>>',
+                  lambda event: deleted_tree.refresh() if notebook.select() == str(deleted_frame) else None)
+
+    deleted_buttons = ttk.Frame(deleted_frame)
+    deleted_buttons.pack(pady=5)
+
+    ttk.Button(deleted_buttons, text="Restore Selected", 
+               command=lambda: restore('selected')).pack(side=tk.LEFT, padx=5)
+
+    ttk.Button(deleted_buttons, text="Restore Whole Batch", 
+               command=lambda: restore('batch')).pack(side=tk.LEFT, padx=5)
+
+    ttk.Button(deleted_buttons, text="Restore Time Range", 
+               command=lambda: restore('range')).pack(side=tk.LEFT, padx=5)
+
+    backup_button_frame = ttk.Frame(main_frame)
+    backup_button_frame.pack(pady=10)
+    
+    ttk.Button(backup_button_frame, text="Backup Database", 
+               command=backup_database).pack(side=tk.LEFT, padx=5)
+    
+    ttk.Button(backup_button_frame, text="Full Backup", 
+               command=lambda: backup_database(incremental=False)).pack(side=tk.LEFT, padx=5)
+
+    ttk.Button(backup_button_frame, text="Verify Stats", 
+               command=lambda: verify_player_stats(tree)).pack(side=tk.LEFT, padx=5)
+    
+    ttk.Button(main_frame, text="Logout", 
+               command=lambda: show_login_window(root)).pack(pady=10)
+    
+    
+    refresh_tree(tree)
+    refresh_tournaments(tournament_tree)
+    refresh_matches(match_tree)
+
+    # other consoles' writes, as they commit
+    def changed(changes):
+        if changes is None:
+            tree.refresh()
+            match_tree.refresh()
+            refresh_tournaments(tournament_tree)
+            run_in_background("get_players", get_players, on_done=fill_players)
+            return
+        show_changed_rows(match_tree, changes, "matches", fetch_match_rows, _newest_first_position)
+        show_changed_rows(tree, changes, "users", fetch_player_rows, _oldest_first_position)
+        if any(table == "tournaments" for table, _ in changes):
+            refresh_tournaments(tournament_tree)
+        if ("users", "insert") in changes or ("users", "delete") in changes:
+            run_in_background("get_players", get_players, on_done=fill_players)
+
+    subscribe_changes(tree, changed)
+
+    # tombstone housekeeping: next months' partitions, expired months dropped
+    run_in_background("purge_tombstones", purge_tombstones,
+                      on_done=lambda summary: report_status(format_purge_summary(summary).splitlines()[0]),
+                      on_error=lambda e: report_status(f"Tombstone cleanup failed: {e}"))
+
+
+def fetch_player_profile(player_id):
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT u.username, ps.tournaments_won, ps.matches_won, ps.total_matches
+            FROM users u
+            JOIN player_stats ps ON u.id = ps.player_id
+            WHERE u.id = %s
+        """, (player_id,))
+        player_info = cursor.fetchone()
+        cursor.close()
+    if player_info is not None:
+        player_info += player_rank(player_id) or (None, None)
+    return player_info
+
+
+def show_player_profile(profile_frame, player_info):
+    if not profile_frame.winfo_exists() or player_info is None:
+        return
+
+    info_frame = ttk.Frame(profile_frame)
+    info_frame.pack(pady=20)
+
+    ttk.Label(info_frame, text=f"Username: {player_info[0]}").grid(row=0, column=0, pady=5, sticky='w')
+    ttk.Label(info_frame, text=f"Tournaments Won: {player_info[1]}").grid(row=1, column=0, pady=5, sticky='w')
+    ttk.Label(info_frame, text=f"Matches Won: {player_info[2]}").grid(row=2, column=0, pady=5, sticky='w')
+    ttk.Label(info_frame, text=f"Total Matches: {player_info[3]}").grid(row=3, column=0, pady=5, sticky='w')
+    if player_info[4] is not None:
+        ttk.Label(info_frame, text=f"Rank: #{player_info[4]} of {player_info[5]}").grid(row=4, column=0, pady=5, sticky='w')
+
+
+def show_player_ratings(profile_frame, ratings):
+    if not profile_frame.winfo_exists() or not ratings:
+        return
+
+    ttk.Label(profile_frame, text="Ratings").pack(pady=5)
+    columns = ('Game', 'Rating', 'Matches')
+    ratings_tree = ttk.Treeview(profile_frame, columns=columns, show='headings', height=min(len(ratings), 8))
+    for col in columns:
+        ratings_tree.heading(col, text=col)
+        ratings_tree.column(col, width=120)
+    ratings_tree.pack(pady=5)
+    sync_tree(ratings_tree, ratings)
+
+
+def fetch_player_board(player_id, game=ALL_GAMES, top=10, span=5):
+    """The top of a leaderboard followed by the rows around the player."""
+    game_id = LEADERBOARD_OVERALL if game == ALL_GAMES else require_ids("games", [game])[game]
+    rows = leaderboard_top(top, game_id)
+    shown = {row[1] for row in rows}
+    return rows + [row for row in leaderboard_around(player_id, span, game_id) if row[1] not in shown]
+
+
+def refresh_player_board(tree, player_id, username, game):
+    def done(rows):
+        if tree.winfo_exists():
+            sync_tree(tree, rows, key_column=1)
+            if tree.exists(username):
+                tree.selection_set(username)
+                tree.see(username)
+
+    run_in_background("player_board", fetch_player_board, player_id, game,
+                      on_done=done, on_error=show_db_error, key=("player_board", str(tree)))
+
+
+def show_player_dashboard(root, current_user):
+    clear_window(root)
+    
+    main_frame = ttk.Frame(root, padding="20")
+    main_frame.pack(expand=True, fill='both')
+    add_status_bar(main_frame)
+    
+    ttk.Label(main_frame, text=f"Player Dashboard - {current_user['username']}", 
+              style='Header.TLabel').pack(pady=10)
+    
+    notebook = ttk.Notebook(main_frame)
+    notebook.pack(fill='both', expand=True, padx=10, pady=5)
+    
+    
+    profile_frame = ttk.Frame(notebook)
+    notebook.add(profile_frame, text='Profile')
+    
+    def profile_loaded(info):
+        show_player_profile(profile_frame, info)
+        # below the profile, so only asked for once it is shown
+        run_in_background("player_ratings", fetch_player_ratings, current_user['id'],
+                          on_done=lambda ratings: show_player_ratings(profile_frame, ratings),
+                          on_error=show_db_error)
+
+    run_in_background("player_profile", fetch_player_profile, current_user['id'],
+                      on_done=profile_loaded, on_error=show_db_error)
+    
+    
+    board_frame = ttk.Frame(notebook)
+    notebook.add(board_frame, text='Leaderboard')
+
+    board_form = ttk.Frame(board_frame)
+    board_form.pack(pady=10)
+    ttk.Label(board_form, text="Game:").grid(row=0, column=0, padx=5)
+    board_var = tk.StringVar(value=ALL_GAMES)
+    board_combo = ttk.Combobox(board_form, textvariable=board_var, width=28, state='readonly')
+    fill_combo(board_combo, "get_games", lambda: [ALL_GAMES] + get_games())
+    board_combo.grid(row=0, column=1)
+
+    board_columns = ('Rank', 'Username', 'Tournaments Won', 'Matches Won', 'Total Matches')
+    board_tree = ttk.Treeview(board_frame, columns=board_columns, show='headings', height=16)
+    for col in board_columns:
+        board_tree.heading(col, text=col)
+        board_tree.column(col, width=120)
+    board_tree.pack(pady=10, padx=10, fill='both', expand=True)
+
+    board_combo.bind('<<ComboboxSelected>>',
+                     lambda event: refresh_player_board(board_tree, current_user['id'],
+                                                        current_user['username'], board_var.get()))
+    refresh_player_board(board_tree, current_user['id'], current_user['username'], ALL_GAMES)
+
+
+    games_frame = ttk.Frame(notebook)
+    notebook.add(games_frame, text='Games')
+    
+    ttk.Label(games_frame, text="Select Games:").pack(pady=10)
+    
+    games_list = ttk.Frame(games_frame)
+    games_list.pack(pady=10)
+    
+    selected_games = []
+    
+    
+    tournaments_frame = ttk.Frame(notebook)
+    notebook.add(tournaments_frame, text='Tournaments')
+    
+    ttk.Label(tournaments_frame, text="Available Tournaments").pack(pady=10)
+    
+    columns = ('Name', 'Game', 'Status')
+    tournaments_tree = ttk.Treeview(tournaments_frame, columns=columns, show='headings', height=10)
+    
+    for col in columns:
+        tournaments_tree.heading(col, text=col)
+        tournaments_tree.column(col, width=150)
+    
+    tournaments_tree.pack(pady=10, padx=10, fill='both', expand=True)
+    
+
+    def show_games(games):
+        if not games_list.winfo_exists():
+            return
+        for i, game in enumerate(games):
+            var = tk.BooleanVar()
+            ttk.Checkbutton(games_list, text=game, variable=var).grid(row=i, column=0, sticky='w', pady=2)
+            selected_games.append((game, var))
+        
+        ttk.Button(games_list, text="Update Games", 
+                   command=lambda: update_player_games(current_user['id'], selected_games, tournaments_tree)).grid(row=len(games), column=0, pady=10)
+    
+    run_in_background("get_games", get_games, on_done=show_games)
+    
+  
+    teams_frame = ttk.Frame(notebook)
+    notebook.add(teams_frame, text='Teams')
+    
+    ttk.Label(teams_frame, text="Team Management").pack(pady=10)
+    
+    team_form = ttk.Frame(teams_frame)
+    team_form.pack(pady=10)
+    
+    ttk.Label(team_form, text="Join Team:").grid(row=0, column=0, pady=5, padx=5)
+    team_choice = tk.StringVar()
+    team_combo = ttk.Combobox(team_form, textvariable=team_choice, width=28)
+    fill_combo(team_combo, "get_teams", get_teams)
+    team_combo.grid(row=0, column=1, pady=5)
+    
+    ttk.Button(team_form, text="Join Team", 
+               command=lambda: join_team(current_user['id'], team_choice)).grid(row=1, column=0, columnspan=2, pady=5)
+    
+    ttk.Label(team_form, text="Create Team:").grid(row=2, column=0, pady=5, padx=5)
+    new_team_name = tk.StringVar()
+    ttk.Entry(team_form, textvariable=new_team_name, width=30).grid(row=2, column=1, pady=5)
+    
+    ttk.Button(team_form, text="Create Team", 
+               command=lambda: create_team(current_user['id'], new_team_name)).grid(row=3, column=0, columnspan=2, pady=5)
+    
+    ttk.Button(tournaments_frame, text="Register for Tournament", 
+               command=lambda: register_for_tournament(tournaments_tree, current_user['id'])).pack(pady=10)
+    
+    ttk.Button(main_frame, text="Logout", 
+               command=lambda: show_login_window(root)).pack(pady=10)
+    
+  
+    refresh_player_tournaments(tournaments_tree, current_user['id'])
+
+    def changed(changes):
+        if changes is None or any(table in ("matches", "users") for table, _ in changes):
+            refresh_player_board(board_tree, current_user['id'], current_user['username'], board_var.get())
+        if changes is None or any(table in ("tournaments", "tournament_participants") for table, _ in changes):
+            refresh_player_tournaments(tournaments_tree, current_user['id'])
+
+    subscribe_changes(tournaments_tree, changed)
+
+
+def fetch_player_tournaments(player_id):
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT DISTINCT
+                t.name as tournament_name,
+                g.name as game_name,
+                CASE
+                    WHEN tp.player_id IS NOT NULL THEN 'Registered'
+                    ELSE 'Available'
+                END as status
+            FROM tournaments t
+            INNER JOIN games g ON t.game_id = g.id
+            INNER JOIN player_games pg ON g.id = pg.game_id AND pg.player_id = %s
+            LEFT JOIN tournament_participants tp ON t.id = tp.tournament_id AND tp.player_id = %s
+            ORDER BY t.name ASC
+        """, (player_id, player_id))
+        rows = cursor.fetchall()
+        cursor.close()
+    return rows
+
+
+def refresh_player_tournaments(tree, player_id):
+    """Refresh the tournaments view for a player based on their selected games"""
+    run_in_background("refresh_player_tournaments", fetch_player_tournaments, player_id,
+                      on_done=lambda rows: sync_tree(tree, rows),
+                      on_error=lambda e: messagebox.showerror("Error", f"Failed to refresh tournaments: {str(e)}"),
+                      key=("refresh_player_tournaments", str(tree)))
+
+def update_player_games(player_id, selected_games, tournaments_tree=None):
+    games = [game for game, var in selected_games if var.get()]
+
+    def work():
+        game_ids = list(identity_cache.resolve("games", games).values())
+
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+
+            # only the games that changed are touched, so concurrent saves never wait on each other
+            cursor.execute("SET LOCAL gaming_portal.skip_backup = on")
+            cursor.execute("""
+                DELETE FROM player_games
+                WHERE player_id = %s AND game_id <> ALL(%s::integer[])
+            """, (player_id, game_ids))
+
+            cursor.execute("""
+                INSERT INTO player_games (player_id, game_id)
+                SELECT %s, unnest(%s::integer[])
+                ON CONFLICT (player_id, game_id) DO NOTHING
+            """, (player_id, game_ids))
+            notify_change(cursor, "users", "update", [player_id])
+            cursor.close()
+
+    def done(_):
+        messagebox.showinfo("Success", "Games updated successfully!")
+
+        if tournaments_tree:
+            refresh_player_tournaments(tournaments_tree, player_id)
+
+    run_in_background("update_player_games", work, on_done=done,
+                      on_error=lambda e: messagebox.showerror("Error", str(e)))
+
+def join_team(player_id, team_choice):
+    team_name = team_choice.get()
+    if not team_name:
+        messagebox.showerror("Error", "Please select a team")
+        return
+
+    def work():
+        team_id = require_ids("teams", [team_name])[team_name]
+
+        with pooled_connection(autocommit=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO team_members (team_id, player_id)
+                VALUES (%s, %s)
+            """, (team_id, player_id))
+            notify_change(cursor, "users", "update", [player_id])
+            cursor.close()
+
+    def failed(e):
+        if isinstance(e, psycopg2.IntegrityError):
+            messagebox.showerror("Error", "Already a member of this team")
+        else:
+            messagebox.showerror("Error", str(e))
+
+    run_in_background("join_team", work,
+                      on_done=lambda _: messagebox.showinfo("Success", f"Joined team {team_name} successfully!"),
+                      on_error=failed)
+
+def create_team(player_id, team_name_var):
+    team_name = team_name_var.get()
+    if not team_name:
+        messagebox.showerror("Error", "Please enter a team name")
+        return
+
+    def work():
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO teams (name)
+                VALUES (%s)
+                RETURNING id
+            """, (team_name,))
+
+            team_id = cursor.fetchone()[0]
+
+            cursor.execute("""
+                INSERT INTO team_members (team_id, player_id)
+                VALUES (%s, %s)
+            """, (team_id, player_id))
+            notify_change(cursor, "users", "update", [player_id])
+            cursor.close()
+        identity_cache.remember("teams", [(team_name, team_id)])
+
+    def done(_):
+        messagebox.showinfo("Success", f"Team {team_name} created successfully!")
+        team_name_var.set("")
+
+    def failed(e):
+        if isinstance(e, psycopg2.IntegrityError):
+            messagebox.showerror("Error", "Team name already exists")
+        else:
+            messagebox.showerror("Error", str(e))
+
+    run_in_background("create_team", work, on_done=done, on_error=failed)
+
+def register_for_tournament(tree, player_id):
+    selected_item = tree.selection()
+    if not selected_item:
+        messagebox.showerror("Error", "Please select a tournament")
+        return
+
+    tournament_name, game_name = tree.item(selected_item[0])['values'][:2]
+
+    def work():
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO tournament_participants (tournament_id, player_id)
+                SELECT t.id, %s
+                FROM tournaments t
+                WHERE t.name = %s
+                RETURNING tournament_id
+            """, (player_id, tournament_name))
+            notify_change(cursor, "tournament_participants", "insert",
+                          [row[0] for row in cursor.fetchall()], [player_id])
+            cursor.close()
+
+    def failed(e):
+        if isinstance(e, psycopg2.IntegrityError):
+            messagebox.showerror("Error", "Already registered for this tournament")
+        else:
+            messagebox.showerror("Error", str(e))
+
+    def done(_):
+        messagebox.showinfo("Success", f"Registered for tournament {tournament_name} successfully!")
+        upsert_row(tree, (tournament_name, game_name, 'Registered'))
+
+    run_in_background("register_for_tournament", work, on_done=done, on_error=failed)
+
+def delete_tournament(tree):
+    selected_items = tree.selection()
+    if not selected_items:
+        messagebox.showwarning("Warning", "No tournament selected for deletion.")
+        return
+
+    confirm = messagebox.askyesno("Confirm Delete", f"Delete {len(selected_items)} tournament(s)?")
+    if not confirm:
+        return
+
+    tournament_ids = [tree.item(item)['values'][0] for item in selected_items]
+
+    def work():
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+
+            for tournament_id in tournament_ids:
+                cursor.execute("DELETE FROM tournament_participants WHERE tournament_id = %s", (tournament_id,))
+                cursor.execute("DELETE FROM tournaments WHERE id = %s", (tournament_id,))
+            notify_change(cursor, "tournaments", "delete", tournament_ids)
+            cursor.close()
+
+    def done(_):
+        messagebox.showinfo("Success", "Tournament(s) deleted successfully!")
+        remove_rows(tree, tournament_ids)
+
+    run_in_background("delete_tournament", work, on_done=done,
+                      on_error=lambda e: messagebox.showerror("Error", f"Failed to delete tournament(s): {str(e)}"))
+
+def edit_tournament(tree, name_var, game_var):
+    selected_items = tree.selection()
+    if not selected_items:
+        messagebox.showwarning("Warning", "No tournament selected for editing.")
+        return
+
+    if len(selected_items) > 1:
+        messagebox.showwarning("Warning", "Please select only one tournament to edit.")
+        return
+
+    tournament_id = tree.item(selected_items[0])['values'][0]
+    new_name = name_var.get()
+    new_game = game_var.get()
+
+    if not new_name or not new_game:
+        messagebox.showerror("Error", "Please fill in all fields")
+        return
+
+    def work():
+        game_id = identity_cache.resolve("games", [new_game]).get(new_game)
+        if game_id is None:
+            raise ValueError("Selected game not found")
+
+        with pooled_connection(autocommit=True) as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                WITH updated AS (
+                    UPDATE tournaments
+                    SET name = %s, game_id = %s
+                    WHERE id = %s
+                    RETURNING id, name, game_id, created_by
+                )
+                SELECT t.id, t.name, g.name, u.username
+                FROM updated t
+                JOIN games g ON t.game_id = g.id
+                JOIN users u ON t.created_by = u.id
+            """, (new_name, game_id, tournament_id))
+            row = cursor.fetchone()
+            if row:
+                notify_change(cursor, "tournaments", "update", [tournament_id])
+            cursor.close()
+        return row
+
+    def done(row):
+        messagebox.showinfo("Success", f"Tournament updated successfully!")
+        name_var.set("")
+        game_var.set("")
+        if row:
+            upsert_row(tree, row)
+
+    def failed(e):
+        if isinstance(e, ValueError):
+            messagebox.showerror("Error", str(e))
+        elif isinstance(e, psycopg2.IntegrityError):
+            if "unique constraint" in str(e).lower():
+                messagebox.showerror("Error", "A tournament with this name already exists")
+            else:
+                messagebox.showerror("Error", f"Database error: {str(e)}")
+        else:
+            messagebox.showerror("Error", f"Failed to update tournament: {str(e)}")
+
+    run_in_background("edit_tournament", work, on_done=done, on_error=failed)
+
+def delete_match(tree):
+    selected_items = tree.selection()
+    if not selected_items:
+        messagebox.showwarning("Warning", "No match selected for deletion.")
+        return
+
+    confirm = messagebox.askyesno("Confirm Delete", f"Delete {len(selected_items)} match(es)?")
+    if not confirm:
+        return
+
+    match_ids = [int(tree.item(item)['values'][0]) for item in selected_items]
+
+    def work():
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+            delete_matches(cursor, match_ids)
+            cursor.close()
+
+    def done(_):
+        messagebox.showinfo("Success", "Match(es) deleted successfully!")
+        remove_rows(tree, match_ids)
+
+    run_in_background("delete_match", work, on_done=done,
+                      on_error=lambda e: messagebox.showerror("Error", f"Failed to delete match(es): {str(e)}"))
+
+# the old row is taken out of player_stats and the new one counted, in one statement
+statement_catalog.define("edit_match", """
+    WITH previous AS (
+        SELECT id, player1_id, player2_id, winner_id
+        FROM matches
+        WHERE id = %(match_id)s
+        FOR UPDATE
+    ), updated AS (
+        UPDATE matches m
+        SET game_id = %(game_id)s,
+            player1_id = %(player1_id)s,
+            player2_id = %(player2_id)s,
+            winner_id = %(winner_id)s,
+            match_type = %(match_type)s
+        FROM previous
+        WHERE m.id = previous.id
+        RETURNING m.player1_id, m.player2_id, m.winner_id
+    ), changed AS (
+        SELECT player1_id, player2_id, winner_id, -1 AS sign FROM previous
+        UNION ALL
+        SELECT player1_id, player2_id, winner_id, 1 FROM updated
+    ), """ + _PLAYER_STATS_CHANGES.format(changes="changed") + """
+    SELECT count(*), (SELECT array_agg(player_id) FROM stats) FROM updated
+""")
+
+
+def edit_match(tree, player1_var, player2_var, game_var, winner_var, match_type_var):
+    selected_items = tree.selection()
+    if not selected_items:
+        messagebox.showwarning("Warning", "No match selected for editing.")
+        return
+
+    if len(selected_items) > 1:
+        messagebox.showwarning("Warning", "Please select only one match to edit.")
+        return
+
+    match_id = tree.item(selected_items[0])['values'][0]
+    player1 = player1_var.get()
+    player2 = player2_var.get()
+    game = game_var.get()
+    winner = winner_var.get()
+    match_type = match_type_var.get().lower()
+
+    if not all([player1, player2, game, winner, match_type]):
+        messagebox.showerror("Error", "Please fill in all fields")
+        return
+
+    def work():
+        players = require_ids("users", [player1, player2, winner])
+        game_id = require_ids("games", [game])[game]
+        player1_id, player2_id, winner_id = players[player1], players[player2], players[winner]
+
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+
+            unrate_matches(cursor, [match_id])
+            execute_prepared(cursor, "edit_match", {
+                'match_id': match_id, 'game_id': game_id, 'player1_id': player1_id,
+                'player2_id': player2_id, 'winner_id': winner_id, 'match_type': match_type})
+            updated, stats_changed = cursor.fetchone()
+            if not updated:
+                raise Exception("The match no longer exists")
+            rate_matches(cursor, [(match_id, game_id, player1_id, player2_id, winner_id)])
+            notify_change(cursor, "matches", "update", [match_id], stats_changed or [])
+            cursor.close()
+
+    def done(_):
+        messagebox.showinfo("Success", "Match updated successfully!")
+
+        player1_var.set("")
+        player2_var.set("")
+        game_var.set("")
+        winner_var.set("")
+        match_type_var.set("")
+
+        upsert_row(tree, (match_id, game, player1, player2, winner, match_type))
+
+    run_in_background("edit_match", work, on_done=done,
+                      on_error=lambda e: messagebox.showerror("Error", f"Failed to update match: {str(e)}"))
+
+def undo_last_delete(kind, on_restored):
+    """Restore everything deleted in the most recent delete of players, tournaments or matches."""
+    def work():
+        batch = latest_deletion_batch(kind)
+        if batch is None:
+            return None
+        return restore_tombstones(kind, batches=[batch])
+
+    def done(summary):
+        if summary is None:
+            messagebox.showinfo("Info", f"No deleted {kind} to restore.")
+            return
+        messagebox.showinfo("Success", format_restore_tombstones_summary(summary))
+        on_restored(kind)
+
+    run_in_background(f"restore_{kind}", work, on_done=done,
+                      on_error=lambda e: messagebox.showerror("Error", f"Failed to restore {kind}: {str(e)}"))
+
+def restore_tournament(tree):
+    undo_last_delete("tournaments", lambda kind: refresh_tournaments(tree))
+
+def restore_match(tree, player_tree):
+    undo_last_delete("matches", lambda kind: (tree.refresh(), player_tree.refresh()))
+
+def restore_player(tree, match_tree=None):
+    def restored(kind):
+        tree.refresh()
+        if match_tree is not None:
+            match_tree.refresh()
+
+    undo_last_delete("players", restored)
+
+def restore_deleted(deleted_tree, kind, mode, since="", until="", on_restored=None):
+    if mode == 'range':
+        if not since and not until:
+            messagebox.showerror("Error", "Enter the start and/or end of the time range")
+            return
+        selection = {'since': since or None, 'until': until or None}
+    else:
+        selected_items = deleted_tree.selection()
+        if not selected_items:
+            messagebox.showwarning("Warning", "No deleted rows selected.")
+            return
+        rows = [deleted_tree.item(item)['values'] for item in selected_items]
+        if mode == 'batch':
+            selection = {'batches': sorted({row[1] for row in rows})}
+        else:
+            selection = {'tombstone_ids': [row[0] for row in rows]}
+
+    def done(summary):
+        messagebox.showinfo("Restore", format_restore_tombstones_summary(summary))
+        deleted_tree.refresh()
+        if on_restored:
+            on_restored(kind)
+
+    run_in_background("restore_deleted", lambda: restore_tombstones(kind, **selection), on_done=done,
+                      on_error=lambda e: messagebox.showerror("Error", f"Failed to restore: {str(e)}"))
+
+API_MAX_LIMIT = PAGE_SIZE
+
+
+def api_settings(filename='database.ini'):
+    settings = {
+        'host': '127.0.0.1',
+        'port': 8000,
+        'ttl': 2.0,
+        'cache_entries': 2000,
+    }
+    try:
+        overrides = config(filename, 'api')
+    except Exception:
+        return settings
+
+    for name, value in overrides.items():
+        if name in ('port', 'cache_entries'):
+            settings[name] = int(value)
+        elif name == 'ttl':
+            settings[name] = float(value)
+        elif name in settings:
+            settings[name] = value
+    return settings
+
+
+class ResponseCache:
+    """LRU of encoded API responses, each served for `ttl` seconds."""
+
+    def __init__(self, ttl=2.0, capacity=2000):
+        self.ttl = ttl
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.building = {}
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'waits': 0}
+
+    def get(self, key, build):
+        """(status, body, etag, expires) for key; build() returns (status, body) on a miss."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[3] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry
+            flight = self.building.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.building[key] = {'done': threading.Event(), 'generation': self.generation}
+                self.stats['misses'] += 1
+            else:
+                self.stats['waits'] += 1
+
+        if not leader:
+            flight['done'].wait()
+            if 'error' in flight:
+                raise flight['error']
+            return flight['entry']
+
+        try:
+            status, body = build()
+            flight['entry'] = (status, body, '"%s"' % hashlib.sha1(body).hexdigest(), time.monotonic() + self.ttl)
+        except Exception as e:
+            flight['error'] = e
+            raise
+        finally:
+            with self.lock:
+                del self.building[key]
+                # a clear() while the query ran may have made this answer stale
+                if 'entry' in flight and flight['generation'] == self.generation:
+                    self.entries[key] = flight['entry']
+                    self.entries.move_to_end(key)
+                    while len(self.entries) > self.capacity:
+                        self.entries.popitem(last=False)
+            flight['done'].set()
+        return flight['entry']
+
+    def clear(self, prefix=''):
+        with self.lock:
+            for key in [key for key in self.entries if key.startswith(prefix)]:
+                del self.entries[key]
+            self.generation += 1
+
+
+api_cache = ResponseCache()
+
+
+def _api_int(query, name, default):
+    try:
+        return int(query.get(name, default))
+    except ValueError:
+        raise ValueError(f"{name} must be a whole number")
+
+
+def _api_page(query):
+    return {'limit': min(max(_api_int(query, 'limit', API_MAX_LIMIT), 1), API_MAX_LIMIT)}
+
+
+def _api_leaderboard(query):
+    game = query.get('game')
+    game_id = require_ids("games", [game])[game] if game else LEADERBOARD_OVERALL
+    page = _api_page(query)
+    rows = fetch_leaderboard_page(after=query.get('after'), game_id=game_id, **page)
+    return {'game': game,
+            'players': [{'rank': rank, 'username': username, 'tournaments_won': tournaments_won,
+                         'wins': wins, 'played': played}
+                        for rank, username, tournaments_won, wins, played in rows],
+            'next': rows[-1][1] if len(rows) == page['limit'] else None}
+
+
+def _api_matches(query):
+    filters = {}
+    if query.get('game'):
+        filters['game_id'] = require_ids("games", [query['game']])[query['game']]
+    if query.get('player'):
+        filters['player_id'] = require_ids("users", [query['player']])[query['player']]
+    after = _api_int(query, 'after', 0) or None
+    page = _api_page(query)
+    rows = fetch_matches_page(after=after, **page, **filters)
+    return {'matches': [{'id': match_id, 'game': game, 'player1': player1, 'player2': player2,
+                         'winner': winner, 'match_type': match_type}
+                        for match_id, game, player1, player2, winner, match_type in rows],
+            'next': rows[-1][0] if len(rows) == page['limit'] else None}
+
+
+def _api_tournaments(query):
+    return {'tournaments': [{'id': tournament_id, 'name': name, 'game': game, 'created_by': created_by}
+                            for tournament_id, name, game, created_by in fetch_tournaments()]}
+
+
+def _api_player(username):
+    player_id = identity_cache.resolve("users", [username]).get(username)
+    profile = fetch_player_profile(player_id) if player_id is not None else None
+    if profile is None:
+        raise LookupError(f"Unknown player: {username}")
+    _, tournaments_won, matches_won, total_matches, rank, ranked = profile
+    return {'username': username, 'tournaments_won': tournaments_won, 'matches_won': matches_won,
+            'total_matches': total_matches, 'rank': rank, 'ranked_players': ranked,
+            'ratings': [{'game': game, 'rating': rating, 'matches': matches}
+                        for game, rating, matches in fetch_player_ratings(player_id)]}
+
+
+# path -> (handler, the query parameters it reads); only those go into the cache key
+API_ROUTES = {
+    "/leaderboard": (_api_leaderboard, ('game', 'after', 'limit')),
+    "/matches": (_api_matches, ('game', 'player', 'after', 'limit')),
+    "/tournaments": (_api_tournaments, ()),
+}
+
+
+def _api_json(status, payload):
+    return status, json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+def api_response(path, query_string=''):
+    """(status, body, etag, expires) for a GET; answered from api_cache while it is fresh."""
+    query = dict(parse_qsl(query_string))
+    if path in API_ROUTES:
+        handler, names = API_ROUTES[path]
+        params = sorted((name, query[name]) for name in names if query.get(name))
+        key = path + ("?" + urlencode(params) if params else "")
+        run = lambda: handler(dict(params))
+    elif path.startswith("/players/") and path.count("/") == 2:
+        key = path
+        run = lambda: _api_player(unquote(path[len("/players/"):]))
+    elif path == "/stats":
+        status, body = _api_json(200, {'cache': dict(api_cache.stats), 'pool': pool_stats(),
+                                       'replicas': replica_stats(),
+                                       'statements': statement_catalog.snapshot_stats()})
+        return status, body, None, None
+    else:
+        status, body = _api_json(404, {'error': f"No such resource: {path}"})
+        return status, body, None, None
+
+    def build():
+        try:
+            return _api_json(200, run())
+        except LookupError as e:
+            return _api_json(404, {'error': str(e)})
+        except ValueError as e:
+            return _api_json(400, {'error': str(e)})
+
+    return api_cache.get(key, build)
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "GamingPortal"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            status, body, etag, expires = api_response(url.path, url.query)
+        except Exception as e:
+            sys.stderr.write(f"{self.path} failed: {e}\n")
+            (status, body), etag, expires = _api_json(500, {'error': "Internal error"}), None, None
+
+        if etag is not None:
+            max_age = max(0, int(expires - time.monotonic()))
+            tags = [tag.strip().removeprefix("W/") for tag in self.headers.get("If-None-Match", "").split(",")]
+            if etag in tags or "*" in tags:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", f"public, max-age={max_age}")
+                self.end_headers()
+                return
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if etag is not None:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", f"public, max-age={max_age}")
+        else:
+            self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+# cached paths each table's changes can make stale
+API_INVALIDATES = {
+    "matches": ("/leaderboard", "/matches", "/players/"),
+    "users": ("/leaderboard", "/matches", "/players/"),
+    "tournaments": ("/tournaments",),
+    "tournament_participants": (),
+}
+
+
+def invalidate_api_cache(events):
+    changes = group_changes(events)
+    if changes is None:
+        api_cache.clear()
+        return
+    prefixes = set()
+    for table, _ in changes:
+        prefixes.update(API_INVALIDATES.get(table, ("",)))
+    for prefix in sorted(prefixes):
+        api_cache.clear(prefix)
+
+
+def make_api_server(host=None, port=None, verbose=False):
+    settings = api_settings()
+    api_cache.capacity = settings['cache_entries']
+    server = ThreadingHTTPServer((host or settings['host'], settings['port'] if port is None else port),
+                                 ApiRequestHandler)
+    server.verbose = verbose
+    return server
+
+
+def serve_api(host=None, port=None, ttl=None, verbose=False):
+    """Serve the read API until interrupted; other instances' writes drop the cached pages they change."""
+    api_cache.ttl = api_settings()['ttl'] if ttl is None else ttl
+    identity_cache.warm()
+
+    def changed(events):
+        _forget_deleted_users(events)
+        invalidate_api_cache(events)
+
+    listener = ChangeListener(changed).start()
+    server = make_api_server(host, port, verbose)
+    print(f"Serving the read API on http://{server.server_address[0]}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        listener.stop()
+
+
+def run_command(argv):
+    parser = argparse.ArgumentParser(prog="Tournament_App.py",
+                                     description="Gaming Portal maintenance commands. Run without arguments to start the app.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    snapshot = commands.add_parser("snapshot", help="write a compressed local snapshot of the database")
+    snapshot.add_argument("directory")
+    snapshot.add_argument("--workers", type=int, default=4)
+    snapshot.add_argument("--codec", choices=["zstd", "zlib"])
+
+    restore = commands.add_parser("restore-snapshot", help="load a local snapshot into the database")
+    restore.add_argument("directory")
+    restore.add_argument("--no-truncate", action="store_true",
+                         help="append to the existing tables instead of emptying them first")
+    restore.add_argument("--clear-tombstones", action="store_true",
+                         help="also empty the deleted-row tables (the undo history)")
+
+    firestore_restore = commands.add_parser("restore-firestore",
+                                            help="rebuild the database from the Firestore backup")
+    firestore_restore.add_argument("--readers", type=int, default=4)
+    firestore_restore.add_argument("--no-truncate", action="store_true",
+                                   help="append to the existing tables instead of emptying them first")
+    firestore_restore.add_argument("--clear-tombstones", action="store_true",
+                                   help="also empty the deleted-row tables (the undo history)")
+
+    ingest = commands.add_parser("ingest", help="load a CSV or JSON Lines feed of match results")
+    ingest.add_argument("feed", help="file to read, or - for standard input")
+    ingest.add_argument("--format", choices=["csv", "jsonl"],
+                        help="feed format (default: from the file extension, csv for stdin)")
+    ingest.add_argument("--batch-rows", type=int, default=INGEST_BATCH_ROWS)
+
+    commands.add_parser("rebuild-ratings", help="recompute every Elo rating from the match history")
+
+    reconcile = commands.add_parser("reconcile-stats",
+                                    help="check player_stats against the matches and tournaments tables")
+    reconcile.add_argument("--apply", action="store_true", help="correct the players that differ")
+    reconcile.add_argument("--chunk-players", type=int, default=RECONCILE_CHUNK_PLAYERS,
+                           help="user ids checked per transaction")
+
+    purge = commands.add_parser("purge-tombstones",
+                                help="drop deleted rows older than the retention period")
+    purge.add_argument("--retention-days", type=int,
+                       help="keep this many days (default: [tombstones] retention_days, 90)")
+
+    serve = commands.add_parser("serve", help="serve the read-only JSON API for spectators")
+    serve.add_argument("--host", help="address to listen on (default: [api] host, 127.0.0.1)")
+    serve.add_argument("--port", type=int, help="port to listen on (default: [api] port, 8000)")
+    serve.add_argument("--ttl", type=float, help="seconds a response is cached (default: [api] ttl, 2)")
+    serve.add_argument("--verbose", action="store_true", help="log every request")
+
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "snapshot":
+            manifest = export_snapshot(args.directory, workers=args.workers, codec=args.codec)
+            for table, stats in manifest['tables'].items():
+                print(f"{table}: {stats['rows']} rows, {stats['bytes']} -> {stats['compressed_bytes']} bytes")
+            print(f"Snapshot written to {args.directory} in {manifest['seconds']:.1f}s")
+        elif args.command == "restore-snapshot":
+            result = restore_snapshot(args.directory, truncate=not args.no_truncate,
+                                      clear_tombstones=args.clear_tombstones)
+            for table, stats in result['tables'].items():
+                print(f"{table}: {stats['rows']} rows in {stats['seconds']:.1f}s")
+            print(f"Snapshot restored in {result['seconds']:.1f}s")
+            print_ratings_rebuild()
+        elif args.command == "restore-firestore":
+            summary = restore_from_firestore(get_firestore_client(), readers=args.readers,
+                                             truncate=not args.no_truncate,
+                                             clear_tombstones=args.clear_tombstones)
+            summary.pop('_sequences')
+            print(format_restore_summary(summary))
+            print_ratings_rebuild()
+        elif args.command == "ingest":
+            fmt = args.format or ('jsonl' if args.feed.endswith(('.jsonl', '.ndjson')) else 'csv')
+            if args.feed == "-":
+                summary = ingest_matches(io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline=''),
+                                         fmt, args.batch_rows)
+            else:
+                with open(args.feed, encoding='utf-8', newline='') as feed:
+                    summary = ingest_matches(feed, fmt, args.batch_rows)
+            print(format_ingest_summary(summary))
+        elif args.command == "rebuild-ratings":
+            print_ratings_rebuild()
+        elif args.command == "reconcile-stats":
+            print(format_reconcile_summary(reconcile_player_stats(apply=args.apply,
+                                                                  chunk_players=args.chunk_players)))
+        elif args.command == "purge-tombstones":
+            print(format_purge_summary(purge_tombstones(args.retention_days)))
+        elif args.command == "serve":
+            serve_api(args.host, args.port, args.ttl, args.verbose)
+    finally:
+        close_pool()
+
+
+def main():
+    if len(sys.argv) > 1:
+        run_command(sys.argv[1:])
+        return
+
+    root = tk.Tk()
+    root.title("Tournament Manager")
+    root.geometry("800x600")
+    executor = start_executor(root)
+    listener = start_change_listener()
+    show_login_window(root)
+    try:
+        root.mainloop()
+    finally:
+        listener.stop()
+        executor.shutdown()
+        close_pool()
+
+if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""Load-test the read API with many concurrent viewers.
+
+    python benchmarks/api_load_benchmark.py --clients 50 --seconds 10
+    python benchmarks/api_load_benchmark.py --url http://127.0.0.1:8000 --clients 200
+
+Without --url the API is started in this process on a free port, against
+the database named in database.ini. Each client keeps one HTTP/1.1
+connection open and loops over the leaderboards, match history, the
+tournament list and a sample of player profiles. Half of its requests send
+back the ETag it last saw for that path, as a browser revalidating its
+copy would. Prints requests/s, latency percentiles, the status codes, and
+how many requests missed the cache and so reached PostgreSQL.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from urllib.parse import quote, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import Tournament_App as app
+
+
+def get(conn, path, etag=None):
+    conn.request("GET", path, headers={"If-None-Match": etag} if etag else {})
+    response = conn.getresponse()
+    body = response.read()
+    return response.status, response.getheader("ETag"), body
+
+
+def viewer_paths(host, port, profiles):
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    paths = ["/leaderboard", "/matches", "/tournaments"]
+    _, _, body = get(conn, "/leaderboard")
+    board = json.loads(body)
+    players = [row['username'] for row in board['players']]
+    if board['next']:
+        paths.append(f"/leaderboard?after={quote(board['next'])}")
+    paths += [f"/players/{quote(name)}" for name in players[:profiles]]
+    paths += [f"/matches?player={quote(name)}" for name in players[:profiles // 4]]
+    _, _, body = get(conn, "/tournaments")
+    games = sorted({row['game'] for row in json.loads(body)['tournaments']})
+    paths += [f"/leaderboard?game={quote(game)}" for game in games]
+    conn.close()
+    return paths
+
+
+def viewer(host, port, paths, deadline, seed, results):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    etags, latencies, statuses = {}, [], Counter()
+    while time.monotonic() < deadline:
+        path = rng.choice(paths)
+        started = time.monotonic()
+        status, etag, _ = get(conn, path, etags.get(path) if rng.random() < 0.5 else None)
+        latencies.append(time.monotonic() - started)
+        statuses[status] += 1
+        if etag:
+            etags[path] = etag
+    conn.close()
+    results.append((latencies, statuses))
+
+
+def stats(host, port):
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    _, _, body = get(conn, "/stats")
+    conn.close()
+    return json.loads(body)['cache']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="API to test (default: start one in this process)")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--profiles", type=int, default=40, help="distinct player profiles requested")
+    parser.add_argument("--ttl", type=float, help="cache TTL of the in-process API")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        if args.ttl is not None:
+            app.api_cache.ttl = args.ttl
+        server = app.make_api_server("127.0.0.1", 0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address
+
+    try:
+        paths = viewer_paths(host, port, args.profiles)
+        before = stats(host, port)
+        results = []
+        deadline = time.monotonic() + args.seconds
+        clients = [threading.Thread(target=viewer, args=(host, port, paths, deadline, seed, results))
+                   for seed in range(args.clients)]
+        started = time.monotonic()
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        elapsed = time.monotonic() - started
+        after = stats(host, port)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            app.close_pool()
+
+    latencies = sorted(latency for client_latencies, _ in results for latency in client_latencies)
+    statuses = sum((client_statuses for _, client_statuses in results), Counter())
+    misses = after['misses'] - before['misses']
+    print(f"{len(latencies)} requests from {args.clients} clients over {len(paths)} paths in {elapsed:.1f}s: "
+          f"{len(latencies) / elapsed:.0f} requests/s")
+    print(f"latency p50 {latencies[len(latencies) // 2] * 1000:.1f}ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f}ms")
+    print("status " + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items())))
+    print(f"cache misses (database queries) {misses}, "
+          f"coalesced waits {after['waits'] - before['waits']}, hits {after['hits'] - before['hits']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Compare bulk-delete throughput of the statement-level backup triggers with
+the row-level ones they replaced.
+
+    python benchmarks/backup_trigger_benchmark.py --rows 1000 10000 100000
+
+For each size, inserts that many matches between two scratch players and
+times one DELETE of all of them: once with the triggers in the schema, and
+once after putting back the old FOR EACH ROW backup and deletion-log
+triggers on matches. Every run is rolled back, so the database is left as
+it was, but the trigger swap locks matches while it runs; use a scratch
+database.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import Tournament_App as app
+
+ROW_LEVEL_TRIGGERS = """
+    DROP TRIGGER trg_backup_matches ON matches;
+    DROP TRIGGER trg_log_deleted_matches ON matches;
+
+    CREATE FUNCTION pg_temp.backup_matches_row() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO matches_backup (id, game_id, player1_id, player2_id, winner_id, match_type, created_at)
+        VALUES (old.id, old.game_id, old.player1_id, old.player2_id, old.winner_id, old.match_type,
+                old.created_at);
+        RETURN old;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE FUNCTION pg_temp.log_deleted_row() RETURNS trigger AS $$
+    DECLARE
+        key_values text[] := '{}';
+        col text;
+    BEGIN
+        FOREACH col IN ARRAY tg_argv LOOP
+            key_values := key_values || (to_jsonb(old) ->> col);
+        END LOOP;
+        INSERT INTO deleted_rows (table_name, doc_id)
+        VALUES (tg_table_name, array_to_string(key_values, '_'));
+        RETURN old;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER trg_backup_matches BEFORE DELETE ON matches
+    FOR EACH ROW EXECUTE FUNCTION pg_temp.backup_matches_row();
+    CREATE TRIGGER trg_log_deleted_matches AFTER DELETE ON matches
+    FOR EACH ROW EXECUTE FUNCTION pg_temp.log_deleted_row('id');
+"""
+
+
+def time_delete(rows, row_level):
+    with app.pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            # only the backup triggers are being compared
+            cursor.execute("SET LOCAL gaming_portal.skip_leaderboard = on")
+            if row_level:
+                cursor.execute(ROW_LEVEL_TRIGGERS)
+            cursor.execute("""
+                INSERT INTO users (username, password, role)
+                VALUES ('bench_delete_a', 'pw', 'player'), ('bench_delete_b', 'pw', 'player')
+                RETURNING id
+            """)
+            player1_id, player2_id = [row[0] for row in cursor.fetchall()]
+            cursor.execute("""
+                INSERT INTO matches (game_id, player1_id, player2_id, winner_id, match_type)
+                SELECT (SELECT min(id) FROM games), %s, %s, %s, 'friendly'
+                FROM generate_series(1, %s)
+            """, (player1_id, player2_id, player1_id, rows))
+
+            started = time.monotonic()
+            cursor.execute("DELETE FROM matches WHERE player1_id = %s", (player1_id,))
+            elapsed = time.monotonic() - started
+        finally:
+            conn.rollback()
+            cursor.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    try:
+        for rows in args.rows:
+            row_level = time_delete(rows, row_level=True)
+            statement = time_delete(rows, row_level=False)
+            print(f"{rows} matches: row-level {row_level:.2f}s ({rows / row_level:.0f} rows/s), "
+                  f"statement-level {statement:.2f}s ({rows / statement:.0f} rows/s), "
+                  f"{row_level / statement:.1f}x")
+    finally:
+        app.close_pool()
+
+
+if __name__ == "__main__":
+    main()
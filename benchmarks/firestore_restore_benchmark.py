@@ -0,0 +1,101 @@
+"""Seed the local Firestore emulator with synthetic data and time a full restore.
+
+    firebase emulators:start --only firestore
+    set FIRESTORE_EMULATOR_HOST=localhost:8080
+    python benchmarks/firestore_restore_benchmark.py --players 10000 --matches 500000
+
+The restore empties the tables of the database named in database.ini, so
+point it at a scratch database. Pass --backup to also time a full backup
+of the restored data back into the emulator.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent import futures
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import Tournament_App as app
+
+
+GAMES = ['dota2', 'fortnite', 'valorant', 'fifa', 'cod', 'tekken', 'league of legends']
+
+
+def synthetic_collections(players, matches):
+    start = datetime(2024, 1, 1)
+    yield "games", [{'id': i + 1, 'name': name} for i, name in enumerate(GAMES)]
+
+    users = [{'id': 1, 'username': 'admin', 'password': 'admin', 'role': 'admin', 'created_at': start}]
+    users += [{'id': i, 'username': f'player{i}', 'password': 'pw', 'role': 'player',
+               'created_at': start + timedelta(minutes=i)} for i in range(2, players + 2)]
+    yield "users", users
+
+    wins = {}
+    totals = {}
+    rows = []
+    for match_id in range(1, matches + 1):
+        player1, player2 = random.sample(range(2, players + 2), 2)
+        winner = random.choice((player1, player2))
+        wins[winner] = wins.get(winner, 0) + 1
+        totals[player1] = totals.get(player1, 0) + 1
+        totals[player2] = totals.get(player2, 0) + 1
+        rows.append({'id': match_id, 'game_id': random.randint(1, len(GAMES)),
+                     'player1_id': player1, 'player2_id': player2, 'winner_id': winner,
+                     'match_type': random.choice(('friendly', 'tournament')),
+                     'created_at': start + timedelta(seconds=match_id)})
+    yield "matches", rows
+
+    yield "player_stats", [{'player_id': i, 'tournaments_won': 0, 'matches_won': wins.get(i, 0),
+                            'total_matches': totals.get(i, 0)} for i in range(2, players + 2)]
+
+
+def seed(db, players, matches, workers):
+    started = time.monotonic()
+    total = 0
+    with futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        jobs = []
+        for table, rows in synthetic_collections(players, matches):
+            for i in range(0, len(rows), app.FIRESTORE_BATCH_LIMIT):
+                ops = [(app.backup_doc_id(table, row), row) for row in rows[i:i + app.FIRESTORE_BATCH_LIMIT]]
+                jobs.append(pool.submit(app._commit_firestore_batch, db, table, ops))
+            total += len(rows)
+        for job in jobs:
+            job.result()
+    elapsed = time.monotonic() - started
+    print(f"Seeded {total} documents in {elapsed:.1f}s ({total / elapsed:.0f} docs/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=10000)
+    parser.add_argument("--matches", type=int, default=200000)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse documents already in the emulator")
+    parser.add_argument("--backup", action="store_true", help="also time a full backup after the restore")
+    args = parser.parse_args()
+
+    if not os.environ.get('FIRESTORE_EMULATOR_HOST'):
+        sys.exit("FIRESTORE_EMULATOR_HOST is not set; refusing to run against a real Firestore project")
+
+    db = app.get_firestore_client()
+    if not args.skip_seed:
+        seed(db, args.players, args.matches, args.workers)
+
+    summary = app.restore_from_firestore(db, readers=args.readers, progress=None)
+    summary.pop('_sequences')
+    print("Restore")
+    print(app.format_restore_summary(summary))
+
+    if args.backup:
+        summary = app.run_firestore_backup(db, incremental=False, workers=args.workers, progress=None)
+        print("Full backup")
+        print(app.format_backup_summary(summary))
+    app.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Time the match ingestion pipeline on a synthetic feed.
+
+    python benchmarks/ingest_benchmark.py --players 2000 --matches 500000 --format csv
+
+Creates bench_player<N> accounts if they are missing, writes a feed of
+random matches to a temporary file, ingests it, then ingests the same file
+again to time the duplicate path. It adds matches to the database named in
+database.ini, so point it at a scratch database.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import Tournament_App as app
+
+
+def ensure_players(count):
+    names = [f"bench_player{i}" for i in range(1, count + 1)]
+    with app.pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            WITH created AS (
+                INSERT INTO users (username, password, role)
+                SELECT name, 'pw', 'player' FROM unnest(%s::text[]) AS name
+                ON CONFLICT (username) DO NOTHING
+                RETURNING id
+            )
+            INSERT INTO player_stats (player_id)
+            SELECT id FROM created
+        """, (names,))
+        cursor.execute("SELECT name FROM games")
+        games = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+    return names, games
+
+
+def write_feed(path, fmt, players, games, matches):
+    run = int(time.time())
+    start = datetime(2024, 1, 1)
+    with open(path, "w", encoding="utf-8", newline="") as out:
+        writer = csv.writer(out) if fmt == "csv" else None
+        if writer:
+            writer.writerow(app.MATCH_FEED_FIELDS)
+        for i in range(matches):
+            player1, player2 = random.sample(players, 2)
+            row = (f"bench-{run}-{i}", random.choice(games), player1, player2,
+                   random.choice((player1, player2)), random.choice(("friendly", "tournament")),
+                   (start + timedelta(seconds=i)).isoformat(" "))
+            if writer:
+                writer.writerow(row)
+            else:
+                out.write(json.dumps(dict(zip(app.MATCH_FEED_FIELDS, row))) + "\n")
+
+
+def total_matches_played():
+    with app.pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT coalesce(sum(total_matches), 0) FROM player_stats")
+        total = cursor.fetchone()[0]
+        cursor.close()
+    return total
+
+
+def ingest(path, fmt, batch_rows):
+    with open(path, encoding="utf-8", newline="") as feed:
+        return app.ingest_matches(feed, fmt, batch_rows, progress=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=2000)
+    parser.add_argument("--matches", type=int, default=200000)
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--batch-rows", type=int, default=app.INGEST_BATCH_ROWS)
+    args = parser.parse_args()
+
+    players, games = ensure_players(args.players)
+    path = os.path.join(tempfile.mkdtemp(prefix="ingest-bench-"), f"feed.{args.format}")
+    started = time.monotonic()
+    write_feed(path, args.format, players, games, args.matches)
+    print(f"Wrote {args.matches} matches to {path} in {time.monotonic() - started:.1f}s")
+
+    try:
+        played_before = total_matches_played()
+        print("First load:")
+        print(app.format_ingest_summary(ingest(path, args.format, args.batch_rows)))
+        played = total_matches_played() - played_before
+        print(f"player_stats total_matches grew by {played} (expected {2 * args.matches})")
+
+        print("Same feed again (all duplicates):")
+        print(app.format_ingest_summary(ingest(path, args.format, args.batch_rows)))
+    finally:
+        os.remove(path)
+        os.rmdir(os.path.dirname(path))
+        app.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Compare the statement catalog's prepared statements with sending the SQL text each time.
+
+    python benchmarks/prepared_statements_benchmark.py --runs 2000
+
+For create_match's statements (recording a match, its player_stats and
+ratings updates and the change notification) and for refresh_matches' page
+loads (the first page of match history, the pages after it and the count),
+prints the planning time PostgreSQL reports for one execution of each
+statement sent as text and as EXECUTE of the prepared statement. Then it
+times --runs recordings and page loads both ways. Every recorded match is
+rolled back. Needs at least two players and a game in the database named in
+database.ini.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import Tournament_App as app
+
+
+def sample_match(cursor):
+    cursor.execute("SELECT id FROM users WHERE role = 'player' ORDER BY id LIMIT 2")
+    player1_id, player2_id = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT min(id) FROM games")
+    return cursor.fetchone()[0], player1_id, player2_id, player1_id, 'friendly'
+
+
+def record_rolled_back(conn, match):
+    cursor = conn.cursor()
+    try:
+        app.record_match(cursor, *match)
+    finally:
+        conn.rollback()
+        cursor.close()
+
+
+def load_pages(pages):
+    rows = app.fetch_matches_page()
+    app.count_matches()
+    for _ in range(pages - 1):
+        rows = app.fetch_matches_page(after=rows[-1][0])
+
+
+def explained(cursor, query, params):
+    cursor.execute("EXPLAIN (ANALYZE, SUMMARY, FORMAT JSON) " + cursor.mogrify(query, params).decode())
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Planning Time'], plan[0]['Execution Time']
+
+
+def statement_timings(conn, name, params, warmup=6):
+    # after a few executions PostgreSQL decides whether to keep a generic plan
+    sql, _, keys, run = app.statement_catalog.statements[name]
+    cursor = conn.cursor()
+    try:
+        for _ in range(warmup):
+            app.execute_prepared(cursor, name, params)
+        text = explained(cursor, sql, params)
+        prepared = explained(cursor, run, params if keys is None else [params[key] for key in keys])
+    finally:
+        conn.rollback()
+        cursor.close()
+    return text, prepared
+
+
+def timed(runs, func):
+    started = time.monotonic()
+    for _ in range(runs):
+        func()
+    return (time.monotonic() - started) / runs * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--pages", type=int, default=3, help="pages loaded per refresh")
+    args = parser.parse_args()
+
+    try:
+        with app.pooled_connection() as conn:
+            cursor = conn.cursor()
+            match = sample_match(cursor)
+            cursor.close()
+            game_id, player1_id, player2_id, winner_id, match_type = match
+            # defines the page and count statements in the catalog
+            newest = app.fetch_matches_page()[0][0]
+            app.fetch_matches_page(after=newest)
+            app.count_matches()
+            checks = [
+                ("record_match", {'game': game_id, 'player1': player1_id, 'player2': player2_id,
+                                  'winner': winner_id, 'match_type': match_type}),
+                ("lock_ratings", (f"{{{game_id},{game_id}}}", f"{{{player1_id},{player2_id}}}")),
+                ("matches_page_desc", []),
+                ("matches_page_desc_keyset", [newest]),
+                ("count_matches", []),
+            ]
+            print("planning / execution ms    as text        prepared")
+            for name, params in checks:
+                (text_plan, text_run), (plan, run) = statement_timings(conn, name, params)
+                print(f"{name:26} {text_plan:6.3f} / {text_run:6.3f}  {plan:6.3f} / {run:6.3f}")
+
+            results = {}
+            for enabled in (False, True):
+                app.statement_catalog.enabled = enabled
+                results[enabled] = (timed(args.runs, lambda: record_rolled_back(conn, match)),
+                                    timed(args.runs, lambda: load_pages(args.pages)))
+        for enabled, label in ((False, "as text"), (True, "prepared")):
+            recording, refresh = results[enabled]
+            print(f"{label:9} create_match {recording:.3f}ms, refresh_matches ({args.pages} pages and the count) "
+                  f"{refresh:.3f}ms")
+        print(app.statement_catalog.snapshot_stats())
+    finally:
+        app.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Time the vectorized Elo replay, and optionally a full rebuild_ratings().
+
+    python benchmarks/ratings_benchmark.py --players 100000 --games 7 --matches 10000000
+    python benchmarks/ratings_benchmark.py --database
+
+The first form replays a random history in memory and checks a sample of
+it against rating the same matches one at a time with elo_deltas().
+--database rebuilds the ratings of the database named in database.ini.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import Tournament_App as app
+
+
+def random_history(players, games, matches, seed):
+    rng = np.random.default_rng(seed)
+    game_ids = rng.integers(1, games + 1, matches)
+    player1_ids = rng.integers(1, players + 1, matches)
+    player2_ids = rng.integers(1, players + 1, matches)
+    keep = player1_ids != player2_ids
+    game_ids, player1_ids, player2_ids = game_ids[keep], player1_ids[keep], player2_ids[keep]
+    winner_ids = np.where(rng.random(len(game_ids)) < 0.5, player1_ids, player2_ids)
+    return game_ids, player1_ids, player2_ids, winner_ids
+
+
+def replay_one_by_one(game_ids, player1_ids, player2_ids, winner_ids):
+    ratings = {}
+    for game_id, player1_id, player2_id, winner_id in zip(game_ids.tolist(), player1_ids.tolist(),
+                                                          player2_ids.tolist(), winner_ids.tolist()):
+        side1 = ratings.setdefault((game_id, player1_id), [app.ELO_START, 0])
+        side2 = ratings.setdefault((game_id, player2_id), [app.ELO_START, 0])
+        delta1, delta2 = app.elo_deltas(side1[0], side2[0], side1[1], side2[1],
+                                        app._match_score(player1_id, player2_id, winner_id))
+        side1[0] += delta1
+        side2[0] += delta2
+        side1[1] += 1
+        side2[1] += 1
+    return ratings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=100000)
+    parser.add_argument("--games", type=int, default=7)
+    parser.add_argument("--matches", type=int, default=10000000)
+    parser.add_argument("--check", type=int, default=200000,
+                        help="replay this many matches one by one as well and compare")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database", action="store_true")
+    args = parser.parse_args()
+
+    if args.database:
+        try:
+            result = app.rebuild_ratings(
+                progress=lambda stage, matches, elapsed: print(f"{stage}: {matches} matches at {elapsed:.1f}s"))
+        finally:
+            app.close_pool()
+        print(f"Rebuilt {result['players']} ratings from {result['matches']} matches in {result['seconds']:.1f}s")
+        return
+
+    history = random_history(args.players, args.games, args.matches, args.seed)
+    started = time.monotonic()
+    (games, players, ratings, played), _ = app.replay_ratings(*history)
+    elapsed = time.monotonic() - started
+    print(f"Replayed {len(history[0])} matches for {len(games)} player/game pairs in {elapsed:.1f}s "
+          f"({len(history[0]) / elapsed:.0f} matches/s)")
+
+    if args.check:
+        sample = [column[:args.check] for column in history]
+        (games, players, ratings, played), _ = app.replay_ratings(*sample)
+        expected = replay_one_by_one(*sample)
+        worst = max(abs(expected[(game, player)][0] - rating)
+                    for game, player, rating in zip(games.tolist(), players.tolist(), ratings.tolist()))
+        print(f"First {len(sample[0])} matches one by one: largest rating difference {worst:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Check read-replica routing against a primary and a streaming replica, and time reads.
+
+    python benchmarks/replica_benchmark.py --reads 2000 --threads 8
+    python benchmarks/replica_benchmark.py --pause-replay
+
+Needs at least one replica listed in the [replicas] section of
+database.ini (see README). It prints where reads go, checks that reads
+right after a write go to the primary, and times leaderboard pages read
+through the router against the same pages read from the primary alone.
+--pause-replay also pauses WAL replay on the first replica, writes on the
+primary and waits for the router to take that replica out of rotation, then
+resumes replay and waits for it to come back. Pausing replay needs a
+superuser, so use scratch servers.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+from concurrent import futures
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import Tournament_App as app
+
+
+def served_by():
+    with app.read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT CASE WHEN pg_is_in_recovery() THEN 'replica' ELSE 'primary' END, "
+                       "current_setting('port')")
+        where = cursor.fetchone()
+        cursor.close()
+    return where
+
+
+def routing(reads):
+    return Counter(f"{kind} (port {port})" for kind, port in (served_by() for _ in range(reads)))
+
+
+def time_pages(reads, threads):
+    started = time.monotonic()
+    with futures.ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda i: app.fetch_leaderboard_page(offset=(i % 50) * 20, limit=20), range(reads)))
+    return reads / (time.monotonic() - started)
+
+
+def commit_on_primary():
+    # a transaction with an xid, so the replica has a commit to replay
+    with app.pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_current_xact_id()")
+        cursor.close()
+
+
+def run_on(replica, query):
+    with app.get_replica_router()._pool(replica).connection() as conn:
+        conn.autocommit = True
+        cursor = conn.cursor()
+        cursor.execute(query)
+        cursor.close()
+
+
+def wait_for(router, replica, healthy, limit):
+    started = time.monotonic()
+    while time.monotonic() - started < limit:
+        commit_on_primary()
+        if router.snapshot_stats()['replicas'][replica['name']]['healthy'] == healthy:
+            return time.monotonic() - started
+        time.sleep(0.2)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--pause-replay", action="store_true")
+    args = parser.parse_args()
+
+    router = app.get_replica_router()
+    if not router.replicas:
+        sys.exit("No replicas configured: add a [replicas] section to database.ini")
+
+    try:
+        print("Reads:", dict(routing(20)))
+        for name, state in router.snapshot_stats()['replicas'].items():
+            print(f"  {name}: healthy {state['healthy']}, lag {state['lag']}, {state['error'] or 'ok'}")
+
+        app.note_write()
+        print(f"Right after a write: {dict(routing(5))}")
+        router.last_write = float('-inf')
+
+        routed = time_pages(args.reads, args.threads)
+        replicas, router.replicas = router.replicas, []
+        primary = time_pages(args.reads, args.threads)
+        router.replicas = replicas
+        print(f"{args.reads} leaderboard pages on {args.threads} threads: {routed:.0f} pages/s routed, "
+              f"{primary:.0f} pages/s from the primary alone")
+
+        if args.pause_replay:
+            replica = router.replicas[0]
+            limit = router.max_lag + 3 * router.check_interval + 5
+            run_on(replica, "SELECT pg_wal_replay_pause()")
+            try:
+                took = wait_for(router, replica, False, limit)
+                print(f"Replay paused: {replica['name']} left the rotation after {took:.1f}s" if took is not None
+                      else f"Replay paused: {replica['name']} still in rotation after {limit:.0f}s")
+                print("Reads:", dict(routing(10)))
+            finally:
+                run_on(replica, "SELECT pg_wal_replay_resume()")
+            took = wait_for(router, replica, True, limit)
+            print(f"Replay resumed: {replica['name']} back after {took:.1f}s" if took is not None
+                  else f"Replay resumed: {replica['name']} not back after {limit:.0f}s")
+            print("Reads:", dict(routing(10)))
+        print(app.replica_stats())
+    finally:
+        app.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Time a local snapshot and its restore at the scale of millions of matches.
+
+    python benchmarks/snapshot_restore_benchmark.py --players 100000 --matches 10000000
+    python benchmarks/snapshot_restore_benchmark.py --skip-seed --directory /tmp/bench-snapshot
+
+Fills the database named in database.ini with synthetic players and matches
+(emptying its tables first, so point it at a scratch database), writes a
+snapshot of it with export_snapshot() and loads it back with
+restore_snapshot(), printing the time and rate of each table. The restore
+is one transaction whatever the size; the run says whether it was made as a
+superuser, which loads the tables with the foreign key and trigger checks
+skipped.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import Tournament_App as app
+
+
+GAMES = ['dota2', 'fortnite', 'valorant', 'fifa', 'cod', 'tekken', 'league of legends']
+SEED_CHUNK = 1000000
+
+
+def seed(players, matches):
+    started = time.monotonic()
+    with app.pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SET LOCAL gaming_portal.skip_leaderboard = on")
+        cursor.execute("SET LOCAL gaming_portal.skip_id_blocks = on")
+        cursor.execute(f"TRUNCATE {', '.join(app.BACKUP_TABLES)} RESTART IDENTITY CASCADE")
+        cursor.execute("INSERT INTO games (name) SELECT unnest(%s::text[])", (GAMES,))
+        cursor.execute("""
+            INSERT INTO users (username, password, role, created_at)
+            SELECT 'player' || i, 'pw', 'player', timestamp '2024-01-01' + i * interval '1 minute'
+            FROM generate_series(1, %s) AS i
+        """, (players,))
+        cursor.execute("INSERT INTO player_stats (player_id) SELECT id FROM users")
+        for first in range(1, matches + 1, SEED_CHUNK):
+            last = min(first + SEED_CHUNK - 1, matches)
+            cursor.execute("""
+                INSERT INTO matches (game_id, player1_id, player2_id, winner_id, match_type, created_at)
+                SELECT game_id, player1_id, player2_id,
+                       CASE WHEN random() < 0.5 THEN player1_id ELSE player2_id END,
+                       CASE WHEN random() < 0.5 THEN 'friendly' ELSE 'tournament' END,
+                       timestamp '2024-01-01' + i * interval '1 second'
+                FROM (SELECT i, 1 + floor(random() * %(games)s)::int AS game_id,
+                             player1_id, 1 + (player1_id + floor(random() * (%(players)s - 1))::int) %% %(players)s
+                                 AS player2_id
+                      FROM (SELECT i, 1 + floor(random() * %(players)s)::int AS player1_id
+                            FROM generate_series(%(first)s, %(last)s) AS i) drawn) paired
+            """, {'games': len(GAMES), 'players': players, 'first': first, 'last': last})
+            print(f"Seeded {last} matches, {time.monotonic() - started:.0f}s")
+        cursor.execute("""
+            UPDATE player_stats ps
+            SET matches_won = c.won, total_matches = c.played
+            FROM (SELECT player_id, sum(won) AS won, count(*) AS played
+                  FROM (SELECT winner_id AS player_id, 1 AS won FROM matches
+                        UNION ALL
+                        SELECT CASE WHEN winner_id = player1_id THEN player2_id ELSE player1_id END, 0
+                        FROM matches) played
+                  GROUP BY player_id) c
+            WHERE ps.player_id = c.player_id
+        """)
+        cursor.execute("SELECT rebuild_leaderboard()")
+        cursor.execute("SELECT rebuild_id_blocks()")
+        cursor.close()
+    print(f"Seeded {players} players and {matches} matches in {time.monotonic() - started:.0f}s")
+
+
+def superuser():
+    with app.pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT rolsuper FROM pg_roles WHERE rolname = current_user")
+        result = cursor.fetchone()[0]
+        cursor.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=100000)
+    parser.add_argument("--matches", type=int, default=10000000)
+    parser.add_argument("--directory", help="where to write the snapshot (default: a temporary directory)")
+    parser.add_argument("--skip-seed", action="store_true", help="snapshot the data already in the database")
+    args = parser.parse_args()
+
+    directory = args.directory or tempfile.mkdtemp(prefix="snapshot-bench-")
+    try:
+        if not args.skip_seed:
+            seed(args.players, args.matches)
+
+        manifest = app.export_snapshot(directory)
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        print(f"Snapshot: {manifest['seconds']:.1f}s, {size / 1e6:.0f} MB")
+
+        summary = app.restore_snapshot(directory)
+        print(f"Restore ({'superuser' if superuser() else 'foreign keys and triggers checked'}), one transaction:")
+        for table, stats in summary['tables'].items():
+            rate = stats['rows'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+            print(f"  {table:24} {stats['rows']:>10} rows  {stats['seconds']:7.1f}s  {rate:9.0f} rows/s")
+        print(f"  {summary['indexes']['built']} secondary indexes rebuilt in {summary['indexes']['seconds']:.1f}s")
+        print(f"  total {summary['seconds']:.1f}s, including the sequence resets and the rebuilds")
+    finally:
+        if not args.directory:
+            shutil.rmtree(directory, ignore_errors=True)
+        app.close_pool()
+
+
+if __name__ == "__main__":
+    main()